@@ -0,0 +1,250 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import sympy as sp
+from combineorderedtuples import TransitionSearchPool, find_transition
+from matrixgroups import centralizers, icosahedralgroup, orbitcatalog
+from pickle_manager.pickle_manager import TransitionPickleManager, VectorPairPickleManager
+from virusdata import virusdata
+
+# representative cases that each take at most a few seconds, as (centralizer, start, end)
+TRANSITION_CASES = [("A4", [12], [12]), ("D10", [12], [12]), ("D6", [12], [12]),
+                    ("A4", [11, 12], [12, 11]), ("D10", [12, 13], [12, 13]), ("D6", [12, 13], [12, 13])]
+VECTOR_PAIR_CASES = [("A4", "s", "s"), ("D10", 1, 2), ("D6", 12, 13)]
+ORBIT_VECTORS = ["f", "s", 1, 13]
+
+
+def get_checksum(result):
+    """
+    Checksum of a benchmark's result, so a faster run that computes something else is caught.
+    Lists are compared as multisets, since parallel code is free to return them in any order.
+    """
+    if isinstance(result, list):
+        result = sorted(str(item) for item in result)
+    return hashlib.sha256(str(result).encode()).hexdigest()[:16]
+
+
+def get_machine_info():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {"platform": platform.platform(), "processor": platform.processor() or platform.machine(),
+            "cpu_count": os.cpu_count(), "python": platform.python_version(), "sympy": sp.__version__,
+            "commit": commit}
+
+
+# every benchmark is a (name, setup) pair, where setup does the untimed preparation and returns the function to time
+def get_orbit_benchmarks():
+    def orbit_benchmark(vector_str):
+        vector = virusdata.get_single_generator_from_str(vector_str)
+        return lambda: icosahedralgroup.orbitOfVector(vector)
+
+    return [(f"orbit/{vector_str}", lambda vector_str=vector_str: orbit_benchmark(vector_str))
+            for vector_str in ORBIT_VECTORS]
+
+
+def get_orbit_catalog_benchmarks(work_dir):
+    def load_benchmark():
+        filename = os.path.join(work_dir, orbitcatalog.ORBIT_CATALOG_FILENAME)
+        orbitcatalog.OrbitCatalog.build().save(filename)
+        return lambda: orbitcatalog.OrbitCatalog.load(filename).orbits
+
+    return [("orbit_catalog/build", lambda: lambda: orbitcatalog.OrbitCatalog.build().orbits),
+            ("orbit_catalog/load", load_benchmark)]
+
+
+def get_vector_pair_benchmarks(pair_dir):
+    def vector_pair_benchmark(centralizer_str, start, end):
+        vector_pair_pickle_manager = VectorPairPickleManager(pair_dir, centralizer_str, verbose=False)
+        return lambda: vector_pair_pickle_manager.generate_vector_pairs(start, end)
+
+    return [(f"vector_pairs/{centralizer_str}/{start}_to_{end}",
+             lambda case=(centralizer_str, start, end): vector_pair_benchmark(*case))
+            for centralizer_str, start, end in VECTOR_PAIR_CASES]
+
+
+def get_search_pool(search_pools, pool_stack, centralizer_str, pair_dir, processes):
+    """
+    :param search_pools: Dict from centralizer string to a TransitionSearchPool, which the pool is added to if it is new.
+    :param pool_stack: contextlib.ExitStack a new pool is entered on, which closes it (or terminates it on an error).
+    """
+    if centralizer_str not in search_pools:
+        search_pools[centralizer_str] = pool_stack.enter_context(TransitionSearchPool(centralizer_str, pair_dir,
+                                                                                      processes))
+    return search_pools[centralizer_str]
+
+
+def get_transition_benchmarks(pair_dir, search_pools, pool_stack, processes=1):
+    """
+    :param search_pools: Dict of the search pools by centralizer string, see get_search_pool.
+    :param pool_stack: ExitStack holding the search pools, see get_search_pool.
+    """
+    def transition_benchmark(centralizer_str, start, end):
+        # the vector pair tables are computed here, so only the search itself is timed
+        VectorPairPickleManager(pair_dir, centralizer_str, verbose=False).get_multiple_vector_pairs(start, end, True)
+        search_pool = get_search_pool(search_pools, pool_stack, centralizer_str, pair_dir, processes)
+
+        centralizer = centralizers.get_centralizer_from_str(centralizer_str)
+        return lambda: find_transition(start, end, centralizer, centralizer_str, search_pool=search_pool,
+                                       pair_dir=pair_dir)
+
+    return [(f"find_transition/{centralizer_str}/{','.join(map(str, start))}_to_{','.join(map(str, end))}",
+             lambda case=(centralizer_str, start, end): transition_benchmark(*case))
+            for centralizer_str, start, end in TRANSITION_CASES]
+
+
+def get_pickle_benchmarks(pickle_dir, pair_dir, search_pools, pool_stack, processes=1):
+    """
+    :param search_pools: Dict of the search pools by centralizer string, see get_search_pool.
+    :param pool_stack: ExitStack holding the search pools, see get_search_pool.
+    """
+    def get_transitions():
+        # a result with a few thousand transitions, so more than file system overhead is measured
+        centralizer = centralizers.get_centralizer_from_str("A4")
+        search_pool = get_search_pool(search_pools, pool_stack, "A4", pair_dir, processes)
+        return find_transition([12], [12], centralizer, "A4", search_pool=search_pool, pair_dir=pair_dir) * 50
+
+    def save_benchmark(indexed):
+        transition_pickle_manager = TransitionPickleManager(pickle_dir, indexed)
+        transitions = get_transitions()
+        return lambda: transition_pickle_manager.save_transitions([1], [1], "A4", transitions)
+
+    def load_benchmark(indexed):
+        transition_pickle_manager = TransitionPickleManager(pickle_dir, indexed)
+        transition_pickle_manager.save_transitions([2], [2], "A4", get_transitions())
+        return lambda: transition_pickle_manager.load_transitions([2], [2], "A4")
+
+    benchmarks = []
+    for indexed in [False, True]:
+        kind = "indexed" if indexed else "plain"
+        benchmarks += [(f"pickle/save/{kind}", lambda indexed=indexed: save_benchmark(indexed)),
+                       (f"pickle/load/{kind}", lambda indexed=indexed: load_benchmark(indexed))]
+    return benchmarks
+
+
+def time_benchmark(function, repeat):
+    """
+    Runs function repeat times after one untimed warm up run.
+    :return: Dict with the times in seconds, their minimum and median, and the checksum of the result.
+    """
+    result = function()
+    times = []
+    for _ in range(repeat):
+        stime = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - stime)
+
+    return {"times": times, "min": min(times), "median": statistics.median(times), "checksum": get_checksum(result)}
+
+
+def run_benchmarks(name_filter="", repeat=3, processes=1):
+    """
+    Runs every benchmark whose name contains name_filter, in a fresh temporary directory so no cached tables are used.
+    :param processes: Number of worker processes for find_transition, in its benchmarks and in making the results
+                      the pickle benchmarks save and load.
+    :return: Dict with the machine info, the settings and the results of each benchmark by name.
+    """
+    work_dir = tempfile.mkdtemp()
+    pair_dir = os.path.join(work_dir, "vector_pairs")
+    pickle_dir = os.path.join(work_dir, "transitions")
+    search_pools = {}
+    try:
+        # the pools are closed once every benchmark ran, or terminated if one of them failed
+        with contextlib.ExitStack() as pool_stack:
+            benchmarks = (get_orbit_benchmarks() + get_orbit_catalog_benchmarks(work_dir)
+                          + get_vector_pair_benchmarks(pair_dir)
+                          + get_transition_benchmarks(pair_dir, search_pools, pool_stack, processes)
+                          + get_pickle_benchmarks(pickle_dir, pair_dir, search_pools, pool_stack, processes))
+
+            results = {}
+            for name, setup in benchmarks:
+                if name_filter in name:
+                    results[name] = time_benchmark(setup(), repeat)
+                    print(f"{name}: {results[name]['median'] : .4f} seconds (median of {repeat}).", file=sys.stderr)
+    finally:
+        shutil.rmtree(work_dir)
+
+    return {"machine": get_machine_info(), "settings": {"repeat": repeat, "processes": processes},
+            "benchmarks": results}
+
+
+def compare_results(baseline, results, threshold=0.1):
+    """
+    Compares the median times of two runs of run_benchmarks.
+    :param threshold: Relative slowdown above which a benchmark counts as a regression.
+    :return: List of (name, baseline median, new median, status) where status is one of
+             "ok", "regression", "improvement", "checksum mismatch", "new" or "missing".
+    """
+    comparison = []
+    baseline_benchmarks, benchmarks = baseline["benchmarks"], results["benchmarks"]
+    for name in sorted(set(baseline_benchmarks) | set(benchmarks)):
+        if name not in baseline_benchmarks:
+            comparison.append((name, None, benchmarks[name]["median"], "new"))
+            continue
+        if name not in benchmarks:
+            comparison.append((name, baseline_benchmarks[name]["median"], None, "missing"))
+            continue
+
+        old, new = baseline_benchmarks[name], benchmarks[name]
+        if old["checksum"] != new["checksum"]:
+            status = "checksum mismatch"
+        elif new["median"] > old["median"] * (1 + threshold):
+            status = "regression"
+        elif new["median"] < old["median"] / (1 + threshold):
+            status = "improvement"
+        else:
+            status = "ok"
+        comparison.append((name, old["median"], new["median"], status))
+
+    return comparison
+
+
+def print_comparison(comparison):
+    format_time = lambda seconds: "-" if seconds is None else f"{seconds:.4f}"
+    width = max(len(name) for name, _, _, _ in comparison)
+    print(f"{'benchmark':<{width}}  {'baseline':>10}  {'new':>10}  {'ratio':>7}  status")
+    for name, old, new, status in comparison:
+        ratio = f"{new / old:.2f}x" if old and new is not None else "-"
+        print(f"{name:<{width}}  {format_time(old):>10}  {format_time(new):>10}  {ratio:>7}  {status}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times the main steps of the search pipeline on a fixed set of cases. "
+                                                 "Results are saved as a JSON baseline, or compared against one.",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-o", "--output", help="JSON file to save the results to.")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON file of an earlier run to compare the results against. "
+                                                              "Exits with status 1 on any regression or changed result.")
+    parser.add_argument("-k", "--filter", default="", help="Only run the benchmarks whose name contains this string.")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Number of timed runs of each benchmark.")
+    parser.add_argument("-j", "--processes", type=int, default=1, help="Number of worker processes for find_transition.")
+    parser.add_argument("-t", "--threshold", type=float, default=0.1,
+                        help="Relative slowdown of the median time that counts as a regression.")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.filter, args.repeat, args.processes)
+
+    if args.output is not None:
+        with open(args.output, 'w') as write_file:
+            json.dump(results, write_file, indent=2)
+        print(f"Saved results of {len(results['benchmarks'])} benchmarks to {args.output}.")
+
+    if args.compare is not None:
+        with open(args.compare, 'r') as read_file:
+            baseline = json.load(read_file)
+        comparison = compare_results(baseline, results, args.threshold)
+        print_comparison(comparison)
+        if any(status in ["regression", "checksum mismatch"] for _, _, _, status in comparison):
+            sys.exit(1)
@@ -3,14 +3,219 @@ import sys
 import sympy as sp
 import multiprocessing
 import time
+from contextlib import closing
 from tqdm.auto import tqdm
 from matrixgroups import centralizers
+from matrixgroups.icosahedralgroup import ICO_GROUP
+from matrixgroups.solutionspace import CentralizerSolutionSpace, get_linear_system
+from matrixgroups.symmetry import PairSymmetry
 from pickle_manager.pickle_manager import TransitionPickleManager, VectorPairPickleManager
-import utils.sympy_utils as sp_utils
+from pickle_manager.sqlite_manager import SQLiteTransitionManager
+from pickle_manager.work_queue import LeaseLost, WorkQueue
+from pt_arr_cases.schedulecases import print_plan_summary, schedule_cases, write_plan
+from utils.linalg_utils import IntegerEchelonBasis, get_modular_systems, to_integer_vector
+
+PAIR_DIR = "vector_pairs"
+# a translation pair table holds at most every pair of two ICO orbits
+MAX_TRANSLATION_PAIRS = len(ICO_GROUP) ** 2
+NOT_FOUND = 2 ** 63 - 1
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+class SearchStats:
+    """
+    Counters of a TransitionSearch for each depth, the depth of a pair being the number of columns chosen before it.
+    nodes counts the nodes whose children were generated and pairs the pairs tried for them.
+    Every pair tried is then either skipped by symmetry breaking, rejected for making the columns of B0 or B1
+    linearly dependent (b0_rank, b1_rank), ruled out by the modular pre-filter if on or the exact solve (modular,
+    unsolvable), rejected for forcing T to be singular, or taken as a child. A child taken becomes a node of the
+    next depth, unless the search was cancelled before getting to it (cancelled). leaves counts the transitions found.
+    The times spent in the rank checks, the solves and the nonsingularity checks are kept in seconds.
+    """
+    COUNTERS = ("nodes", "pairs", "symmetry", "b0_rank", "b1_rank", "modular", "unsolvable", "singular", "cancelled",
+                "leaves")
+    TIMERS = ("rank_time", "solve_time", "det_time")
+
+    def __init__(self):
+        self.depths = []
+
+    def get_depth(self, depth):
+        while len(self.depths) <= depth:
+            self.depths.append(dict.fromkeys(self.COUNTERS + self.TIMERS, 0))
+        return self.depths[depth]
+
+    def merge(self, other):
+        for depth, other_counters in enumerate(other.depths):
+            counters = self.get_depth(depth)
+            for key, value in other_counters.items():
+                counters[key] += value
+
+    def get_totals(self):
+        return {key: sum(counters[key] for counters in self.depths) for key in self.COUNTERS + self.TIMERS}
+
+    def to_dict(self):
+        return {"depths": [dict(counters) for counters in self.depths], "totals": self.get_totals()}
+
+
+class TransitionSearch:
+    """
+    Depth first search building up the columns of B0 and B1 one orbit at a time.
+    The columns chosen so far are kept on stacks along with fraction-free echelon bases of their spans,
+    so checking a new column for linear independence costs a single reduction against the basis.
+    The solutions of T * B0 = B1 for the chosen columns are carried along as a CentralizerSolutionSpace.
+    The linear system of each pair is cached, so every solution space of one search must come from the same centralizer.
+    If a cancel event is given, the search raises SearchCancelled as soon as the event is set.
+    If symmetry breaking is turned on, branches equivalent under the normalizer of the centralizer are skipped.
+    If the modular pre-filter is turned on, each pair is tried modulo a few word sized primes before the exact solve.
+    It only pays off for centralizers where most pairs are unsolvable, so it is off unless asked for.
+    What the search did at each depth is counted in stats, a SearchStats.
+    """
+    def __init__(self, orbits_pairs, cancel_event=None, linear_structure=None, symmetry_breaking=False,
+                 modular_prefilter=False):
+        self.orbits_pairs = orbits_pairs
+        self.modular_prefilter = modular_prefilter
+        self.cancel_event = cancel_event
+        self.integer_pairs = [[(to_integer_vector(v0)[0], to_integer_vector(v1)[0]) for v0, v1 in pairs]
+                              for pairs in orbits_pairs]
+        self.linear_structure = linear_structure
+        self.symmetry = PairSymmetry(linear_structure, self.integer_pairs) if symmetry_breaking else None
+
+        # linear systems of the pairs, built the first time a pair is tried, see get_pair_system
+        self.pair_systems = [{} for _ in orbits_pairs]
+
+        # path holds the indices of the chosen pairs, or None for columns that were not taken from orbits_pairs
+        self.path = []
+        self.b0_columns, self.b1_columns = [], []
+        self.b0_basis, self.b1_basis = IntegerEchelonBasis(), IntegerEchelonBasis()
+        self.stats = SearchStats()
+
+    def push_columns(self, v0, v1, integer_v0=None, integer_v1=None, index=None):
+        """
+        Adds v0 and v1 as the next columns of B0 and B1 if both keep their columns linearly independent.
+        :return: True if the columns were added.
+        """
+        if integer_v0 is None:
+            integer_v0, _ = to_integer_vector(v0)
+        if integer_v1 is None:
+            integer_v1, _ = to_integer_vector(v1)
+
+        if not self.b0_basis.add(integer_v0):
+            self.stats.get_depth(len(self.path))["b0_rank"] += 1
+            return False
+        if not self.b1_basis.add(integer_v1):
+            self.b0_basis.pop()
+            self.stats.get_depth(len(self.path))["b1_rank"] += 1
+            return False
+
+        self.path.append(index)
+        self.b0_columns.append(v0)
+        self.b1_columns.append(v1)
+        return True
+
+    def pop_columns(self):
+        self.path.pop()
+        self.b0_columns.pop()
+        self.b1_columns.pop()
+        self.b0_basis.pop()
+        self.b1_basis.pop()
+
+    def get_pair_system(self, solution_space, depth, index):
+        """
+        The linear system of the centralizer's parameters for a pair, exactly and, with the modular pre-filter,
+        modulo the pre-filter primes (otherwise None).
+        A pair's system is the same at every node, so it is only built once per search.
+        """
+        if index not in self.pair_systems[depth]:
+            v0, v1 = self.orbits_pairs[depth][index]
+            system = get_linear_system(solution_space.linear_structure, v0, v1)
+            self.pair_systems[depth][index] = (system, get_modular_systems(system) if self.modular_prefilter else None)
+        return self.pair_systems[depth][index]
+
+    def children(self, solution_space):
+        """
+        Yields (index, solution_space) for every pair of the next orbit that can extend the current columns.
+        The centralizer of a child is only substituted once a full transition is found.
+        The pair's columns are pushed while the child is being used and popped once the next child is asked for.
+        """
+        num_curr_b0_cols = len(self.b0_columns)
+        stats = self.stats.get_depth(num_curr_b0_cols)
+        stats["nodes"] += 1
+        for index, ((v0, v1), (integer_v0, integer_v1)) in enumerate(zip(self.orbits_pairs[num_curr_b0_cols],
+                                                                         self.integer_pairs[num_curr_b0_cols])):
+            stats["pairs"] += 1
+            if self.symmetry is not None and not self.symmetry.is_canonical(self.path, index):
+                stats["symmetry"] += 1
+                continue
+
+            # check for linear independence within the columns of B0 and B1
+            stime = time.perf_counter()
+            is_independent = self.push_columns(v0, v1, integer_v0, integer_v1, index)
+            stats["rank_time"] += time.perf_counter() - stime
+            if not is_independent:
+                continue
+
+            try:
+                stime = time.perf_counter()
+                system, modular_systems = self.get_pair_system(solution_space, num_curr_b0_cols, index)
+                if modular_systems is not None and solution_space.rules_out(modular_systems):
+                    stats["solve_time"] += time.perf_counter() - stime
+                    stats["modular"] += 1
+                    continue
+
+                curr_solution_space = solution_space.intersect_system(*system)
+                stats["solve_time"] += time.perf_counter() - stime
+                if curr_solution_space is None:
+                    stats["unsolvable"] += 1
+                    continue
+
+                stime = time.perf_counter()
+                is_nonsingular = curr_solution_space.is_nonsingular()
+                stats["det_time"] += time.perf_counter() - stime
+                if not is_nonsingular:
+                    stats["singular"] += 1
+                    continue
+
+                yield index, curr_solution_space
+            finally:
+                self.pop_columns()
+
+    def search(self, solution_space):
+        if len(self.b0_columns) == len(self.orbits_pairs):
+            self.stats.get_depth(len(self.orbits_pairs) - 1)["leaves"] += 1
+            return (solution_space.get_centralizer(), sp.Matrix.hstack(*self.b0_columns),
+                    sp.Matrix.hstack(*self.b1_columns))
+
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.stats.get_depth(len(self.b0_columns))["cancelled"] += 1
+            raise SearchCancelled()
+
+        with closing(self.children(solution_space)) as children:
+            for _, curr_solution_space in children:
+                result = self.search(curr_solution_space)
+                if result[0] is not None:
+                    return result
+
+        return None, None, None
+
+    def split(self, solution_space, split_depth, prefix):
+        """
+        Yields the prefixes of length split_depth below the current columns, in the order the search visits them.
+        A prefix is a tuple of indices into orbits_pairs, one per column.
+        """
+        if len(prefix) == split_depth:
+            yield prefix
+            return
+
+        with closing(self.children(solution_space)) as children:
+            for index, curr_solution_space in children:
+                yield from self.split(curr_solution_space, split_depth, prefix + (index,))
 
 
 # recursive helper function for finding transitions
-# builds up the columns of B0 and B1 in a depth first manner
+# builds up the columns of B0 and B1 in a depth first manner, starting from the columns already in prevB0 and prevB1
 def find_transition_helper(prevCentralizer, prevB0, prevB1, orbits_pairs, tqdm_desc=""):
     num_curr_b0_cols = prevB0.shape[1]
     assert (prevB0.shape[1] == prevB1.shape[1])
@@ -18,61 +223,304 @@ def find_transition_helper(prevCentralizer, prevB0, prevB1, orbits_pairs, tqdm_d
     if num_curr_b0_cols == len(orbits_pairs):
         return prevCentralizer, prevB0, prevB1
 
-    for pair in orbits_pairs[num_curr_b0_cols]:
-        v0, v1 = pair
-        B0 = prevB0.col_insert(num_curr_b0_cols, v0)
-        B1 = prevB1.col_insert(num_curr_b0_cols, v1)
+    transition_search = TransitionSearch(orbits_pairs)
+    for col in range(num_curr_b0_cols):
+        if not transition_search.push_columns(prevB0.col(col), prevB1.col(col)):
+            return None, None, None
+
+    solution_space = CentralizerSolutionSpace(prevCentralizer).intersect_columns(prevB0, prevB1)
+    if solution_space is None:
+        return None, None, None
+
+    return transition_search.search(solution_space)
+
+
+def generate_search_tasks(transition_search, centralizer, split_depth, translation_is_done=None):
+    """
+    Splits the search tree into subtrees whose first split_depth columns are fixed.
+    With a split depth of 1 there is one task per translation pair.
+    :param transition_search: TransitionSearch of the case with no columns pushed yet.
+    :param translation_is_done: Function of a translation pair's index telling whether the rest of its subtree
+                                can be skipped, checked before each of its prefixes.
+    :return: Generator of prefixes (tuples of indices into orbits_pairs) in depth first order.
+    """
+    cancel_event, symmetry = transition_search.cancel_event, transition_search.symmetry
+    stats = transition_search.stats.get_depth(0)
+    stats["nodes"] += 1
+    for index, (t0, t1) in enumerate(transition_search.orbits_pairs[0]):
+        if cancel_event is not None and cancel_event.is_set():
+            return
 
-        # check for linear independence within the columns of B0 and B1
-        if B0.rank() != num_curr_b0_cols+1 or B1.rank() != num_curr_b0_cols+1:
+        stats["pairs"] += 1
+        if symmetry is not None and not symmetry.is_canonical([], index):
+            stats["symmetry"] += 1
             continue
 
-        curr_eq = sp.Eq(prevCentralizer * B0, B1)
-        if sp_utils.equation_is_true_or_solvable(curr_eq):
-            curr_solution = sp.solve(curr_eq)
-            if len(curr_solution) == 0:
-                curr_centralizer = prevCentralizer
-            else:
-                curr_centralizer = prevCentralizer.subs(curr_solution.items())
+        if split_depth == 1:
+            yield (index,)
+            continue
+
+        solution_space = CentralizerSolutionSpace(centralizer, transition_search.linear_structure).intersect(t0, t1)
+        if solution_space is None:
+            stats["unsolvable"] += 1
+            continue
+        if not transition_search.push_columns(t0, t1, index=index):
+            continue
+
+        try:
+            with closing(transition_search.split(solution_space, split_depth, (index,))) as prefixes:
+                for prefix in prefixes:
+                    if translation_is_done is not None and translation_is_done(index):
+                        transition_search.stats.get_depth(len(prefix))["cancelled"] += 1
+                        break
+                    yield prefix
+        finally:
+            transition_search.pop_columns()
+
+
+class TaskCancelEvent:
+    """
+    Cancel event of one search task. It is set when the whole search is cancelled, or when a task of the same
+    translation pair that comes earlier in depth first order has found a transition, since only the first
+    transition of each translation pair is kept.
+    """
+    def __init__(self, cancel_event, first_found_tasks, translation_index, task_index):
+        """
+        :param first_found_tasks: Shared array holding, for each translation pair, the index of the earliest task
+                                  known to have found a transition, or NOT_FOUND.
+        """
+        self.cancel_event = cancel_event
+        self.first_found_tasks = first_found_tasks
+        self.translation_index = translation_index
+        self.task_index = task_index
+
+    def is_set(self):
+        return (self.cancel_event.is_set()
+                or self.first_found_tasks.get_obj()[self.translation_index] < self.task_index)
+
+    def record_found(self):
+        with self.first_found_tasks.get_lock():
+            if self.task_index < self.first_found_tasks.get_obj()[self.translation_index]:
+                self.first_found_tasks.get_obj()[self.translation_index] = self.task_index
+
+
+# state of a search worker process
+# the centralizer is set up once when the process starts and the vector pair tables once per case
+search_worker = {}
+
+
+def init_search_worker(centralizer_str, pair_dir, cancel_event, first_found_tasks):
+    centralizer = centralizers.get_centralizer_from_str(centralizer_str)
+    search_worker["centralizer"] = centralizer
+    search_worker["linear_structure"] = centralizers.get_centralizer(centralizer_str).linear_structure
+    search_worker["vector_pair_pickle_manager"] = VectorPairPickleManager(pair_dir, centralizer_str, verbose=False)
+    search_worker["cancel_event"] = cancel_event
+    search_worker["first_found_tasks"] = first_found_tasks
+    search_worker["case"] = None
+    search_worker["transition_search"] = None
+
+
+def get_worker_transition_search(case):
+    if search_worker["case"] != case:
+        start_tuple, end_tuple, symmetry_breaking, modular_prefilter = case
+        orbits_pairs = search_worker["vector_pair_pickle_manager"].get_multiple_vector_pairs(list(start_tuple),
+                                                                                              list(end_tuple),
+                                                                                              add_in_translation=True)
+        search_worker["case"] = case
+        search_worker["transition_search"] = TransitionSearch(orbits_pairs, search_worker["cancel_event"],
+                                                              search_worker["linear_structure"], symmetry_breaking,
+                                                              modular_prefilter)
+
+    return search_worker["transition_search"]
+
+
+def run_search_task(case, prefix, task_index):
+    """
+    Searches the subtree below the columns given by prefix in a search worker process.
+    :param case: (start_tuple, end_tuple, symmetry_breaking, modular_prefilter) with the point arrays as tuples.
+    :param prefix: Tuple of indices into the case's orbits_pairs, one per fixed column.
+    :param task_index: Position of the task in depth first order.
+    :return: (prefix, (T, B0, B1), stats) where T, B0, B1 are None if the subtree has no transition
+             and stats is the SearchStats of the task. The result is None instead if the search was cancelled,
+             either entirely or because an earlier task of the same translation pair found a transition.
+    """
+    transition_search = get_worker_transition_search(case)
+    transition_search.stats = SearchStats()
+    cancel_event = TaskCancelEvent(search_worker["cancel_event"], search_worker["first_found_tasks"], prefix[0],
+                                   task_index)
+    transition_search.cancel_event = cancel_event
+    solution_space = CentralizerSolutionSpace(search_worker["centralizer"], search_worker["linear_structure"])
+
+    num_pushed = 0
+    try:
+        for num_cols, index in enumerate(prefix):
+            v0, v1 = transition_search.orbits_pairs[num_cols][index]
+            integer_v0, integer_v1 = transition_search.integer_pairs[num_cols][index]
+            solution_space = solution_space.intersect(v0, v1)
+            if solution_space is None or not transition_search.push_columns(v0, v1, integer_v0, integer_v1, index):
+                return prefix, (None, None, None), transition_search.stats
+            num_pushed += 1
 
-            if curr_centralizer.det() != 0:
-                curr_centralizer, B0, B1 = find_transition_helper(curr_centralizer, B0, B1, orbits_pairs)
-                if curr_centralizer is not None and B0.shape[1] == len(orbits_pairs):
-                    return curr_centralizer, B0, B1
+        result = transition_search.search(solution_space)
+        if result[0] is not None:
+            cancel_event.record_found()
+        return prefix, result, transition_search.stats
+    except SearchCancelled:
+        return prefix, None, transition_search.stats
+    finally:
+        # the worker keeps the search object for the next task of the case
+        for _ in range(num_pushed):
+            transition_search.pop_columns()
 
-    return None, None, None
+
+def run_search_task_star(args):
+    return run_search_task(*args)
+
+
+class TransitionSearchPool:
+    """
+    Pool of search worker processes meant to live for a whole run of cases.
+    Workers load the centralizer and the vector pair tables themselves,
+    so a task only sends the case and a short prefix of indices.
+    Every worker shares one cancel event, which stops all outstanding tasks of a case at once,
+    and an array of the earliest task of each translation pair that found a transition, which stops the later tasks
+    of that translation pair.
+    """
+    def __init__(self, centralizer_str, pair_dir=PAIR_DIR, processes=None):
+        self.linear_structure = centralizers.get_centralizer(centralizer_str).linear_structure
+        self.cancel_event = multiprocessing.Event()
+        self.first_found_tasks = multiprocessing.Array('q', MAX_TRANSLATION_PAIRS)
+        self.pool = multiprocessing.Pool(processes, initializer=init_search_worker,
+                                         initargs=(centralizer_str, pair_dir, self.cancel_event, self.first_found_tasks))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.pool.close()
+        else:
+            self.pool.terminate()
+        self.pool.join()
+
+    def search(self, start_tuple, end_tuple, centralizer, orbits_pairs, split_depth=1, tqdm_desc="", exists_only=False,
+               symmetry_breaking=False, expand_symmetric=False, journal=None, search_stats=None,
+               modular_prefilter=False):
+        """
+        Runs the search for every translation pair, splitting the search tree into tasks at split_depth.
+        Since the serial search keeps the first transition it finds, each translation pair keeps the transition
+        of its first task (in depth first order) that found one, so the results match find_transition_helper.
+        Once a task has found a transition, the later tasks of its translation pair are cancelled.
+        With exists_only, every outstanding task is cancelled as soon as any transition is found.
+        With symmetry_breaking, only one representative of each class of equivalent branches is searched.
+        The transitions found are then only for representative translation pairs, unless expand_symmetric is set,
+        in which case they are mapped onto every equivalent translation pair.
+        With modular_prefilter, pairs are tried modulo small primes before being solved exactly, see TransitionSearch.
+        If a SearchJournal is given, every finished task is recorded in it and tasks it already holds are skipped.
+        If a SearchStats is given, the counters of the search (from splitting it into tasks and from every task
+        that was run) are added to it.
+        The vector pair tables of the case must already be saved in the pair directory.
+        :return: List of (T, B0, B1), one for each translation pair with a transition, ordered by translation pair.
+                 With exists_only the list only holds the first transition found, if any.
+        """
+        case = (tuple(start_tuple), tuple(end_tuple), symmetry_breaking, modular_prefilter)
+        # splitting at the last column would have this process run the whole search while making the tasks
+        split_depth = max(1, min(split_depth, len(orbits_pairs) - 1))
+        transition_search = TransitionSearch(orbits_pairs, self.cancel_event, self.linear_structure,
+                                             symmetry_breaking, modular_prefilter)
+        finished = {} if journal is None else dict(journal.finished)
+
+        first_found = {}
+        witness = None
+        pbar = tqdm(total=len(orbits_pairs[0]) if split_depth == 1 else None, desc=tqdm_desc, initial=len(finished))
+        for prefix in sorted(finished):
+            if finished[prefix][0] is not None:
+                first_found.setdefault(prefix[0], (prefix, finished[prefix]))
+                witness = witness or finished[prefix]
+
+        # tasks of a translation pair that come after a finished task with a transition are cancelled right away
+        assert len(orbits_pairs[0]) <= MAX_TRANSLATION_PAIRS
+        first_found_prefixes = {translation_index: prefix for translation_index, (prefix, _) in first_found.items()}
+        first_found_tasks = self.first_found_tasks.get_obj()
+        for translation_index in range(len(orbits_pairs[0])):
+            first_found_tasks[translation_index] = NOT_FOUND
+        # the subtree of a translation pair with a transition is no longer split into tasks
+        prefixes = generate_search_tasks(transition_search, centralizer, split_depth,
+                                         lambda translation_index: first_found_tasks[translation_index] != NOT_FOUND)
+
+        def get_tasks():
+            for task_index, prefix in enumerate(prefixes):
+                if prefix == first_found_prefixes.get(prefix[0]):
+                    TaskCancelEvent(self.cancel_event, self.first_found_tasks, prefix[0], task_index).record_found()
+                if prefix not in finished:
+                    yield case, prefix, task_index
+
+        tasks = () if exists_only and witness is not None else get_tasks()
+
+        # cancelled tasks return right away, so the loop finishes shortly after the event is set
+        task_results = self.pool.imap_unordered(run_search_task_star, tasks)
+        try:
+            for prefix, result, task_stats in task_results:
+                pbar.update(1)
+                if search_stats is not None:
+                    search_stats.merge(task_stats)
+                if result is not None and journal is not None:
+                    journal.record(prefix, result)
+                if result is None or result[0] is None:
+                    continue
+
+                translation_index = prefix[0]
+                if translation_index not in first_found or prefix < first_found[translation_index][0]:
+                    first_found[translation_index] = (prefix, result)
+
+                if exists_only and witness is None:
+                    witness = result
+                    self.cancel_event.set()
+        except Exception:
+            # the pool is used for the next case, so the outstanding tasks of this one are cancelled and waited for
+            self.cancel_event.set()
+            for _ in task_results:
+                pass
+            self.cancel_event.clear()
+            raise
+        finally:
+            pbar.close()
+        self.cancel_event.clear()
+        if search_stats is not None:
+            search_stats.merge(transition_search.stats)
+
+        if exists_only:
+            return [] if witness is None else [witness]
+
+        results = {translation_index: result for translation_index, (_, result) in first_found.items()}
+        if symmetry_breaking and expand_symmetric:
+            results = transition_search.symmetry.expand(results)
+
+        return [results[translation_index] for translation_index in sorted(results)]
 
 
 # find a transition from (n_1, n_2, ..., n_k) to (m_1, m_2, ..., m_k)
-def find_transition(start_tuple, end_tuple, centralizer, centralizer_str):
+# a search pool can be passed in so it is reused between cases
+def find_transition(start_tuple, end_tuple, centralizer, centralizer_str, split_depth=1, search_pool=None,
+                    pair_dir=PAIR_DIR, exists_only=False, symmetry_breaking=False, expand_symmetric=False, journal=None,
+                    search_stats=None, modular_prefilter=False):
     sys.stdout.flush()
 
-    PAIR_DIR = "vector_pairs"
-    vector_pair_pickle_manager = VectorPairPickleManager(PAIR_DIR, centralizer_str)
+    vector_pair_pickle_manager = VectorPairPickleManager(pair_dir, centralizer_str)
     orbits_pairs = vector_pair_pickle_manager.get_multiple_vector_pairs(start_tuple, end_tuple, add_in_translation=True)
 
-    results = []
-    pbar = tqdm(total=len(orbits_pairs[0]),
-                desc=f"Finding transitions for {start_tuple} --> {end_tuple} under {centralizer_str}")
-
-    # this function is called when a parallel process is finished
-    def collect_result(result):
-        pbar.update(1)
-        pbar.refresh()
-        if result != (None, None, None):
-            results.append((start_tuple,) + (end_tuple,) + result)
+    tqdm_desc = f"Finding transitions for {start_tuple} --> {end_tuple} under {centralizer_str}"
+    if search_pool is None:
+        with TransitionSearchPool(centralizer_str, pair_dir) as search_pool:
+            transitions = search_pool.search(start_tuple, end_tuple, centralizer, orbits_pairs, split_depth, tqdm_desc,
+                                             exists_only, symmetry_breaking, expand_symmetric, journal, search_stats,
+                                             modular_prefilter)
+    else:
+        transitions = search_pool.search(start_tuple, end_tuple, centralizer, orbits_pairs, split_depth, tqdm_desc,
+                                         exists_only, symmetry_breaking, expand_symmetric, journal, search_stats,
+                                         modular_prefilter)
 
-    with multiprocessing.Pool() as pool:
-        for translation_pair in orbits_pairs[0]:
-            t0, t1 = translation_pair
-            B0 = sp.Matrix([]).col_insert(0, t0)
-            B1 = sp.Matrix([]).col_insert(0, t1)
-            pool.apply_async(find_transition_helper, args=(centralizer, B0, B1, orbits_pairs), callback=collect_result)
-
-        pool.close()
-        pool.join()
-        pbar.close()
-        return results
+    return [(start_tuple,) + (end_tuple,) + transition for transition in transitions]
 
 
 def create_generating_list(arg_str):
@@ -80,77 +528,236 @@ def create_generating_list(arg_str):
     return list(tup)
 
 
+def get_result_metadata(args):
+    # results of an existence only or symmetry reduced search are marked
+    # so they are not mistaken for the full list of transitions
+    metadata = {}
+    if args.exists_only:
+        metadata["exists_only"] = True
+    if args.symmetry_breaking:
+        metadata["symmetry_breaking"] = True
+        metadata["expanded"] = args.expand_symmetric
+    return metadata or None
+
+
+def get_journal_settings(args):
+    # task prefixes only mean the same thing for the same split depth and symmetry breaking
+    return {"split_depth": args.split_depth, "symmetry_breaking": args.symmetry_breaking}
+
+
+def open_case_journal(args, transition_pickle_manager, start_generating_list, end_generating_list, claim=None):
+    journal = transition_pickle_manager.open_journal(start_generating_list, end_generating_list, centralizer_str,
+                                                     get_journal_settings(args), claim)
+    if journal.finished:
+        print(f"Resuming from {journal.filename} with {len(journal.finished)} finished tasks.")
+    return journal
+
+
+def case_is_done(args, transition_pickle_manager, start_generating_list, end_generating_list):
+    if not transition_pickle_manager.transition_pickle_file_exists(start_generating_list, end_generating_list,
+                                                                   centralizer_str):
+        return False
+
+    # a case whose journal is still there was stopped before its results were committed
+    if transition_pickle_manager.journal_exists(start_generating_list, end_generating_list, centralizer_str):
+        return False
+
+    # an existence only result does not count as done when all transitions are wanted
+    if args.exists_only:
+        return True
+    metadata = transition_pickle_manager.load_metadata(start_generating_list, end_generating_list, centralizer_str)
+    if metadata.get("exists_only", False):
+        return False
+
+    # neither does a result only holding representative translation pairs
+    if args.symmetry_breaking and not args.expand_symmetric:
+        return True
+    return not metadata.get("symmetry_breaking", False) or metadata.get("expanded", False)
+
+
 def find_transitions_from_cmd_line(args, transition_pickle_manager):
     stime = time.time()
     start_generating_list, end_generating_list = list(map(create_generating_list, args.pt_ar))
-    transitions = find_transition(start_generating_list, end_generating_list, centralizer, centralizer_str)
+    search_stats = SearchStats()
+    with open_case_journal(args, transition_pickle_manager, start_generating_list, end_generating_list) as journal:
+        transitions = find_transition(start_generating_list, end_generating_list, centralizer, centralizer_str,
+                                      split_depth=args.split_depth, exists_only=args.exists_only,
+                                      symmetry_breaking=args.symmetry_breaking, expand_symmetric=args.expand_symmetric,
+                                      journal=journal, search_stats=search_stats,
+                                      modular_prefilter=args.modular_prefilter)
     for res in transitions:
         sp.pprint(res)
         print()
     print(
         f"Number of transitions for {start_generating_list} --> {end_generating_list} under {centralizer_str} is {len(transitions)}")
-    transition_pickle_manager.save_transitions(start_generating_list, end_generating_list, centralizer_str, transitions)
+    transition_pickle_manager.save_transitions(start_generating_list, end_generating_list, centralizer_str, transitions,
+                                               metadata=get_result_metadata(args))
+    transition_pickle_manager.save_search_stats(start_generating_list, end_generating_list, centralizer_str,
+                                                search_stats.to_dict())
+    transition_pickle_manager.flush()
+    journal.remove()
     etime = time.time()
     print(f"Done in{etime - stime : .3f} seconds.")
 
 
-def find_transitions_from_case_file(args, transition_pickle_manager):
-    total_stime = time.time()
+def read_case_file(case_filename):
     cases = []
-    with open(args.case_file, 'r') as read_file:
+    with open(case_filename, 'r') as read_file:
         for line in read_file.readlines():
             # this is assuming each line in file looks like:
             # n_1, n_2, ..., n_k > m_1, m_2, ..., m_l
             start_generating_list, end_generating_list = list(map(create_generating_list, line.strip().split(' > ')))
             cases.append((start_generating_list, end_generating_list))
-    for case in cases:
-        stime = time.time()
-        start_generating_list, end_generating_list = case
-
-        # if we are not redoing cases skip it if it's already done
-        if not args.redo and transition_pickle_manager.transition_pickle_file_exists(start_generating_list,
-                                                                                     end_generating_list,
-                                                                                     centralizer_str):
-            transition_pickle_filename = transition_pickle_manager.get_transition_pickle_filename(start_generating_list,
-                                                                                                  end_generating_list,
-                                                                                                  centralizer_str)
-            print(
-                f"Case {start_generating_list} --> {end_generating_list} is already done in {transition_pickle_filename}\n")
-            continue
+    return cases
 
-        print(f"Starting case {start_generating_list} --> {end_generating_list}...")
-        if transition_pickle_manager.check_case_is_possible(start_generating_list, end_generating_list,
-                                                            centralizer_str):
-            transitions = find_transition(start_generating_list, end_generating_list, centralizer, centralizer_str)
-        else:
-            print(f"{start_generating_list} --> {end_generating_list} impossible by one base.")
-            transitions = []
-        print(
-            f"Number of transitions for {start_generating_list} --> {end_generating_list} under {centralizer_str} is {len(transitions)}")
-        transition_pickle_manager.save_transitions(start_generating_list, end_generating_list, centralizer_str,
-                                                   transitions)
-        etime = time.time()
-        print(f"Case {start_generating_list} --> {end_generating_list} done in{etime - stime : .3f} seconds.")
-        print()
+
+def get_cases(args):
+    """
+    The cases of the case file, ordered longest first if asked for, with the plan exported if asked for.
+    """
+    cases = read_case_file(args.case_file)
+    if args.schedule == "file" and args.plan is None:
+        return cases
+
+    plan = schedule_cases(cases, centralizer_str, PAIR_DIR, longest_first=args.schedule == "longest-first")
+    print_plan_summary(plan)
+    if args.plan is not None:
+        write_plan(args.plan, plan)
+        print(f"Wrote the plan to {args.plan}.")
+    return [case for case, _ in plan]
+
+
+def run_case(args, transition_pickle_manager, search_pool, start_generating_list, end_generating_list, claim=None):
+    """
+    Runs one case of a case file (or work queue) and saves its results, unless it is already done.
+    :param claim: Work queue Claim of the case, if it came from a work queue.
+    :raise: LeaseLost if the case was taken over by another worker while it ran. Nothing is saved then.
+    """
+    stime = time.time()
+
+    # if we are not redoing cases skip it if it's already done
+    if not args.redo and case_is_done(args, transition_pickle_manager, start_generating_list, end_generating_list):
+        case_location = transition_pickle_manager.get_case_location(start_generating_list, end_generating_list,
+                                                                    centralizer_str)
+        print(f"Case {start_generating_list} --> {end_generating_list} is already done in {case_location}\n")
+        return
+
+    print(f"Starting case {start_generating_list} --> {end_generating_list}...")
+    search_stats = SearchStats()
+    if transition_pickle_manager.check_case_is_possible(start_generating_list, end_generating_list,
+                                                        centralizer_str):
+        # finished tasks are journaled so a killed run picks the case up where it stopped
+        with open_case_journal(args, transition_pickle_manager, start_generating_list,
+                               end_generating_list, claim) as journal:
+            transitions = find_transition(start_generating_list, end_generating_list, centralizer,
+                                          centralizer_str, split_depth=args.split_depth,
+                                          search_pool=search_pool, exists_only=args.exists_only,
+                                          symmetry_breaking=args.symmetry_breaking,
+                                          expand_symmetric=args.expand_symmetric, journal=journal,
+                                          search_stats=search_stats,
+                                          modular_prefilter=args.modular_prefilter)
+    else:
+        print(f"{start_generating_list} --> {end_generating_list} impossible by a smaller case.")
+        transitions = []
+        journal = None
+    print(
+        f"Number of transitions for {start_generating_list} --> {end_generating_list} under {centralizer_str} is {len(transitions)}")
+    if claim is not None:
+        # the worker that took the case over saves it and removes the journal
+        claim.check_held()
+    transition_pickle_manager.save_transitions(start_generating_list, end_generating_list, centralizer_str,
+                                               transitions, metadata=get_result_metadata(args))
+    transition_pickle_manager.save_search_stats(start_generating_list, end_generating_list, centralizer_str,
+                                                search_stats.to_dict())
+    if journal is not None:
+        # the journal is only dropped once the result is committed
+        transition_pickle_manager.flush()
+        journal.remove()
+    etime = time.time()
+    print(f"Case {start_generating_list} --> {end_generating_list} done in{etime - stime : .3f} seconds.")
+    print()
+
+
+def find_transitions_from_case_file(args, transition_pickle_manager):
+    total_stime = time.time()
+    cases = get_cases(args)
+
+    # one pool of workers is used for every case in the file, with the cases run one after another
+    with TransitionSearchPool(centralizer_str) as search_pool:
+        for start_generating_list, end_generating_list in cases:
+            run_case(args, transition_pickle_manager, search_pool, start_generating_list, end_generating_list)
     total_etime = time.time()
     print(f"All cases completed in{total_etime - total_stime : .3f} seconds.")
 
 
+def find_transitions_from_queue(args, transition_pickle_manager):
+    """
+    Adds the cases of the case file to the work queue, then runs cases taken from the queue until all are done.
+    Any number of processes on any nodes sharing the queue and pickle directories can do this at the same time.
+    A case taken over from a dead worker resumes from that worker's journal.
+    A worker that was too slow to heartbeat and had its case taken over drops the case and goes on to the next one.
+    """
+    total_stime = time.time()
+    work_queue = WorkQueue(args.queue_dir, args.lease_seconds)
+    num_added = work_queue.add_cases(get_cases(args))
+    print(f"Added {num_added} cases to the work queue in {args.queue_dir}.")
+
+    num_cases = 0
+    with TransitionSearchPool(centralizer_str) as search_pool:
+        for claim in work_queue.claims():
+            with claim:
+                start_generating_list, end_generating_list = claim.get_case()
+                try:
+                    run_case(args, transition_pickle_manager, search_pool, start_generating_list,
+                             end_generating_list, claim)
+                except LeaseLost as e:
+                    print(f"WARN: {e} Dropping case {start_generating_list} --> {end_generating_list}.\n")
+                    continue
+                # results have to be on disk before other workers are told the case is done
+                transition_pickle_manager.flush()
+                claim.complete()
+            num_cases += 1
+    total_etime = time.time()
+    print(f"Did {num_cases} cases of the work queue, all cases completed in{total_etime - total_stime : .3f} seconds.")
+
+
 if __name__ == "__main__":
     sp.init_printing()
 
     centralizer_strings = ["a4", "d10", "d6"]
     parser = argparse.ArgumentParser(description="Finds icosahedral virus transitions between point arrays.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument("-d", "--pickle_dir", default="transitions", help="Directory in which the files will be saved. Creates a default \"transitions\" directory if none specified.")
+    parser.add_argument("--store", choices=["pickle", "sqlite"], default="pickle", help="Save each case to its own pickle file, or every case to one SQLite database in the pickle directory.")
+    parser.add_argument("--indexed", action="store_true", help="Save pickle files with an index so single transitions can be read without loading the whole file. Not allowed with --store sqlite.")
     parser.add_argument("-c", "--centralizer", type=str.lower, choices=centralizer_strings, required=True, help="Select the centralizer to be used.")
+    parser.add_argument("-s", "--split-depth", type=int, default=1, help="Number of columns fixed in each parallel task. Larger values split the search into more, smaller tasks.")
+    parser.add_argument("-e", "--exists-only", action="store_true", help="Stop each case as soon as one transition is found. The saved result is marked as an existence proof only.")
+    parser.add_argument("--symmetry-breaking", action="store_true", help="Only search one of each set of branches that are equivalent under the normalizer of the centralizer. Only representative translation pairs get a transition.")
+    parser.add_argument("--expand-symmetric", action="store_true", help="With --symmetry-breaking, map the transitions found onto every equivalent translation pair.")
+    parser.add_argument("--modular-prefilter", action="store_true", help="Try each column pair modulo a few small primes before solving it exactly. Faster when most pairs are unsolvable (as for A4), slower otherwise.")
+    parser.add_argument("--schedule", choices=["file", "longest-first"], default="file", help="Order to run the cases of a case file in: as in the file, or by decreasing predicted cost (the product of the sizes of the case's vector pair tables). Only shortens the total run time with --queue-dir, where several processes take cases at once. Without it the cases run one after another, so the order has no effect on the total time.")
+    parser.add_argument("--plan", help="With --case-file, write the order the cases are run in and their predicted costs to this CSV file.")
+    parser.add_argument("--queue-dir", help="With --case-file, share the cases with every other process given the same work queue directory (on a shared filesystem), each process taking cases from the queue until all are done. Requires --store pickle.")
+    parser.add_argument("--lease-seconds", type=float, default=600, help="With --queue-dir, how long a case held by a worker that stopped responding waits before another worker takes it over.")
     parser.add_argument("-r", "--redo", action="store_true", help="Does all cases given, even if they have already been done before.")
     cases_group = parser.add_mutually_exclusive_group(required=True)
     cases_group.add_argument("--pt-ar", type=str, nargs=2, help="Input the numerical representations of the point arrays")
     cases_group.add_argument("--case-file")
     args = parser.parse_args()
+    if args.queue_dir is not None and args.case_file is None:
+        parser.error("--queue-dir requires --case-file")
+    if args.queue_dir is not None and args.store == "sqlite":
+        parser.error("--queue-dir requires --store pickle, SQLite cannot be written by several nodes on a shared filesystem")
+    if args.indexed and args.store == "sqlite":
+        parser.error("--indexed only applies to --store pickle")
+    if args.schedule != "file" and args.queue_dir is None:
+        print("WARN: Without --queue-dir the cases run one after another, so --schedule does not change the total run time.")
 
     # initialize the pickle manager class
-    transition_pickle_manager = TransitionPickleManager(args.pickle_dir)
+    if args.store == "sqlite":
+        transition_pickle_manager = SQLiteTransitionManager(args.pickle_dir)
+    else:
+        transition_pickle_manager = TransitionPickleManager(args.pickle_dir, indexed=args.indexed)
 
     # get centralizer
     centralizer_str = args.centralizer.upper()
@@ -158,5 +765,8 @@ if __name__ == "__main__":
 
     if args.pt_ar is not None:
         find_transitions_from_cmd_line(args, transition_pickle_manager)
+    elif args.queue_dir is not None:
+        find_transitions_from_queue(args, transition_pickle_manager)
     elif args.case_file is not None:
-        find_transitions_from_case_file(args, transition_pickle_manager)
\ No newline at end of file
+        find_transitions_from_case_file(args, transition_pickle_manager)
+    transition_pickle_manager.flush()
\ No newline at end of file
@@ -1,32 +1,59 @@
+import sympy as sp
 from matrixgroups import a4group, d10group, d6group
+from matrixgroups.solutionspace import get_linear_structure
 
 
-def get_centralizer_str_from_matrix(centralizer):
-    if centralizer == d6group.centralizer():
-        return "D6"
-    elif centralizer == d10group.centralizer():
-        return "D10"
-    elif centralizer == a4group.centralizer():
-        return "A4"
-    else:
-        raise ValueError("Centralizer is not A4, D10, or D6")
+class Centralizer:
+    """
+    Precomputed form of a centralizer C(p) = K + sum_i p_i * E_i, built once and shared by everything using it.
+    The symbols p_i are sorted by sympy's default sort key, which is the order sympy solves for them in.
+    Instances are treated as immutable, so use the registry through get_centralizer instead of building new ones.
+    """
+    def __init__(self, name, matrix):
+        self.name = name
+        self.matrix = sp.ImmutableMatrix(matrix)
+        self.linear_structure = get_linear_structure(self.matrix)
+        self.symbols, self.constant, self.basis = self.linear_structure
 
+    def __repr__(self):
+        return f"Centralizer({self.name})"
 
-def get_centralizer_from_str(centralizer_str):
+
+# registry of the centralizers, each is only built the first time it is asked for
+CENTRALIZER_CONSTRUCTORS = {"A4": a4group.centralizer, "D10": d10group.centralizer, "D6": d6group.centralizer}
+CENTRALIZER_REGISTRY = {}
+
+
+def get_centralizer(centralizer_str):
+    """
+    :return: The shared Centralizer object for "A4", "D10" or "D6" (case insensitive).
+    """
     centralizer_str = centralizer_str.upper()
+    if centralizer_str not in CENTRALIZER_REGISTRY:
+        if centralizer_str not in CENTRALIZER_CONSTRUCTORS:
+            raise ValueError("Centralizer String is not A4, D10, or D6")
+        CENTRALIZER_REGISTRY[centralizer_str] = Centralizer(centralizer_str,
+                                                            CENTRALIZER_CONSTRUCTORS[centralizer_str]())
+    return CENTRALIZER_REGISTRY[centralizer_str]
+
 
-    if centralizer_str == "A4":
-        return a4group.centralizer()
-    elif centralizer_str == "D10":
-        return d10group.centralizer()
-    elif centralizer_str == "D6":
-        return d6group.centralizer()
-    else:
-        raise ValueError("Centralizer String is not A4, D10, or D6")
+def get_centralizer_str_from_matrix(centralizer):
+    for centralizer_str in ["D6", "D10", "A4"]:
+        if centralizer == get_centralizer(centralizer_str).matrix:
+            return centralizer_str
+
+    raise ValueError("Centralizer is not A4, D10, or D6")
+
+
+def get_centralizer_from_str(centralizer_str):
+    # callers get their own mutable copy of the shared matrix
+    return sp.Matrix(get_centralizer(centralizer_str).matrix)
 
 
 def is_centralizer(matrix):
-    if matrix in [a4group.centralizer(), d10group.centralizer(), d6group.centralizer()]:
-        return True
+    try:
+        get_centralizer_str_from_matrix(matrix)
+    except ValueError:
+        return False
 
-    return False
+    return True
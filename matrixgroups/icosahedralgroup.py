@@ -1,5 +1,5 @@
 import sympy as sp
-from matrixgroups import matrixfunctions
+from matrixgroups.signedpermutationgroup import SignedPermutationGroup
 
 ICO = [
     sp.Matrix([
@@ -424,9 +424,12 @@ ICO = [
         [0, 0, 0, 0, 0, -1]])
 ]
 
+# every element of ICO is a signed permutation matrix, so orbits are computed without any matrix multiplication
+ICO_GROUP = SignedPermutationGroup(ICO)
+
 
 def orbitOfVector(vector):
-    return matrixfunctions.orbitOfVector(ICO, vector)
+    return ICO_GROUP.orbit_of_vector(vector)
 
 
 def orbitsOfVectors(vector_list):
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import struct
+from array import array
+import sympy as sp
+from matrixgroups.icosahedralgroup import ICO_GROUP
+from utils.linalg_utils import to_integer_vector
+from virusdata import virusdata
+
+# an orbit catalog file is laid out as
+#   MAGIC | HEADER | one entry per generator
+# where HEADER holds the fingerprint of the group and generators it was built from and the number of entries,
+# and each entry is
+#   ENTRY | name (utf-8) | orbit vectors as signed 64 bit ints, dimension per vector
+# with ENTRY holding the length of the name, the scale, the orbit size and the stabilizer size
+MAGIC = b"ORBCAT\x00\x01"
+HEADER = struct.Struct("<32sI")
+ENTRY = struct.Struct("<HqII")
+ORBIT_CATALOG_FILENAME = "orbit_catalog.bin"
+
+
+def get_catalog_generators():
+    """
+    The generators with a catalog entry, by the names get_single_generator_from_str takes:
+    "f", "b", "s" and the configs 1 - 55 (as strings).
+    :return: Dict from name to the generator as an integer vector (tuple of ints, scale).
+    """
+    names = ["f", "b", "s"] + [str(config) for config in sorted(virusdata.configs)]
+    return {name: to_integer_vector(virusdata.get_single_generator_from_str(name)) for name in names}
+
+
+def get_catalog_fingerprint(generators):
+    """
+    Identifies the group and the generator vectors a catalog was built from, so a stale file is never used.
+    :param generators: Output of get_catalog_generators.
+    """
+    contents = repr((ICO_GROUP.indices, ICO_GROUP.signs, sorted(generators.items())))
+    return hashlib.sha256(contents.encode()).digest()
+
+
+class OrbitCatalog:
+    """
+    The ICO orbits of every generator vector, computed once and shared by everything that needs an orbit.
+    Orbits are kept as integer vectors with a common scale, in the same (sorted) order as icosahedralgroup.orbitOfVector.
+    A reverse index maps every vector of every orbit to the (name, position) pairs it appears at,
+    since several configs share a base vector or an orbit.
+    """
+    def __init__(self, orbits, fingerprint):
+        """
+        :param orbits: Dict from generator name to (list of integer vectors, scale).
+        :param fingerprint: Output of get_catalog_fingerprint for the generators of the orbits.
+        """
+        self.orbits = orbits
+        self.fingerprint = fingerprint
+
+        self.reverse_index = {}
+        for name, (int_orbit, scale) in orbits.items():
+            for position, int_vector in enumerate(int_orbit):
+                self.reverse_index.setdefault((int_vector, scale), []).append((name, position))
+
+    @classmethod
+    def build(cls):
+        generators = get_catalog_generators()
+        orbits = {name: (ICO_GROUP.orbit_of_int_vector(int_vector), scale)
+                  for name, (int_vector, scale) in generators.items()}
+        return cls(orbits, get_catalog_fingerprint(generators))
+
+    def save(self, filename):
+        """
+        Writes the catalog next to filename and moves it into place, so readers never see half of it.
+        """
+        # processes sharing a directory can save at the same time, each writes its own temporary file
+        temp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(temp_filename, 'wb') as write_file:
+            write_file.write(MAGIC)
+            write_file.write(HEADER.pack(self.fingerprint, len(self.orbits)))
+            for name, (int_orbit, scale) in self.orbits.items():
+                encoded_name = name.encode()
+                write_file.write(ENTRY.pack(len(encoded_name), scale, len(int_orbit), self.stabilizer_size(name)))
+                write_file.write(encoded_name)
+                write_file.write(array('q', (entry for int_vector in int_orbit for entry in int_vector)).tobytes())
+        os.replace(temp_filename, filename)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        :raise: ValueError if the file is not an orbit catalog.
+        """
+        with open(filename, 'rb') as read_file:
+            data = read_file.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{filename} is not an orbit catalog.")
+
+        offset = len(MAGIC)
+        fingerprint, num_entries = HEADER.unpack_from(data, offset)
+        offset += HEADER.size
+
+        orbits = {}
+        dimension = ICO_GROUP.dimension
+        for _ in range(num_entries):
+            name_length, scale, orbit_size, _ = ENTRY.unpack_from(data, offset)
+            offset += ENTRY.size
+            name = data[offset:offset + name_length].decode()
+            offset += name_length
+
+            entries = array('q')
+            entries.frombytes(data[offset:offset + 8 * dimension * orbit_size])
+            offset += 8 * dimension * orbit_size
+            orbits[name] = ([tuple(entries[i:i + dimension]) for i in range(0, len(entries), dimension)], scale)
+
+        return cls(orbits, fingerprint)
+
+    def __contains__(self, name):
+        return str(name) in self.orbits
+
+    def names(self):
+        return list(self.orbits)
+
+    def get_int_orbit(self, name):
+        """
+        :param name: Generator name, e.g. "s" or 12.
+        :return: (list of integer vectors, scale), the orbit being the integer vectors divided by scale.
+        """
+        if str(name) not in self.orbits:
+            raise ValueError(f"Input \"{name}\" is not f, b, s or a number 1 - 55.")
+        return self.orbits[str(name)]
+
+    def get_orbit(self, name):
+        """
+        The orbit as sympy vectors, the same as icosahedralgroup.orbitOfVector of the generator.
+        """
+        int_orbit, scale = self.get_int_orbit(name)
+        return [sp.Matrix([sp.Rational(entry, scale) for entry in int_vector]) for int_vector in int_orbit]
+
+    def orbit_size(self, name):
+        return len(self.get_int_orbit(name)[0])
+
+    def stabilizer_size(self, name):
+        return len(ICO_GROUP) // self.orbit_size(name)
+
+    def find(self, vector):
+        """
+        Looks up which orbits a vector (e.g. a column of B0) lies in.
+        :return: List of (name, position) with the vector at that position of the name's orbit, empty if it is in none.
+        """
+        return list(self.reverse_index.get(to_integer_vector(vector), []))
+
+
+# catalog of the current process, see get_orbit_catalog
+orbit_catalog = {}
+
+
+def get_orbit_catalog(filename=None):
+    """
+    The orbit catalog, built or loaded once per process.
+    If a filename is given the catalog is loaded from it, or saved to it if the file is missing or stale.
+    """
+    if "catalog" not in orbit_catalog:
+        fingerprint = get_catalog_fingerprint(get_catalog_generators())
+        catalog = None
+        if filename is not None and os.path.exists(filename):
+            try:
+                catalog = OrbitCatalog.load(filename)
+            except (ValueError, struct.error, UnicodeDecodeError):
+                catalog = None
+        if catalog is None or catalog.fingerprint != fingerprint:
+            catalog = OrbitCatalog.build()
+            if filename is not None:
+                catalog.save(filename)
+        orbit_catalog["catalog"] = catalog
+
+    catalog = orbit_catalog["catalog"]
+    if filename is not None and not os.path.exists(filename):
+        catalog.save(filename)
+    return catalog
@@ -0,0 +1,89 @@
+import sympy as sp
+from utils.linalg_utils import to_integer_vector
+
+
+def to_signed_permutation(matrix):
+    """
+    Converts a signed permutation matrix M into index and sign arrays, so that (M * v)[r] = signs[r] * v[indices[r]].
+    :param matrix: Square sympy matrix with exactly one entry of +-1 in every row and column.
+    :return: (indices, signs) as tuples of ints.
+    :raise: ValueError if the matrix is not a signed permutation matrix.
+    """
+    indices = []
+    signs = []
+    for r in range(matrix.rows):
+        nonzero = [(c, matrix[r, c]) for c in range(matrix.cols) if matrix[r, c] != 0]
+        if len(nonzero) != 1 or nonzero[0][1] not in [1, -1]:
+            raise ValueError(f"Row {r} of matrix is not a row of a signed permutation matrix.")
+        indices.append(nonzero[0][0])
+        signs.append(int(nonzero[0][1]))
+
+    if sorted(indices) != list(range(matrix.cols)):
+        raise ValueError("Matrix is not a signed permutation matrix.")
+
+    return tuple(indices), tuple(signs)
+
+
+class SignedPermutationGroup:
+    """
+    A finite group of signed permutation matrices stored as index and sign arrays.
+    Elements are referred to by their position in the list of matrices the group was built from.
+    """
+    def __init__(self, matrices):
+        self.indices, self.signs = [], []
+        for matrix in matrices:
+            indices, signs = to_signed_permutation(matrix)
+            self.indices.append(indices)
+            self.signs.append(signs)
+
+        self.dimension = len(self.indices[0])
+        self.element_lookup = {(indices, signs): g for g, (indices, signs) in enumerate(zip(self.indices, self.signs))}
+
+        # multiplication_table[g][h] is the element g * h
+        self.multiplication_table = [[self.element_lookup[self._compose(g, h)] for h in range(len(self))]
+                                     for g in range(len(self))]
+        self.identity = self.element_lookup[(tuple(range(self.dimension)), (1,) * self.dimension)]
+        self.inverses = [row.index(self.identity) for row in self.multiplication_table]
+
+    def __len__(self):
+        return len(self.indices)
+
+    def _compose(self, g, h):
+        # (g * h * v)[r] = signs_g[r] * signs_h[indices_g[r]] * v[indices_h[indices_g[r]]]
+        indices = tuple(self.indices[h][i] for i in self.indices[g])
+        signs = tuple(s * self.signs[h][i] for s, i in zip(self.signs[g], self.indices[g]))
+        if (indices, signs) not in self.element_lookup:
+            raise ValueError(f"Matrices do not form a group: the product of elements {g} and {h} is missing.")
+        return indices, signs
+
+    def apply(self, g, vector):
+        """
+        Applies element g to an integer vector.
+        :param g: Index of the group element.
+        :param vector: Tuple of ints.
+        :return: Tuple of ints.
+        """
+        return tuple(s * vector[i] for s, i in zip(self.signs[g], self.indices[g]))
+
+    def conjugate(self, g, matrix):
+        """
+        Computes g * M * g^-1 for a square matrix M given as a list of rows.
+        Since g is a signed permutation matrix, g^-1 is its transpose.
+        """
+        indices, signs = self.indices[g], self.signs[g]
+        return [[signs[r] * signs[c] * matrix[indices[r]][indices[c]] for c in range(self.dimension)]
+                for r in range(self.dimension)]
+
+    def orbit_of_int_vector(self, vector):
+        """
+        Orbit of an integer vector, sorted lexicographically.
+        """
+        return sorted({self.apply(g, vector) for g in range(len(self))})
+
+    def orbit_of_vector(self, vector):
+        """
+        Orbit of a sympy vector, in the same order as matrixfunctions.orbitOfVector.
+        """
+        int_vector, scale = to_integer_vector(vector)
+        return [sp.Matrix([sp.Rational(entry, scale) for entry in orbit_vector])
+                for orbit_vector in self.orbit_of_int_vector(int_vector)]
@@ -0,0 +1,207 @@
+from fractions import Fraction
+import random
+import sympy as sp
+from sympy.polys.matrices import DomainMatrix
+from utils.linalg_utils import (AffineSubspace, IntegerEchelonBasis, determinant_mod, fraction_mod,
+                                is_inconsistent_mod, mat_vec, to_fraction_vector, to_integer_vector)
+
+# the nonsingularity check evaluates the determinant at random points modulo this prime
+NONSINGULARITY_PRIME = 2 ** 61 - 1
+NONSINGULARITY_SAMPLES = 2
+nonsingularity_rng = random.Random(0)
+
+
+def get_linear_structure(centralizer):
+    """
+    Writes a centralizer as C = K + sum_i p_i * E_i where the p_i are its symbols.
+    :param centralizer: Sympy matrix whose entries are linear in its free symbols.
+    :return: (symbols, K, [E_1, ..., E_n]) with K and E_i given as lists of rows of Fractions.
+    :raise: ValueError if the centralizer is not linear in its symbols.
+    """
+    symbols = sorted(centralizer.free_symbols, key=sp.default_sort_key)
+    symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+
+    constant = [[Fraction(0)] * centralizer.cols for _ in range(centralizer.rows)]
+    basis = [[[Fraction(0)] * centralizer.cols for _ in range(centralizer.rows)] for _ in symbols]
+    for r in range(centralizer.rows):
+        for c in range(centralizer.cols):
+            for term, coefficient in sp.sympify(centralizer[r, c]).as_coefficients_dict().items():
+                if term == 1:
+                    constant[r][c] += to_fraction_vector([coefficient])[0]
+                elif term in symbol_index:
+                    basis[symbol_index[term]][r][c] += to_fraction_vector([coefficient])[0]
+                else:
+                    raise ValueError(f"Centralizer entry {centralizer[r, c]} is not linear in its symbols.")
+
+    return symbols, constant, basis
+
+
+def get_linear_system(linear_structure, v0, v1):
+    """
+    The linear system A(v0) * p = v1 - K * v0 in the parameters that is equivalent to C(p) * v0 = v1,
+    where the columns of A(v0) are the E_i * v0.
+    :return: (rows, rhs) as lists of Fractions.
+    """
+    _, constant, basis = linear_structure
+    v0 = to_fraction_vector(v0)
+    images = [mat_vec(basis_matrix, v0) for basis_matrix in basis]
+    rows = [[image[r] for image in images] for r in range(len(v0))]
+    rhs = [value - constant_value for value, constant_value in zip(to_fraction_vector(v1), mat_vec(constant, v0))]
+    return rows, rhs
+
+
+def get_solvable_pairs(linear_structure, start_vectors, end_vectors):
+    """
+    Finds every pair (v0, v1) for which C * v0 = v1 has a solution for some choice of the centralizer's parameters.
+    Since C * v0 = K * v0 + A(v0) * p where the columns of A(v0) are the E_i * v0, this holds exactly when
+    v1 - K * v0 is in the column space of A(v0), which is tested with integer arithmetic.
+    :param linear_structure: Output of get_linear_structure for the centralizer.
+    :param start_vectors: List of sympy vectors.
+    :param end_vectors: List of sympy vectors.
+    :return: List of index pairs (i, j), ordered the same as itertools.product(start_vectors, end_vectors).
+    """
+    _, constant, basis = linear_structure
+    end_fractions = [to_fraction_vector(v1) for v1 in end_vectors]
+
+    solvable_pairs = []
+    for i, v0 in enumerate(start_vectors):
+        v0 = to_fraction_vector(v0)
+        column_space = IntegerEchelonBasis(to_integer_vector(mat_vec(basis_matrix, v0))[0] for basis_matrix in basis)
+        constant_image = mat_vec(constant, v0)
+
+        for j, v1 in enumerate(end_fractions):
+            rhs, _ = to_integer_vector(value - constant_value for value, constant_value in zip(v1, constant_image))
+            if column_space.contains(rhs):
+                solvable_pairs.append((i, j))
+
+    return solvable_pairs
+
+
+class CentralizerSolutionSpace:
+    """
+    Keeps track of every choice of the centralizer's parameters solving T * B0 = B1 for the columns seen so far.
+    Adding a column intersects the current affine subspace of parameters with a small linear system,
+    so nothing needs to be solved symbolically until the matrix itself is wanted.
+    """
+    def __init__(self, centralizer, linear_structure=None, subspace=None):
+        self.centralizer = centralizer
+        self.linear_structure = linear_structure or get_linear_structure(centralizer)
+        self.symbols, self.constant, self.basis = self.linear_structure
+        self.subspace = subspace or AffineSubspace.whole_space(len(self.symbols))
+        self.modular_subspaces = {}
+
+    def intersect(self, v0, v1):
+        """
+        Adds the column pair T * v0 = v1.
+        :return: The new CentralizerSolutionSpace or None if no choice of parameters works.
+        """
+        return self.intersect_system(*get_linear_system(self.linear_structure, v0, v1))
+
+    def intersect_system(self, rows, rhs):
+        """
+        Adds the column pair whose linear system (from get_linear_system) is rows * p = rhs.
+        """
+        subspace = self.subspace.intersect(rows, rhs)
+        if subspace is None:
+            return None
+
+        return CentralizerSolutionSpace(self.centralizer, self.linear_structure, subspace)
+
+    def get_modular_subspace(self, prime):
+        # (particular, directions) mod prime, or None if a denominator is divisible by the prime
+        if prime not in self.modular_subspaces:
+            particular = [fraction_mod(value, prime) for value in self.subspace.particular]
+            directions = [[fraction_mod(value, prime) for value in direction] for direction in self.subspace.directions]
+            if None in particular or any(None in direction for direction in directions):
+                self.modular_subspaces[prime] = None
+            else:
+                self.modular_subspaces[prime] = (particular, directions)
+        return self.modular_subspaces[prime]
+
+    def rules_out(self, modular_systems):
+        """
+        Pre-filter for intersect_system working only with word sized integers. Only worth calling when most pairs
+        are unsolvable, since a pair it does not rule out still has to be intersected exactly.
+        :param modular_systems: Output of get_modular_systems for the new column pair.
+        :return: True if the column pair certainly has no solution together with the current ones.
+                 False means the exact intersection still has to be done.
+        """
+        for prime, rows, rhs in modular_systems:
+            modular_subspace = self.get_modular_subspace(prime)
+            if modular_subspace is None:
+                continue
+
+            # substituting p = particular + directions^T q gives the system in the free parameters q
+            particular, directions = modular_subspace
+            reduced_rows = [[sum(a * d for a, d in zip(row, direction)) % prime for direction in directions]
+                            for row in rows]
+            reduced_rhs = [(value - sum(a * p for a, p in zip(row, particular))) % prime
+                           for row, value in zip(rows, rhs)]
+            if is_inconsistent_mod(reduced_rows, reduced_rhs, prime):
+                return True
+
+        return False
+
+    def intersect_columns(self, B0, B1):
+        solution_space = self
+        for col in range(B0.shape[1]):
+            solution_space = solution_space.intersect(B0.col(col), B1.col(col))
+            if solution_space is None:
+                return None
+
+        return solution_space
+
+    def is_nonsingular(self, num_samples=NONSINGULARITY_SAMPLES):
+        """
+        Whether det C(p) is not identically zero in the free parameters of the solution space.
+        The determinant is a polynomial of degree at most 6 in the free parameters, so by Schwartz-Zippel a random point
+        mod a 61 bit prime is a root of a nonzero determinant with probability at most 6 / 2^61.
+        A nonzero value at any point proves the determinant is nonzero, and only when every sample is zero is the
+        determinant computed exactly, so the answer is always the exact one.
+        """
+        prime = NONSINGULARITY_PRIME
+        particular = [fraction_mod(value, prime) for value in self.subspace.particular]
+        directions = [[fraction_mod(value, prime) for value in direction] for direction in self.subspace.directions]
+        constant = [[fraction_mod(value, prime) for value in row] for row in self.constant]
+        basis = [[[fraction_mod(value, prime) for value in row] for row in basis_matrix] for basis_matrix in self.basis]
+
+        # a denominator divisible by the prime would need another prime, which is left to the exact check
+        if all(value is not None for value in particular + [v for d in directions for v in d]
+               + [v for row in constant for v in row] + [v for m in basis for row in m for v in row]):
+            for _ in range(num_samples):
+                params = list(particular)
+                for direction in directions:
+                    q = nonsingularity_rng.randrange(prime)
+                    params = [p + q * d for p, d in zip(params, direction)]
+
+                rows = [list(row) for row in constant]
+                for p, basis_matrix in zip(params, basis):
+                    if p % prime != 0:
+                        rows = [[a + p * b for a, b in zip(row, basis_row)] for row, basis_row in zip(rows, basis_matrix)]
+
+                if determinant_mod(rows, prime) != 0:
+                    return True
+
+        # the determinant over the polynomial ring of the free symbols is exact and much faster than sympy's
+        return DomainMatrix.from_Matrix(self.get_centralizer()).det() != 0
+
+    def get_centralizer(self):
+        """
+        Substitutes the solved parameters into the centralizer, leaving the free parameters as symbols.
+        """
+        free_symbols = [self.symbols[i] for i in self.subspace.free_coordinates]
+        solution = {}
+        for i, symbol in enumerate(self.symbols):
+            if i in self.subspace.free_coordinates:
+                continue
+
+            value = sp.Rational(self.subspace.particular[i].numerator, self.subspace.particular[i].denominator)
+            for free_symbol, direction in zip(free_symbols, self.subspace.directions):
+                if direction[i] != 0:
+                    value += sp.Rational(direction[i].numerator, direction[i].denominator) * free_symbol
+            solution[symbol] = value
+
+        if len(solution) == 0:
+            return self.centralizer
+
+        return self.centralizer.subs(solution)
@@ -0,0 +1,91 @@
+from matrixgroups import icosahedralgroup
+from utils.linalg_utils import IntegerEchelonBasis, to_integer_vector
+
+
+def get_normalizer(linear_structure, group=icosahedralgroup.ICO_GROUP):
+    """
+    Finds the elements g of the group with g * C(p) * g^-1 = C(p') for every choice of parameters p.
+    For such g, if T * B0 = B1 then (g T g^-1) * (g B0) = g B1 is an equivalent solution.
+    :param linear_structure: Output of solutionspace.get_linear_structure for the centralizer C = K + sum_i p_i E_i.
+    :return: List of indices of group elements, starting with the identity.
+    """
+    _, constant, basis = linear_structure
+
+    def flatten(matrix):
+        return [entry for row in matrix for entry in row]
+
+    span = IntegerEchelonBasis(to_integer_vector(flatten(basis_matrix))[0] for basis_matrix in basis)
+
+    normalizer = []
+    for g in range(len(group)):
+        conjugated_constant = group.conjugate(g, constant)
+        # both g K g^-1 - K and every g E_i g^-1 have to be in the span of the E_i
+        differences = [flatten(conjugated_constant)[i] - entry for i, entry in enumerate(flatten(constant))]
+        if not span.contains(to_integer_vector(differences)[0]):
+            continue
+        if all(span.contains(to_integer_vector(flatten(group.conjugate(g, basis_matrix)))[0]) for basis_matrix in basis):
+            normalizer.append(g)
+
+    normalizer.sort(key=lambda g: g != group.identity)
+    return normalizer
+
+
+class PairSymmetry:
+    """
+    Action of the normalizer of a centralizer on the vector pairs of a case, used to skip equivalent branches.
+    The translation pairs are only searched for one representative (the smallest index) of each normalizer orbit,
+    and the pairs of the next column only for one representative under the stabilizer of the translation pair.
+    This keeps whether a transition exists for a translation pair, but not which transition is found first.
+    """
+    def __init__(self, linear_structure, integer_pairs):
+        """
+        :param linear_structure: Output of solutionspace.get_linear_structure for the centralizer.
+        :param integer_pairs: For each column, the list of vector pairs scaled to integers.
+        """
+        group = icosahedralgroup.ICO_GROUP
+        lookups = [{pair: i for i, pair in enumerate(pairs)} for pairs in integer_pairs]
+
+        # the full pair tables are unions of normalizer orbits, but only elements mapping every table
+        # onto itself are kept in case a table was cut down
+        self.normalizer = [g for g in get_normalizer(linear_structure, group)
+                           if all((group.apply(g, v0), group.apply(g, v1)) in lookup
+                                  for pairs, lookup in zip(integer_pairs, lookups) for v0, v1 in pairs)]
+
+        # permutations[depth][n][i] is the index of the image of pair i under the n-th normalizer element
+        self.permutations = [[[lookup[(group.apply(g, v0), group.apply(g, v1))] for v0, v1 in pairs]
+                              for g in self.normalizer]
+                             for pairs, lookup in zip(integer_pairs, lookups)]
+
+        self.stabilizers = {}
+
+    def get_stabilizer(self, translation_index):
+        if translation_index not in self.stabilizers:
+            self.stabilizers[translation_index] = [n for n, permutation in enumerate(self.permutations[0])
+                                                   if permutation[translation_index] == translation_index]
+        return self.stabilizers[translation_index]
+
+    def is_canonical(self, path, index):
+        """
+        Whether the pair at index, following the pair indices in path, should be searched.
+        """
+        if len(path) == 0:
+            return index == min(permutation[index] for permutation in self.permutations[0])
+        if len(path) == 1 and len(self.permutations) > 1:
+            return index == min(self.permutations[1][n][index] for n in self.get_stabilizer(path[0]))
+        return True
+
+    def expand(self, results):
+        """
+        Fills in the results of the translation pairs that were skipped.
+        If g maps the representative's translation pair to another one, (g T g^-1, g B0, g B1) is a transition for it.
+        :param results: Dict from representative translation index to (T, B0, B1).
+        :return: Dict from translation index to (T, B0, B1) for every translation pair in the orbit of a result.
+        """
+        expanded = {}
+        for translation_index, (T, B0, B1) in results.items():
+            for g, permutation in zip(self.normalizer, self.permutations[0]):
+                image = permutation[translation_index]
+                if image not in expanded:
+                    g_matrix = icosahedralgroup.ICO[g]
+                    expanded[image] = (g_matrix * T * g_matrix.T, g_matrix * B0, g_matrix * B1)
+        return expanded
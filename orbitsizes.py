@@ -1,11 +1,10 @@
 # this program computes the ICO orbit sizes of the 55 standard 1 base point arrays
-from matrixgroups import icosahedralgroup
+from matrixgroups.orbitcatalog import get_orbit_catalog
 from virusdata import virusdata
 
 if __name__ == "__main__":
-    BASE_STR = virusdata.BASE_STR
     TRANSLATION_STR = virusdata.TRANSLATION_STR
+    catalog = get_orbit_catalog()
     for i in range(1, 56):
-        base_ico_orbit = icosahedralgroup.orbitOfVector(virusdata.configs[i][BASE_STR])
-        translation_ico_orbit = icosahedralgroup.orbitOfVector(virusdata.configs[i][TRANSLATION_STR])
-        print(f"{i} orbit sizes (t, v):\t{len(translation_ico_orbit)}\t{len(base_ico_orbit)}")
+        translation_str = virusdata.get_translation_vector_str(virusdata.configs[i][TRANSLATION_STR])
+        print(f"{i} orbit sizes (t, v):\t{catalog.orbit_size(translation_str)}\t{catalog.orbit_size(i)}")
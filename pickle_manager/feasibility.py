@@ -0,0 +1,79 @@
+import itertools
+
+NUM_CONFIGS = 55
+
+
+def get_column_pairs_key(start_tuple, end_tuple):
+    """
+    Normalizes a case into its sorted (start, end) column pairs.
+    Reordering the columns of B0 and B1 together does not change which T solve T * B0 = B1,
+    so cases with the same key are either both possible or both impossible.
+    """
+    return tuple(sorted(zip(map(int, start_tuple), map(int, end_tuple))))
+
+
+class FeasibilityIndex:
+    """
+    What the saved results of one centralizer say about which cases are impossible.
+    One-base cases are kept in two packed 55x55 bitsets, one for the cases whose result is known
+    and one for those with no transitions. Impossible multi-base cases are kept as a set of column pair keys.
+    A transition of a case restricts to a transition of every case made of some of its columns,
+    so a case is impossible as soon as any sub-case of it is known to be.
+    """
+    def __init__(self):
+        num_bytes = (NUM_CONFIGS * NUM_CONFIGS + 7) // 8
+        self.known = bytearray(num_bytes)
+        self.infeasible = bytearray(num_bytes)
+        self.infeasible_keys = set()
+        self.max_infeasible_size = 1
+
+    @staticmethod
+    def get_bit(start, end):
+        return (int(start) - 1) * NUM_CONFIGS + int(end) - 1
+
+    def record(self, start_tuple, end_tuple, num_transitions):
+        """
+        Records the number of transitions saved for a case.
+        """
+        if len(start_tuple) == 1:
+            bit = self.get_bit(start_tuple[0], end_tuple[0])
+            self.known[bit // 8] |= 1 << (bit % 8)
+            if num_transitions == 0:
+                self.infeasible[bit // 8] |= 1 << (bit % 8)
+            else:
+                self.infeasible[bit // 8] &= ~(1 << (bit % 8))
+            return
+
+        key = get_column_pairs_key(start_tuple, end_tuple)
+        if num_transitions == 0:
+            self.infeasible_keys.add(key)
+            self.max_infeasible_size = max(self.max_infeasible_size, len(key))
+        else:
+            self.infeasible_keys.discard(key)
+
+    def lookup(self, start, end):
+        """
+        :return: Whether the one-base case start --> end has transitions, or None if its result is not known.
+        """
+        bit = self.get_bit(start, end)
+        if not self.known[bit // 8] >> (bit % 8) & 1:
+            return None
+        return not self.infeasible[bit // 8] >> (bit % 8) & 1
+
+    def find_infeasible_sub_case(self, start_tuple, end_tuple):
+        """
+        Looks for a known impossible case made of some of the columns of a case, smallest first.
+        :return: (start_tuple, end_tuple) of the impossible sub-case, or None if there is none.
+        """
+        for start, end in zip(start_tuple, end_tuple):
+            if self.lookup(start, end) is False:
+                return [start], [end]
+
+        column_pairs = list(zip(start_tuple, end_tuple))
+        for size in range(2, min(len(column_pairs), self.max_infeasible_size) + 1):
+            for sub_pairs in itertools.combinations(column_pairs, size):
+                sub_start, sub_end = map(list, zip(*sub_pairs))
+                if get_column_pairs_key(sub_start, sub_end) in self.infeasible_keys:
+                    return sub_start, sub_end
+
+        return None
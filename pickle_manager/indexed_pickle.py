@@ -0,0 +1,145 @@
+import mmap
+import os
+import pickle
+import struct
+
+# an indexed pickle file is laid out as
+#   MAGIC | pickled item 0 | pickled item 1 | ... | offsets of the items and of the index (uint64 each) | FOOTER
+# where FOOTER holds the number of items and the offset of the index, so the n-th item is read without the rest
+MAGIC = b"TPACK\x00\x01\n"
+FOOTER = struct.Struct("<QQ")
+OFFSET = struct.Struct("<Q")
+
+
+def write_indexed_pickle(filename, items):
+    """
+    Writes a list of objects so that each one can be unpickled on its own.
+    :param filename: Path of the file to write.
+    :param items: Iterable of picklable objects.
+    """
+    offsets = []
+    with open(filename, 'wb') as write_file:
+        write_file.write(MAGIC)
+        for item in items:
+            offsets.append(write_file.tell())
+            pickle.dump(item, write_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        index_offset = write_file.tell()
+        offsets.append(index_offset)
+        write_file.write(b"".join(OFFSET.pack(offset) for offset in offsets))
+        write_file.write(FOOTER.pack(len(offsets) - 1, index_offset))
+
+
+def is_indexed_pickle(filename):
+    with open(filename, 'rb') as read_file:
+        return read_file.read(len(MAGIC)) == MAGIC
+
+
+def count_indexed_pickle(filename):
+    """
+    Number of items in an indexed pickle file, read from its footer.
+    """
+    with open(filename, 'rb') as read_file:
+        read_file.seek(-FOOTER.size, 2)
+        count, _ = FOOTER.unpack(read_file.read(FOOTER.size))
+        return count
+
+
+def load_pickle_file(filename):
+    """
+    Loads a whole pickle file, whether it is a plain pickle or an indexed one.
+    Indexed files are returned as a list.
+    """
+    if is_indexed_pickle(filename):
+        with IndexedPickleReader(filename) as reader:
+            return list(reader)
+
+    with open(filename, 'rb') as read_file:
+        return pickle.load(read_file)
+
+
+class IndexedPickleReader:
+    """
+    Read only sequence over the items of an indexed pickle file.
+    The file is memory mapped, so only the items that are actually looked at are read and unpickled.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as read_file:
+            self.mmap = mmap.mmap(read_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.mmap[:len(MAGIC)] != MAGIC:
+            self.mmap.close()
+            raise ValueError(f"{filename} is not an indexed pickle file.")
+
+        self.count, self.index_offset = FOOTER.unpack_from(self.mmap, len(self.mmap) - FOOTER.size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.mmap.close()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(f"Index {index} out of range for {self.count} items.")
+
+        start, end = struct.unpack_from("<QQ", self.mmap, self.index_offset + index * OFFSET.size)
+        return pickle.loads(self.mmap[start:end])
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+
+def write_indexed_bundle(filename, mapping):
+    """
+    Writes a dict to an indexed pickle file so that each value can be read on its own.
+    The first item of the file maps every key to the position of its value.
+    The file is written next to its final location and moved into place, so readers never see half of it.
+    """
+    keys = list(mapping)
+    temp_filename = filename + ".tmp"
+    write_indexed_pickle(temp_filename, [{key: i + 1 for i, key in enumerate(keys)}] + [mapping[key] for key in keys])
+    os.replace(temp_filename, filename)
+
+
+class IndexedBundleReader:
+    """
+    Read only dict view of a file written by write_indexed_bundle. Values are unpickled when they are looked up.
+    """
+    def __init__(self, filename):
+        self.reader = IndexedPickleReader(filename)
+        self.positions = self.reader[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.reader.close()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def __getitem__(self, key):
+        return self.reader[self.positions[key]]
+
+    def keys(self):
+        return self.positions.keys()
@@ -0,0 +1,70 @@
+import json
+import os
+
+# the manifest is a JSON lines file in the pickle directory with one entry per saved transition file
+# entries are only ever appended by writers, a later entry for the same file replaces the earlier ones
+MANIFEST_FILENAME = "manifest.jsonl"
+
+
+def get_manifest_filename(pickle_dir):
+    return os.path.join(pickle_dir, MANIFEST_FILENAME)
+
+
+def make_manifest_entry(pickle_dir, filename, count):
+    """
+    Records the number of transitions in a file along with its size and modification time,
+    which tell readers whether the entry still describes the file.
+    :param filename: Name of the file within pickle_dir.
+    """
+    stat = os.stat(os.path.join(pickle_dir, filename))
+    return {"file": filename, "count": count, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+
+def entry_is_current(pickle_dir, entry):
+    try:
+        stat = os.stat(os.path.join(pickle_dir, entry["file"]))
+    except FileNotFoundError:
+        return False
+    return stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime"]
+
+
+def read_manifest(pickle_dir):
+    """
+    :return: Dict from file name to its latest manifest entry.
+    """
+    entries = {}
+    manifest_filename = get_manifest_filename(pickle_dir)
+    if not os.path.exists(manifest_filename):
+        return entries
+
+    with open(manifest_filename, 'r') as read_file:
+        for line in read_file:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # a line cut off by a killed writer
+                continue
+            entries[entry["file"]] = entry
+
+    return entries
+
+
+def append_manifest_entries(pickle_dir, entries):
+    # each entry is written with a single call, so appends from several processes do not interleave
+    with open(get_manifest_filename(pickle_dir), 'a') as write_file:
+        for entry in entries:
+            write_file.write(json.dumps(entry) + "\n")
+            write_file.flush()
+
+
+def rewrite_manifest(pickle_dir, entries):
+    """
+    Replaces the manifest with one entry per file, dropping the entries that were overwritten.
+    An entry appended by a writer while this runs can be lost, which only means the file gets counted again.
+    :param entries: Dict from file name to manifest entry.
+    """
+    temp_filename = get_manifest_filename(pickle_dir) + ".tmp"
+    with open(temp_filename, 'w') as write_file:
+        for filename in sorted(entries):
+            write_file.write(json.dumps(entries[filename]) + "\n")
+    os.replace(temp_filename, get_manifest_filename(pickle_dir))
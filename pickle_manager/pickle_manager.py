@@ -1,13 +1,13 @@
-import itertools
+import json
 import os
 import pickle
 import re
-import sympy as sp
-from tqdm.auto import tqdm
 import sys
-from matrixgroups import icosahedralgroup, centralizers
+from matrixgroups import centralizers, orbitcatalog, solutionspace
+from pickle_manager import indexed_pickle, manifest
+from pickle_manager.feasibility import FeasibilityIndex
+from pickle_manager.work_queue import get_temp_filename, write_json_atomically
 import utils.generatinglist_utils as genlist_utils
-import utils.sympy_utils as sp_utils
 from virusdata import virusdata
 
 
@@ -19,15 +19,23 @@ class PickleManager:
 
         self.pickle_directory = pickle_directory
 
-    def get_transition_pickle_filename(self, start_tuple, end_tuple, centralizer_string, exclude_dir=False):
+    @staticmethod
+    def get_case_key(start_tuple, end_tuple, centralizer_string):
+        """
+        Normalizes a case into the strings used to name its results, e.g. ([1], [2, 3], "a4") becomes ("1", "2,3", "A4").
+        """
         # convert tuples of length 1 to ints
         if hasattr(start_tuple, '__len__') and len(start_tuple) == 1:
             start_tuple = start_tuple[0]
         if hasattr(start_tuple, '__len__') and len(end_tuple) == 1:
             end_tuple = end_tuple[0]
 
-        centralizer_string = centralizer_string.upper()
-        case_filename = re.sub('[()\[\] ]', '', f"{start_tuple}_to_{end_tuple}_{centralizer_string}.pickle")
+        return (re.sub('[()\[\] ]', '', str(start_tuple)), re.sub('[()\[\] ]', '', str(end_tuple)),
+                centralizer_string.upper())
+
+    def get_transition_pickle_filename(self, start_tuple, end_tuple, centralizer_string, exclude_dir=False):
+        start_str, end_str, centralizer_string = self.get_case_key(start_tuple, end_tuple, centralizer_string)
+        case_filename = f"{start_str}_to_{end_str}_{centralizer_string}.pickle"
 
         if exclude_dir:
             return case_filename
@@ -39,15 +47,131 @@ class PickleManager:
         return os.path.exists(pickle_filename)
 
     def get_pickle_data(self, start_tuple, end_tuple, centralizer_string):
-        with open(self.get_transition_pickle_filename(start_tuple, end_tuple, centralizer_string), 'rb') as read_file:
-            return pickle.load(read_file)
+        return indexed_pickle.load_pickle_file(self.get_transition_pickle_filename(start_tuple, end_tuple,
+                                                                                   centralizer_string))
+
+    def get_case_location(self, start_tuple, end_tuple, centralizer_string):
+        """
+        Where the results of a case are stored, for messages.
+        """
+        return self.get_transition_pickle_filename(start_tuple, end_tuple, centralizer_string)
 
 
 class TransitionPickleManager(PickleManager):
-    def save_transitions(self, start_tuple, end_tuple, centralizer_string, transitions):
-        with open(self.get_transition_pickle_filename(start_tuple, end_tuple, centralizer_string), 'wb') as write_file:
-            pickle.dump(transitions, write_file, protocol=pickle.HIGHEST_PROTOCOL)
-            print(f"Saved {start_tuple} --> {end_tuple} under {centralizer_string} to {write_file.name}.")
+    def __init__(self, pickle_directory, indexed=False):
+        """
+        :param indexed: Save transitions as indexed pickle files, so single transitions can be read without the rest.
+                        Both kinds of file are always readable.
+        """
+        super().__init__(pickle_directory)
+        self.indexed = indexed
+
+        # feasibility indexes by centralizer, built the first time a centralizer's cases are checked
+        self.feasibility_indexes = {}
+        # manifest entries by file name, read when the first feasibility index is built
+        self.manifest_entries = None
+
+    def save_transitions(self, start_tuple, end_tuple, centralizer_string, transitions, metadata=None):
+        """
+        Saves transitions to file and records the number of transitions in the directory's manifest.
+        If metadata (a JSON serializable dict) is given it is saved in a sidecar JSON file next to the pickle,
+        otherwise any old sidecar for the case is removed.
+        Both files are written next to their place and moved into it, sidecar first, so a process killed while saving
+        never leaves a cut off result that looks finished.
+        """
+        metadata_filename = self.get_metadata_filename(start_tuple, end_tuple, centralizer_string)
+        if metadata is not None:
+            write_json_atomically(metadata_filename, metadata, indent=2)
+        elif os.path.exists(metadata_filename):
+            os.remove(metadata_filename)
+
+        pickle_filename = self.get_transition_pickle_filename(start_tuple, end_tuple, centralizer_string)
+        temp_filename = get_temp_filename(pickle_filename)
+        if self.indexed:
+            indexed_pickle.write_indexed_pickle(temp_filename, transitions)
+        else:
+            with open(temp_filename, 'wb') as write_file:
+                pickle.dump(transitions, write_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_filename, pickle_filename)
+        print(f"Saved {start_tuple} --> {end_tuple} under {centralizer_string} to {pickle_filename}.")
+
+        entry = manifest.make_manifest_entry(self.pickle_directory, os.path.basename(pickle_filename), len(transitions))
+        manifest.append_manifest_entries(self.pickle_directory, [entry])
+        if self.manifest_entries is not None:
+            self.manifest_entries[entry["file"]] = entry
+        self.record_feasibility(start_tuple, end_tuple, centralizer_string, len(transitions))
+
+    def get_metadata_filename(self, start_tuple, end_tuple, centralizer_string):
+        pickle_filename = self.get_transition_pickle_filename(start_tuple, end_tuple, centralizer_string)
+        return os.path.splitext(pickle_filename)[0] + ".json"
+
+    def load_metadata(self, start_tuple, end_tuple, centralizer_string):
+        """
+        Loads the sidecar metadata of a case, or an empty dict if the case has none.
+        """
+        metadata_filename = self.get_metadata_filename(start_tuple, end_tuple, centralizer_string)
+        if not os.path.exists(metadata_filename):
+            return {}
+
+        with open(metadata_filename, 'r') as read_file:
+            return json.load(read_file)
+
+    def get_search_stats_filename(self, start_tuple, end_tuple, centralizer_string):
+        pickle_filename = self.get_transition_pickle_filename(start_tuple, end_tuple, centralizer_string)
+        return os.path.splitext(pickle_filename)[0] + ".stats.json"
+
+    def save_search_stats(self, start_tuple, end_tuple, centralizer_string, search_stats):
+        """
+        Saves the counters of the search for a case (SearchStats.to_dict()) in a JSON file next to its pickle.
+        """
+        write_json_atomically(self.get_search_stats_filename(start_tuple, end_tuple, centralizer_string), search_stats,
+                              indent=2)
+
+    def load_search_stats(self, start_tuple, end_tuple, centralizer_string):
+        """
+        Loads the search counters of a case, or None if none were saved.
+        """
+        search_stats_filename = self.get_search_stats_filename(start_tuple, end_tuple, centralizer_string)
+        if not os.path.exists(search_stats_filename):
+            return None
+
+        with open(search_stats_filename, 'r') as read_file:
+            return json.load(read_file)
+
+    def get_journal_filename(self, start_tuple, end_tuple, centralizer_string):
+        pickle_filename = self.get_transition_pickle_filename(start_tuple, end_tuple, centralizer_string)
+        return os.path.splitext(pickle_filename)[0] + ".journal"
+
+    def journal_exists(self, start_tuple, end_tuple, centralizer_string):
+        """
+        Whether a case has a journal, which is only removed once its results are committed.
+        """
+        return os.path.exists(self.get_journal_filename(start_tuple, end_tuple, centralizer_string))
+
+    def open_journal(self, start_tuple, end_tuple, centralizer_string, settings, claim=None):
+        """
+        Opens the journal of an unfinished case, picking up the tasks finished by an earlier run with the same settings.
+        :param claim: Work queue Claim the case is run under, if any. Nothing is recorded once it has been taken over.
+        """
+        return SearchJournal(self.get_journal_filename(start_tuple, end_tuple, centralizer_string), settings, claim)
+
+    def count_transitions(self, start_tuple, end_tuple, centralizer_string):
+        """
+        Number of transitions saved for a case, or None if the case has not been saved.
+        """
+        if not self.transition_pickle_file_exists(start_tuple, end_tuple, centralizer_string):
+            return None
+
+        pickle_filename = self.get_transition_pickle_filename(start_tuple, end_tuple, centralizer_string)
+        if indexed_pickle.is_indexed_pickle(pickle_filename):
+            return indexed_pickle.count_indexed_pickle(pickle_filename)
+        return len(self.get_pickle_data(start_tuple, end_tuple, centralizer_string))
+
+    def flush(self):
+        """
+        Makes sure every saved case is on disk. Pickles are written right away, so there is nothing to do.
+        """
+        pass
 
     def load_transitions(self, start_gen_list, end_gen_list, centralizer_string):
         """
@@ -60,10 +184,86 @@ class TransitionPickleManager(PickleManager):
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"File {filepath} not found.")
 
-        with open(filepath, 'rb') as read_file:
-            return pickle.load(read_file)
+        return indexed_pickle.load_pickle_file(filepath)
+
+    def open_transitions(self, start_gen_list, end_gen_list, centralizer_string):
+        """
+        Opens the transitions of a case for reading one at a time.
+        Indexed files are opened lazily as an IndexedPickleReader (close it when done),
+        while plain pickle files can only be loaded whole.
+        """
+        filename = self.get_transition_pickle_filename(start_gen_list, end_gen_list, centralizer_string)
+        if not os.path.exists(filename):
+            raise FileNotFoundError(f"File {filename} not found.")
+
+        if indexed_pickle.is_indexed_pickle(filename):
+            return indexed_pickle.IndexedPickleReader(filename)
+        return self.load_transitions(start_gen_list, end_gen_list, centralizer_string)
+
+    def get_feasibility_case_counts(self, centralizer_string):
+        """
+        The case counts a new feasibility index starts from, found without opening any result file:
+        the multi-base cases of a centralizer the manifest records with no transitions, if their files are unchanged.
+        One-base cases are looked up as they are checked, see get_case_count.
+        :return: List of (start_tuple, end_tuple, num_transitions) with the tuples as lists of ints.
+        """
+        suffix = f"_{centralizer_string.upper()}.pickle"
+        self.manifest_entries = manifest.read_manifest(self.pickle_directory)
+
+        case_counts = []
+        for filename, entry in self.manifest_entries.items():
+            if entry["count"] != 0 or not filename.endswith(suffix) or "_to_" not in filename:
+                continue
+            start_str, end_str = filename[:-len(suffix)].split("_to_")
+            try:
+                start_tuple, end_tuple = [list(map(int, case_str.split(","))) for case_str in [start_str, end_str]]
+            except ValueError:
+                continue
 
-    # uses one base data to determine whether a given test case is possible
+            if len(start_tuple) > 1 and manifest.entry_is_current(self.pickle_directory, entry):
+                case_counts.append((start_tuple, end_tuple, 0))
+
+        return case_counts
+
+    def get_case_count(self, start_tuple, end_tuple, centralizer_string):
+        """
+        Number of transitions saved for a case, or None if the case has not been saved.
+        The manifest is used if its entry is current, otherwise the file is counted and the count added to the manifest,
+        so no later run has to open the file again.
+        """
+        if self.manifest_entries is None:
+            self.manifest_entries = manifest.read_manifest(self.pickle_directory)
+
+        filename = self.get_transition_pickle_filename(start_tuple, end_tuple, centralizer_string, exclude_dir=True)
+        entry = self.manifest_entries.get(filename)
+        if entry is not None and manifest.entry_is_current(self.pickle_directory, entry):
+            return entry["count"]
+
+        num_transitions = self.count_transitions(start_tuple, end_tuple, centralizer_string)
+        if num_transitions is not None:
+            entry = manifest.make_manifest_entry(self.pickle_directory, filename, num_transitions)
+            manifest.append_manifest_entries(self.pickle_directory, [entry])
+            self.manifest_entries[filename] = entry
+        return num_transitions
+
+    def get_feasibility_index(self, centralizer_string):
+        centralizer_string = centralizer_string.upper()
+        if centralizer_string not in self.feasibility_indexes:
+            feasibility_index = FeasibilityIndex()
+            for start_tuple, end_tuple, num_transitions in self.get_feasibility_case_counts(centralizer_string):
+                feasibility_index.record(start_tuple, end_tuple, num_transitions)
+            self.feasibility_indexes[centralizer_string] = feasibility_index
+        return self.feasibility_indexes[centralizer_string]
+
+    def record_feasibility(self, start_tuple, end_tuple, centralizer_string, num_transitions):
+        # only indexes that were already built need to be kept up to date
+        feasibility_index = self.feasibility_indexes.get(centralizer_string.upper())
+        if feasibility_index is not None:
+            start_tuple = [start_tuple] if type(start_tuple) in [int, str] else start_tuple
+            end_tuple = [end_tuple] if type(end_tuple) in [int, str] else end_tuple
+            feasibility_index.record(start_tuple, end_tuple, num_transitions)
+
+    # uses the saved results of smaller cases to determine whether a given test case is possible
     def check_case_is_possible(self, start_tuple, end_tuple, centralizer_string):
         if not genlist_utils.has_same_number_elements(start_tuple, end_tuple):
             return False
@@ -71,27 +271,129 @@ class TransitionPickleManager(PickleManager):
         if type(start_tuple) in [int, str] or len(start_tuple) == 1:
             return True
 
-        print("Check if impossible by one base...")
+        print("Check if impossible by a smaller case...")
+        feasibility_index = self.get_feasibility_index(centralizer_string)
         for start, end in zip(start_tuple, end_tuple):
-            try:
-                one_base_transitions = self.get_pickle_data(start, end, centralizer_string)
-                if len(one_base_transitions) == 0:
-                    print(f"{[start]} --> {[end]} under {centralizer_string} is impossible.")
-                    return False
-            except FileNotFoundError:
-                print(f"WARN: File {self.get_transition_pickle_filename(start, end, centralizer_string)} does not exist.")
+            # one base results are looked up the first time they are needed
+            if feasibility_index.lookup(start, end) is None:
+                num_transitions = self.get_case_count(start, end, centralizer_string)
+                if num_transitions is None:
+                    print(f"WARN: {self.get_case_location(start, end, centralizer_string)} does not exist.")
+                else:
+                    feasibility_index.record([start], [end], num_transitions)
+
+        infeasible_sub_case = feasibility_index.find_infeasible_sub_case(start_tuple, end_tuple)
+        if infeasible_sub_case is not None:
+            print(f"{infeasible_sub_case[0]} --> {infeasible_sub_case[1]} under {centralizer_string} is impossible.")
+            return False
 
         print("Possible.")
         return True
 
 
+class SearchJournal:
+    """
+    Append-only record of the finished search tasks of one case, so a case that is killed can be resumed.
+    The file is a stream of pickles: the search settings, then one (prefix, result) for each finished task.
+    A journal written with different settings splits the search differently, so it is thrown away.
+    With a work queue Claim, a worker that lost its lease stops writing before the new holder's records are touched.
+    """
+    def __init__(self, filename, settings, claim=None):
+        self.filename = filename
+        self.settings = settings
+        self.claim = claim
+        self.finished = self.read()
+        self.write_file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read(self):
+        if not os.path.exists(self.filename):
+            return {}
+
+        finished = {}
+        with open(self.filename, 'rb') as read_file:
+            try:
+                if pickle.load(read_file) != self.settings:
+                    print(f"WARN: Journal {self.filename} was written with other settings and is ignored.")
+                    return {}
+
+                while True:
+                    prefix, result = pickle.load(read_file)
+                    finished[prefix] = result
+            except (EOFError, pickle.UnpicklingError, ValueError):
+                # the last record is cut off if the run was killed while writing it
+                pass
+
+        return finished
+
+    def open(self):
+        # rewrite what was read, dropping a cut off record, before appending to it
+        self.check_claim()
+        temp_filename = get_temp_filename(self.filename)
+        with open(temp_filename, 'wb') as write_file:
+            pickle.dump(self.settings, write_file, protocol=pickle.HIGHEST_PROTOCOL)
+            for prefix, result in self.finished.items():
+                pickle.dump((prefix, result), write_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_filename, self.filename)
+
+        self.write_file = open(self.filename, 'ab')
+
+    def record(self, prefix, result):
+        """
+        Appends a finished task and makes sure it is on disk before returning.
+        :raise: LeaseLost if the case was taken over by another worker, leaving the journal to it.
+        """
+        self.check_claim()
+        self.finished[prefix] = result
+        pickle.dump((prefix, result), self.write_file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.write_file.flush()
+        os.fsync(self.write_file.fileno())
+
+    def check_claim(self):
+        if self.claim is not None:
+            self.claim.check_held()
+
+    def close(self):
+        if self.write_file is not None:
+            self.write_file.close()
+            self.write_file = None
+
+    def remove(self):
+        """
+        Deletes the journal once the results of the case are saved.
+        """
+        self.close()
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+
+# file in a vector pair directory holding every precomputed pair table, written by warmcache.py
+VECTOR_PAIR_BUNDLE_FILENAME = "vector_pairs.bundle"
+
+
+def get_vector_pair_bundle_key(start, end, centralizer_str):
+    return str(start), str(end), centralizer_str.upper()
+
+
 # finds what pairs of vectors can be solved by Tv_0 = v_1 while looping over their (ICO) orbits
 class VectorPairPickleManager(PickleManager):
-    def __init__(self, pickle_dir, centralizer_str):
+    def __init__(self, pickle_dir, centralizer_str, verbose=True):
         super().__init__(pickle_dir)
 
+        self.verbose = verbose
         self.centralizer_str = centralizer_str
         self.centralizer = centralizers.get_centralizer_from_str(self.centralizer_str)
+        self.linear_structure = centralizers.get_centralizer(self.centralizer_str).linear_structure
+
+        # tables in the bundle are read from it instead of their own pickle files
+        bundle_filename = os.path.join(pickle_dir, VECTOR_PAIR_BUNDLE_FILENAME)
+        self.bundle = indexed_pickle.IndexedBundleReader(bundle_filename) if os.path.exists(bundle_filename) else None
 
     # overrides function in PickleManager
     def get_transition_pickle_filename(self, start_tuple, end_tuple, centralizer_string):
@@ -122,8 +424,15 @@ class VectorPairPickleManager(PickleManager):
         sys.stdout.flush()
         function_call_desc = f"{start} --> {end}"
 
+        bundle_key = get_vector_pair_bundle_key(start, end, self.centralizer_str)
+        if self.bundle is not None and bundle_key in self.bundle:
+            if self.verbose:
+                print(function_call_desc + " pairs returned from bundle.")
+            return self.bundle[bundle_key]
+
         if self.transition_pickle_file_exists(start, end, self.centralizer_str):
-            print(function_call_desc + " pairs returned from file.")
+            if self.verbose:
+                print(function_call_desc + " pairs returned from file.")
             return self.get_pickle_data(start, end, self.centralizer_str)
 
         vector_pairs = self.generate_vector_pairs(start, end)
@@ -134,22 +443,23 @@ class VectorPairPickleManager(PickleManager):
     def generate_vector_pairs(self, start, end):
         function_call_desc = f"{start} --> {end}"
 
-        start_vector = virusdata.get_single_generator_from_str(start)
-        end_vector = virusdata.get_single_generator_from_str(end)
-
-        start_orbit = icosahedralgroup.orbitOfVector(start_vector)
-        end_orbit = icosahedralgroup.orbitOfVector(end_vector)
-
-        pair_iterator = tqdm(itertools.product(start_orbit, end_orbit), desc=function_call_desc,
-                             total=len(start_orbit) * len(end_orbit))
+        # the orbits come from the catalog shared by every process using the directory
+        catalog = orbitcatalog.get_orbit_catalog(os.path.join(self.pickle_directory, orbitcatalog.ORBIT_CATALOG_FILENAME))
+        start_orbit = catalog.get_orbit(start)
+        end_orbit = catalog.get_orbit(end)
 
-        vector_pairs = []
-        for v0, v1 in pair_iterator:
-            if sp_utils.equation_is_true_or_solvable(sp.Eq(self.centralizer * v0, v1)):
-                vector_pairs.append((v0, v1))
+        # every pair of the two orbits is checked at once with exact integer arithmetic
+        solvable_pairs = solutionspace.get_solvable_pairs(self.linear_structure, start_orbit, end_orbit)
+        vector_pairs = [(start_orbit[i], end_orbit[j]) for i, j in solvable_pairs]
+        if self.verbose:
+            print(f"{function_call_desc}: {len(vector_pairs)} of {len(start_orbit) * len(end_orbit)} pairs are solvable.")
 
         return vector_pairs
 
     def save_vector_pairs(self, start, end, vector_pairs):
-        with open(self.get_transition_pickle_filename(start, end, self.centralizer_str), 'wb') as write_file:
+        # processes on several nodes can save or read the same table, so it is moved into place once written
+        pickle_filename = self.get_transition_pickle_filename(start, end, self.centralizer_str)
+        temp_filename = get_temp_filename(pickle_filename)
+        with open(temp_filename, 'wb') as write_file:
             pickle.dump(vector_pairs, write_file)
+        os.replace(temp_filename, pickle_filename)
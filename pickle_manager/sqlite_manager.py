@@ -0,0 +1,125 @@
+import json
+import os
+import pickle
+import sqlite3
+from pickle_manager.pickle_manager import TransitionPickleManager
+
+
+class SQLiteTransitionManager(TransitionPickleManager):
+    """
+    Keeps the results of every case in one SQLite database instead of one pickle file per case.
+    Cases are keyed by the same normalized (start, end, centralizer) strings the pickle filenames use,
+    and the number of transitions is stored next to them, so existence and count queries never unpickle anything.
+    Search counters are kept in a second table with the same keys.
+    Saves are committed in batches of batch_size, call flush (or use the manager as a context manager)
+    to commit the rest.
+    """
+    def __init__(self, pickle_directory, database_name="transitions.sqlite", batch_size=100):
+        super().__init__(pickle_directory)
+
+        self.database_filename = os.path.join(pickle_directory, database_name)
+        self.batch_size = batch_size
+        self.num_pending = 0
+
+        self.connection = sqlite3.connect(self.database_filename)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS transitions ("
+                                "start TEXT NOT NULL, end TEXT NOT NULL, centralizer TEXT NOT NULL, "
+                                "num_transitions INTEGER NOT NULL, data BLOB NOT NULL, metadata TEXT, "
+                                "PRIMARY KEY (start, end, centralizer))")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS search_stats ("
+                                "start TEXT NOT NULL, end TEXT NOT NULL, centralizer TEXT NOT NULL, stats TEXT NOT NULL, "
+                                "PRIMARY KEY (start, end, centralizer))")
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def flush(self):
+        self.connection.commit()
+        self.num_pending = 0
+
+    def get_case_location(self, start_tuple, end_tuple, centralizer_string):
+        start_str, end_str, centralizer_string = self.get_case_key(start_tuple, end_tuple, centralizer_string)
+        return f"{self.database_filename} ({start_str} --> {end_str} under {centralizer_string})"
+
+    def save_transitions(self, start_tuple, end_tuple, centralizer_string, transitions, metadata=None):
+        """
+        Saves transitions to the database, replacing any earlier result for the case.
+        """
+        data = pickle.dumps(transitions, protocol=pickle.HIGHEST_PROTOCOL)
+        metadata = json.dumps(metadata) if metadata is not None else None
+        self.connection.execute("INSERT OR REPLACE INTO transitions VALUES (?, ?, ?, ?, ?, ?)",
+                                self.get_case_key(start_tuple, end_tuple, centralizer_string)
+                                + (len(transitions), data, metadata))
+        print(f"Saved {start_tuple} --> {end_tuple} under {centralizer_string} to {self.database_filename}.")
+        self.record_feasibility(start_tuple, end_tuple, centralizer_string, len(transitions))
+
+        self.num_pending += 1
+        if self.num_pending >= self.batch_size:
+            self.flush()
+
+    def transition_pickle_file_exists(self, start_tuple, end_tuple, centralizer_str):
+        return self.count_transitions(start_tuple, end_tuple, centralizer_str) is not None
+
+    def count_transitions(self, start_tuple, end_tuple, centralizer_string):
+        row = self.connection.execute("SELECT num_transitions FROM transitions "
+                                      "WHERE start = ? AND end = ? AND centralizer = ?",
+                                      self.get_case_key(start_tuple, end_tuple, centralizer_string)).fetchone()
+        return None if row is None else row[0]
+
+    def get_pickle_data(self, start_tuple, end_tuple, centralizer_string):
+        row = self.connection.execute("SELECT data FROM transitions WHERE start = ? AND end = ? AND centralizer = ?",
+                                      self.get_case_key(start_tuple, end_tuple, centralizer_string)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"{self.get_case_location(start_tuple, end_tuple, centralizer_string)} not found.")
+        return pickle.loads(row[0])
+
+    def load_transitions(self, start_gen_list, end_gen_list, centralizer_string):
+        return self.get_pickle_data(start_gen_list, end_gen_list, centralizer_string)
+
+    def open_transitions(self, start_gen_list, end_gen_list, centralizer_string):
+        return self.get_pickle_data(start_gen_list, end_gen_list, centralizer_string)
+
+    def load_metadata(self, start_tuple, end_tuple, centralizer_string):
+        row = self.connection.execute("SELECT metadata FROM transitions "
+                                      "WHERE start = ? AND end = ? AND centralizer = ?",
+                                      self.get_case_key(start_tuple, end_tuple, centralizer_string)).fetchone()
+        if row is None or row[0] is None:
+            return {}
+        return json.loads(row[0])
+
+    def save_search_stats(self, start_tuple, end_tuple, centralizer_string, search_stats):
+        self.connection.execute("INSERT OR REPLACE INTO search_stats VALUES (?, ?, ?, ?)",
+                                self.get_case_key(start_tuple, end_tuple, centralizer_string)
+                                + (json.dumps(search_stats),))
+
+    def load_search_stats(self, start_tuple, end_tuple, centralizer_string):
+        row = self.connection.execute("SELECT stats FROM search_stats WHERE start = ? AND end = ? AND centralizer = ?",
+                                      self.get_case_key(start_tuple, end_tuple, centralizer_string)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def get_case_count(self, start_tuple, end_tuple, centralizer_string):
+        return self.count_transitions(start_tuple, end_tuple, centralizer_string)
+
+    def get_feasibility_case_counts(self, centralizer_string):
+        # a single query, so every saved case is used
+        rows = self.connection.execute("SELECT start, end, num_transitions FROM transitions WHERE centralizer = ?",
+                                       (centralizer_string.upper(),)).fetchall()
+        return [([int(start) for start in start_str.split(",")], [int(end) for end in end_str.split(",")], num_transitions)
+                for start_str, end_str, num_transitions in rows]
+
+    def get_saved_cases(self, centralizer_string=None):
+        """
+        Lists the (start, end, centralizer) keys of every saved case, optionally only for one centralizer.
+        """
+        if centralizer_string is None:
+            return self.connection.execute("SELECT start, end, centralizer FROM transitions").fetchall()
+        return self.connection.execute("SELECT start, end, centralizer FROM transitions WHERE centralizer = ?",
+                                       (centralizer_string.upper(),)).fetchall()
@@ -0,0 +1,260 @@
+import json
+import os
+import socket
+import threading
+import time
+
+# a work queue directory holds
+#   tasks/<task>.json          one file per case, named so that sorting the names gives the order cases are handed out in
+#   claims/<task>.lock.<n>     the n-th claim on a task, the task is held by the claim with the highest n
+#   done/<task>.json           the marker of a finished task
+# claims are created with O_EXCL, so of several workers trying to take the same generation of a claim only one succeeds
+# a claim's lease is renewed by touching its file, and a claim not touched for lease_seconds may be taken over
+# by creating the next generation, which the old holder notices the next time it renews its lease
+# lease expiry compares file modification times with the local clock, so the nodes' clocks must roughly agree
+
+
+def get_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def get_temp_filename(filename):
+    """
+    Name of a temporary file next to filename that no other process, on this node or another, writes to.
+    """
+    return f"{filename}.{get_worker_id().replace(':', '_')}.tmp"
+
+
+def write_json_atomically(filename, data, indent=None):
+    temp_filename = get_temp_filename(filename)
+    with open(temp_filename, 'w') as write_file:
+        json.dump(data, write_file, indent=indent)
+    os.replace(temp_filename, filename)
+
+
+class LeaseLost(Exception):
+    pass
+
+
+class WorkQueue:
+    """
+    Queue of cases on a shared filesystem, which any number of processes on any number of nodes take cases from.
+    A case is only ever held by one live worker. The case of a worker that stops renewing its lease
+    (because it died or lost its node) is handed out again once the lease runs out.
+    """
+    def __init__(self, queue_dir, lease_seconds=600):
+        self.queue_dir = queue_dir
+        self.lease_seconds = lease_seconds
+        for sub_dir in ["tasks", "claims", "done"]:
+            os.makedirs(os.path.join(queue_dir, sub_dir), exist_ok=True)
+
+    @staticmethod
+    def get_task_name(index, start_tuple, end_tuple):
+        start_str = ",".join(map(str, start_tuple))
+        end_str = ",".join(map(str, end_tuple))
+        return f"{index:06d}_{start_str}_to_{end_str}"
+
+    def add_cases(self, cases):
+        """
+        Adds cases to the end of the queue, in order. Cases already in the queue are left where they are,
+        so every worker can add the same case file before taking cases from it.
+        :param cases: List of (start_tuple, end_tuple).
+        :return: Number of cases added.
+        """
+        task_names = self.get_task_names()
+        # the part of a task name after its position identifies the case
+        existing = {task_name.split("_", 1)[1] for task_name in task_names}
+        num_added = 0
+        for start_tuple, end_tuple in cases:
+            task_name = self.get_task_name(len(task_names) + num_added, start_tuple, end_tuple)
+            if task_name.split("_", 1)[1] not in existing:
+                write_json_atomically(os.path.join(self.queue_dir, "tasks", task_name + ".json"),
+                                      {"start": list(start_tuple), "end": list(end_tuple)})
+                existing.add(task_name.split("_", 1)[1])
+                num_added += 1
+        return num_added
+
+    def get_task_names(self):
+        return sorted(filename[:-len(".json")] for filename in os.listdir(os.path.join(self.queue_dir, "tasks"))
+                      if filename.endswith(".json"))
+
+    def load_task(self, task_name):
+        with open(os.path.join(self.queue_dir, "tasks", task_name + ".json"), 'r') as read_file:
+            task = json.load(read_file)
+        return task["start"], task["end"]
+
+    def is_done(self, task_name):
+        return os.path.exists(os.path.join(self.queue_dir, "done", task_name + ".json"))
+
+    def get_claim_generations(self, task_name):
+        """
+        :return: Sorted list of the generations of the claims on a task.
+        """
+        prefix = task_name + ".lock."
+        return sorted(int(filename[len(prefix):]) for filename in os.listdir(os.path.join(self.queue_dir, "claims"))
+                      if filename.startswith(prefix) and filename[len(prefix):].isdigit())
+
+    def get_claim_filename(self, task_name, generation):
+        return os.path.join(self.queue_dir, "claims", f"{task_name}.lock.{generation}")
+
+    def lease_expired(self, task_name, generation):
+        try:
+            return os.stat(self.get_claim_filename(task_name, generation)).st_mtime + self.lease_seconds < time.time()
+        except FileNotFoundError:
+            # the claim was just released
+            return True
+
+    def try_claim(self, task_name, worker_id=None):
+        """
+        Tries to take a task that is not done and is not held by a live worker.
+        :return: The Claim, or None if the task could not be taken.
+        """
+        if self.is_done(task_name):
+            return None
+
+        generations = self.get_claim_generations(task_name)
+        if len(generations) != 0 and not self.lease_expired(task_name, generations[-1]):
+            return None
+        generation = generations[-1] + 1 if len(generations) != 0 else 0
+
+        worker_id = worker_id or get_worker_id()
+        try:
+            fd = os.open(self.get_claim_filename(task_name, generation), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # another worker took this generation first
+            return None
+        with os.fdopen(fd, 'w') as write_file:
+            json.dump({"worker": worker_id, "claimed": time.time()}, write_file)
+
+        # the task may have been finished between the check above and taking the claim
+        if self.is_done(task_name):
+            os.remove(self.get_claim_filename(task_name, generation))
+            return None
+
+        if generation != 0:
+            print(f"Took over {task_name} after its lease ran out.")
+        return Claim(self, task_name, generation, worker_id)
+
+    def claim_next(self, worker_id=None):
+        """
+        Takes the first task in queue order that is available.
+        :return: The Claim, or None if every task is either done or held by a live worker.
+        """
+        for task_name in self.get_task_names():
+            claim = self.try_claim(task_name, worker_id)
+            if claim is not None:
+                return claim
+        return None
+
+    def all_done(self):
+        return all(self.is_done(task_name) for task_name in self.get_task_names())
+
+    def claims(self, worker_id=None, poll_seconds=10):
+        """
+        Yields claims until every task is done. When every unfinished task is held by another worker,
+        waits for them to finish or for their leases to run out. The caller must release each claim.
+        """
+        while True:
+            claim = self.claim_next(worker_id)
+            if claim is not None:
+                yield claim
+            elif self.all_done():
+                return
+            else:
+                time.sleep(poll_seconds)
+
+
+class Claim:
+    """
+    A worker's hold on a task of a WorkQueue. Used as a context manager, the lease is renewed from a background
+    thread while the task runs, and the claim is given up when leaving unless complete was called.
+    """
+    def __init__(self, work_queue, task_name, generation, worker_id):
+        self.work_queue = work_queue
+        self.task_name = task_name
+        self.generation = generation
+        self.worker_id = worker_id
+        self.filename = work_queue.get_claim_filename(task_name, generation)
+        self.stop_event = threading.Event()
+        self.heartbeat_thread = None
+
+    def __enter__(self):
+        self.heartbeat_thread = threading.Thread(target=self.run_heartbeat, daemon=True)
+        self.heartbeat_thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def get_case(self):
+        return self.work_queue.load_task(self.task_name)
+
+    def is_held(self):
+        """
+        Whether no other worker has taken the task over.
+        """
+        return self.work_queue.get_claim_generations(self.task_name)[-1:] == [self.generation]
+
+    def is_taken_over(self):
+        """
+        Whether another worker has taken the task over, checked without listing the claims since a takeover
+        always creates the claim of the next generation. That claim is removed once the other worker finishes the task,
+        so the done marker is checked as well.
+        """
+        return (os.path.exists(self.work_queue.get_claim_filename(self.task_name, self.generation + 1))
+                or self.work_queue.is_done(self.task_name))
+
+    def check_held(self):
+        """
+        :raise: LeaseLost if another worker has taken the task over.
+        """
+        if self.is_taken_over():
+            raise LeaseLost(f"Lost the lease on {self.task_name} to another worker.")
+
+    def heartbeat(self):
+        """
+        Renews the lease.
+        :return: False if the lease had already been lost to another worker.
+        """
+        if not self.is_held():
+            return False
+        try:
+            os.utime(self.filename)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def run_heartbeat(self):
+        while not self.stop_event.wait(self.work_queue.lease_seconds / 4):
+            if not self.heartbeat():
+                print(f"WARN: Lost the lease on {self.task_name}, another worker is doing it as well.")
+                return
+
+    def complete(self):
+        """
+        Marks the task as done, which must only happen once its results are saved.
+        """
+        write_json_atomically(os.path.join(self.work_queue.queue_dir, "done", self.task_name + ".json"),
+                              {"worker": self.worker_id, "done": time.time()})
+        self.release()
+
+    def release(self):
+        """
+        Gives up the claim. The claims of a finished task are removed, otherwise the claim is left in place
+        with its lease run out, so generations keep increasing and a worker that lost the task can tell.
+        """
+        self.stop_event.set()
+        if self.heartbeat_thread is not None and self.heartbeat_thread is not threading.current_thread():
+            self.heartbeat_thread.join()
+            self.heartbeat_thread = None
+
+        if not self.work_queue.is_done(self.task_name):
+            if self.is_held():
+                os.utime(self.filename, (0, 0))
+            return
+
+        for generation in self.work_queue.get_claim_generations(self.task_name):
+            try:
+                os.remove(self.work_queue.get_claim_filename(self.task_name, generation))
+            except FileNotFoundError:
+                pass
@@ -1,8 +1,12 @@
 import argparse
 import csv
+import json
+import multiprocessing
 from os import listdir
-from os.path import isfile, join
+from os.path import isfile, join, splitext
 from os.path import exists as file_exists
+from pickle_manager import manifest
+from pickle_manager.indexed_pickle import count_indexed_pickle, is_indexed_pickle
 import pickle
 
 
@@ -12,6 +16,71 @@ def get_elements_from_pickle_filename(f):
     return vals
 
 
+def count_pickle_file(path):
+    # indexed files store their length, so they do not need to be loaded
+    if is_indexed_pickle(path):
+        return count_indexed_pickle(path)
+
+    with open(path, 'rb') as read_pickle:
+        return len(pickle.load(read_pickle))
+
+
+def get_transition_counts(pickle_dir, pickles, processes=None):
+    """
+    Gets the number of transitions in each pickle file, using the directory's manifest where it is up to date.
+    Only new or changed files are opened, in parallel, and the manifest is updated with them.
+    :return: List of counts in the same order as pickles.
+    """
+    entries = manifest.read_manifest(pickle_dir)
+    stale = [f for f in pickles if f not in entries or not manifest.entry_is_current(pickle_dir, entries[f])]
+    print(f"{len(pickles) - len(stale)} of {len(pickles)} counts are read from the manifest.")
+
+    if len(stale) != 0:
+        with multiprocessing.Pool(processes) as pool:
+            counts = pool.map(count_pickle_file, [join(pickle_dir, f) for f in stale], chunksize=16)
+        for f, count in zip(stale, counts):
+            entries[f] = manifest.make_manifest_entry(pickle_dir, f, count)
+
+    # files that are gone are dropped from the manifest
+    manifest.rewrite_manifest(pickle_dir, {f: entries[f] for f in pickles})
+    return [entries[f]["count"] for f in pickles]
+
+
+def get_result_kind(metadata):
+    """
+    :param metadata: Sidecar metadata of a case, as written by combineorderedtuples.py.
+    :return: "all" if the count is the number of transitions, "exists_only" if the search stopped at the first
+             transition, or "representatives" if only representative translation pairs of a symmetry reduced
+             search have transitions.
+    """
+    if metadata.get("exists_only", False):
+        return "exists_only"
+    if metadata.get("symmetry_breaking", False) and not metadata.get("expanded", False):
+        return "representatives"
+    return "all"
+
+
+def get_result_kinds(pickle_dir, pickles, filenames=None):
+    """
+    Gets what the count of each pickle file means from its sidecar metadata, see get_result_kind.
+    :param filenames: Names of the files in pickle_dir, listed if not given. Only the sidecars in it are opened.
+    :return: List of result kinds in the same order as pickles.
+    """
+    if filenames is None:
+        filenames = listdir(pickle_dir)
+    filenames = set(filenames)
+
+    kinds = []
+    for f in pickles:
+        metadata = {}
+        metadata_filename = splitext(f)[0] + ".json"
+        if metadata_filename in filenames:
+            with open(join(pickle_dir, metadata_filename), 'r') as read_file:
+                metadata = json.load(read_file)
+        kinds.append(get_result_kind(metadata))
+    return kinds
+
+
 if __name__ == "__main__":
     centralizer_strings = ["a4", "d10", "d6"]
     parser = argparse.ArgumentParser(description="Interprets icosahedral virus transitions pickle files and produces a CSV file showing what is and isn't possible under various symmetries.",
@@ -19,25 +88,39 @@ if __name__ == "__main__":
     parser.add_argument("output_file", help="Name of output csv file.")
     parser.add_argument("-d", "--pickle-dir", default="./",
                         help="Directory in which the files will be read from. Defaults to current working directory.")
+    parser.add_argument("--counts", action="store_true",
+                        help="Write the number of transitions of each case instead of whether there are any. "
+                             "A result column for each centralizer tells whether the count is of all transitions "
+                             "(all), of an existence only search (exists_only) or of the representative translation "
+                             "pairs of a symmetry reduced search (representatives).")
+    parser.add_argument("-j", "--processes", type=int, default=None,
+                        help="Number of processes used to open files missing from the manifest. Defaults to the number of CPUs.")
     args = parser.parse_args()
 
-    pickles = [f for f in listdir(args.pickle_dir) if isfile(join(args.pickle_dir, f)) and f.endswith(".pickle")]
+    filenames = listdir(args.pickle_dir)
+    pickles = [f for f in filenames if isfile(join(args.pickle_dir, f)) and f.endswith(".pickle")]
 
     cases = list(map(get_elements_from_pickle_filename, pickles))
+    counts = get_transition_counts(args.pickle_dir, pickles, args.processes)
+    # whether any transition exists is right for every kind of result, only the counts depend on it
+    kinds = get_result_kinds(args.pickle_dir, pickles, filenames) if args.counts else [None] * len(pickles)
 
     results_dict = {}
-    for case, pickle_file in zip(cases, pickles):
+    kinds_dict = {}
+    for case, num_transitions, kind in zip(cases, counts, kinds):
         start, end, centralizer_str = case
         results_dict.setdefault(start, {})
         results_dict[start].setdefault(end, {})
-        with open(join(args.pickle_dir, pickle_file), 'rb') as read_pickle:
-            transitions = pickle.load(read_pickle)
+        kinds_dict.setdefault((start, end), {})[centralizer_str] = kind
 
-            # eventually it may be useful to replace this line with the commented one below:
-            results_dict[start][end][centralizer_str] = len(transitions) != 0
-            # results_dict[start][end][centralizer_str] = len(transitions)
+        if args.counts:
+            results_dict[start][end][centralizer_str] = num_transitions
+        else:
+            results_dict[start][end][centralizer_str] = num_transitions != 0
 
     csv_header = ("start", "end", "A4", "D10", "D6")
+    if args.counts:
+        csv_header += ("A4 result", "D10 result", "D6 result")
     csv_lst = [csv_header]
     
     for start_key in results_dict.keys():
@@ -46,7 +129,11 @@ if __name__ == "__main__":
             D10_status = results_dict[start_key][end_key].get("D10")
             D6_status = results_dict[start_key][end_key].get("D6")
 
-            csv_lst.append((start_key, end_key, A4_status, D10_status, D6_status))
+            row = (start_key, end_key, A4_status, D10_status, D6_status)
+            if args.counts:
+                row += tuple(kinds_dict[(start_key, end_key)].get(centralizer_str)
+                             for centralizer_str in ["A4", "D10", "D6"])
+            csv_lst.append(row)
 
     csv_lst[1:] = sorted(csv_lst[1:])
 
@@ -1,62 +1,111 @@
 from virusdata import virusdata
+import argparse
 import itertools
-from pt_arr_cases.permutetestcases import tuple_to_case
+import os
 
+# names of the case files of the base counts the original one and two base scripts wrote
+BASE_COUNT_NAMES = {1: "one", 2: "two", 3: "three", 4: "four", 5: "five"}
 
-def main():
-    write_one_base_cases()
-    write_two_base_cases()
-
-
-def write_one_base_cases():
-    print("Writing One Base Cases...")
-    with open('one_base_cases.txt', 'w') as one_base_file:
-        for a, b in itertools.product(range(1, 56), range(1, 56)):
-            one_base_file.write(f"{a} > {b}\n")
-
-    print("Done.")
-
-
-def write_two_base_cases():
-    two_base_point_arrays = get_all_two_base_point_arrays()
-    print("Writing Two Base Cases...")
-    with open('two_base_cases.txt', 'w') as two_base_file:
-        for p0, p1 in itertools.product(two_base_point_arrays, two_base_point_arrays):
-            if two_base_point_array_is_redundant(p0, p1):
-                continue
-
-            two_base_file.write(tuple_to_case(p0, p1))
-            two_base_file.write("\n")
-
-    print("Done.")
-
-
-def get_all_two_base_point_arrays():
-    two_base_point_arrays = []
-    for a, b in itertools.product(range(1, 56), range(1, 56)):
-        if is_valid_point_array((a, b)):
-            two_base_point_arrays.append((a, b))
-
-    return two_base_point_arrays
 
-
-def two_base_point_array_is_redundant(p0, p1):
-    a, b = p0
-    c, d = p1
-
-    # two base point array is actually one base
-    if a == b and c == d:
-        return True
-
-    # point array maps to itself
-    if p0 == p1:
-        return True
-
-    # only need to check when the first point array has a < b
-    if a >= b:
-        return True
-
-    return False
+def main():
+    parser = argparse.ArgumentParser(description="Writes every non redundant k base case to a case file.",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-k", "--num-bases", type=int, nargs="+", default=[1, 2], help="Numbers of bases to write the cases of.")
+    parser.add_argument("-s", "--shards", type=int, default=1,
+                        help="Number of files to split the cases of each base count across, round robin.")
+    parser.add_argument("-o", "--output-dir", default=".", help="Directory to write the case files to.")
+    args = parser.parse_args()
+
+    translation_classes = get_translation_classes()
+    for num_bases in args.num_bases:
+        filename = os.path.join(args.output_dir, get_case_filename(num_bases))
+        print(f"Writing {num_bases} Base Cases...")
+        num_cases = write_cases(filename, generate_cases(num_bases, translation_classes), args.shards)
+        print(f"Done. Wrote {num_cases} cases.")
+
+
+def get_case_filename(num_bases):
+    return f"{BASE_COUNT_NAMES.get(num_bases, num_bases)}_base_cases.txt"
+
+
+def get_shard_filenames(filename, num_shards):
+    """
+    :return: [filename] for a single shard, otherwise filename with _<shard> added before the extension for each shard.
+    """
+    if num_shards == 1:
+        return [filename]
+    root, extension = os.path.splitext(filename)
+    return [f"{root}_{shard}{extension}" for shard in range(num_shards)]
+
+
+def get_translation_classes():
+    """
+    Groups the configs by translation vector. Only configs with the same translation can be in one point array.
+    :return: Dict from "f", "b" and "s" to the sorted list of configs with that translation vector.
+    """
+    translation_classes = {}
+    for config in sorted(virusdata.configs):
+        translation_str = virusdata.get_translation_vector_str(virusdata.configs[config][virusdata.TRANSLATION_STR])
+        translation_classes.setdefault(translation_str, []).append(config)
+    return translation_classes
+
+
+def generate_point_arrays(num_bases, translation_classes, increasing=False):
+    """
+    Yields the valid point arrays with num_bases bases in lexicographic order.
+    :param increasing: Only yield the point arrays whose configs strictly increase.
+    """
+    config_classes = {config: configs for configs in translation_classes.values() for config in configs}
+    for first in sorted(config_classes):
+        if increasing:
+            rests = itertools.combinations([config for config in config_classes[first] if config > first], num_bases - 1)
+        else:
+            rests = itertools.product(config_classes[first], repeat=num_bases - 1)
+        for rest in rests:
+            yield (first,) + rest
+
+
+def generate_cases(num_bases, translation_classes=None):
+    """
+    Lazily yields every non redundant case (start_tuple, end_tuple) with num_bases bases, in lexicographic order.
+    Reordering the columns of both point arrays together gives the same case, so for more than one base only
+    cases whose start configs strictly increase are kept, and a point array mapping to itself is skipped.
+    For two bases this is the same list of cases the original two base script wrote.
+    :param translation_classes: Output of get_translation_classes, computed if not given.
+    """
+    if translation_classes is None:
+        translation_classes = get_translation_classes()
+
+    # the end point arrays are gone through once per start, so they are kept in memory
+    end_point_arrays = list(generate_point_arrays(num_bases, translation_classes))
+    if num_bases == 1:
+        for start_tuple, end_tuple in itertools.product(end_point_arrays, end_point_arrays):
+            yield start_tuple, end_tuple
+        return
+
+    for start_tuple in generate_point_arrays(num_bases, translation_classes, increasing=True):
+        for end_tuple in end_point_arrays:
+            if start_tuple != end_tuple:
+                yield start_tuple, end_tuple
+
+
+def write_cases(filename, cases, num_shards=1):
+    """
+    Writes cases as they are generated, so the full list is never held in memory.
+    With more than one shard the cases are dealt round robin across the shard files,
+    which gives every shard a similar mix of cases.
+    :return: Number of cases written.
+    """
+    write_files = [open(shard_filename, 'w') for shard_filename in get_shard_filenames(filename, num_shards)]
+    num_cases = 0
+    try:
+        for num_cases, (start_tuple, end_tuple) in enumerate(cases, 1):
+            write_files[(num_cases - 1) % num_shards].write(
+                f"{', '.join(map(str, start_tuple))} > {', '.join(map(str, end_tuple))}\n")
+    finally:
+        for write_file in write_files:
+            write_file.close()
+    return num_cases
 
 
 def is_valid_point_array(point_array):
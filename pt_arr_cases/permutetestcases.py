@@ -49,7 +49,7 @@ if __name__ == "__main__":
                 write_file.write(one_base + "\n")
                 continue
 
-            done_permutations = []
+            done_permutations = set()
             for permuted_end in itertools.permutations(end_tuple):
                 if permuted_end in done_permutations:
                     continue
@@ -57,4 +57,4 @@ if __name__ == "__main__":
                 permuted_case = tuple_to_case(start_tuple, permuted_end)
                 print(f"Writing {permuted_case} to {write_file.name}")
                 write_file.write(permuted_case + "\n")
-                done_permutations.append(permuted_end)
+                done_permutations.add(permuted_end)
@@ -0,0 +1,99 @@
+import argparse
+import csv
+import heapq
+import math
+from pickle_manager.pickle_manager import VectorPairPickleManager
+from pt_arr_cases.permutetestcases import create_tuple, tuple_to_case
+
+
+def estimate_case_cost(vector_pair_pickle_manager, start_tuple, end_tuple):
+    """
+    Upper bound on the number of leaves of a case's search tree: the product of the sizes of its pair tables
+    (translation pairs included). A case with an empty table costs nothing.
+    """
+    orbits_pairs = vector_pair_pickle_manager.get_multiple_vector_pairs(list(start_tuple), list(end_tuple),
+                                                                        add_in_translation=True)
+    return math.prod(len(pairs) for pairs in orbits_pairs)
+
+
+def schedule_cases(cases, centralizer_str, pair_dir, longest_first=True):
+    """
+    Orders cases longest first by their estimated cost, keeping the file order between cases of equal cost.
+    Running the expensive cases first keeps one large case from being left for the end of a batch.
+    :param cases: List of (start_tuple, end_tuple).
+    :param longest_first: If False the cases keep their order and only get their costs.
+    :return: List of ((start_tuple, end_tuple), cost) in the order to run them.
+    """
+    vector_pair_pickle_manager = VectorPairPickleManager(pair_dir, centralizer_str, verbose=False)
+    costs = [estimate_case_cost(vector_pair_pickle_manager, start_tuple, end_tuple) for start_tuple, end_tuple in cases]
+    plan = list(zip(cases, costs))
+    if longest_first:
+        plan.sort(key=lambda case_cost: -case_cost[1])
+    return plan
+
+
+def predict_makespan(costs, num_workers):
+    """
+    Total cost of the busiest worker when each cost, in order, goes to the worker with the least work so far.
+    """
+    workers = [0] * num_workers
+    for cost in costs:
+        heapq.heapreplace(workers, workers[0] + cost)
+    return max(workers)
+
+
+def write_plan(plan_filename, plan):
+    """
+    Writes the order of a schedule_cases plan with the predicted cost of each case to a csv file.
+    """
+    total_cost = sum(cost for _, cost in plan)
+    cumulative_cost = 0
+    with open(plan_filename, 'w', newline='') as write_file:
+        writer = csv.writer(write_file)
+        writer.writerow(["order", "case", "predicted_cost", "cumulative_share"])
+        for order, ((start_tuple, end_tuple), cost) in enumerate(plan):
+            cumulative_cost += cost
+            writer.writerow([order, tuple_to_case(start_tuple, end_tuple), cost,
+                             f"{cumulative_cost / total_cost:.6f}" if total_cost else "1.000000"])
+
+
+def print_plan_summary(plan, worker_counts=(1, 8, 32, 128)):
+    costs = [cost for _, cost in plan]
+    total_cost = sum(costs)
+    print(f"{len(plan)} cases with a predicted total cost of {total_cost}.")
+    if total_cost == 0:
+        return
+
+    print(f"The largest case is {max(costs) / total_cost:.2%} of the total.")
+    for num_workers in worker_counts:
+        makespan = predict_makespan(costs, num_workers)
+        print(f"Predicted makespan with {num_workers} workers: {makespan} ({total_cost / makespan / num_workers:.0%} utilization)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Orders the cases of a case file longest first by their predicted cost and exports the plan.",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("case_file", help="File of cases to schedule.")
+    parser.add_argument("-c", "--centralizer", type=str.upper, choices=["A4", "D10", "D6"], required=True, help="Centralizer the cases are run under.")
+    parser.add_argument("-p", "--pair-dir", default="vector_pairs", help="Directory of the vector pair tables.")
+    parser.add_argument("-o", "--plan", help="CSV file to write the ordered cases and their predicted costs to.")
+    parser.add_argument("--ordered-case-file", help="Case file to write the cases to in the scheduled order.")
+    args = parser.parse_args()
+
+    cases = []
+    with open(args.case_file, 'r') as read_file:
+        for line in read_file.readlines():
+            start_tuple, end_tuple = list(map(create_tuple, line.strip().split(' > ')))
+            cases.append((start_tuple, end_tuple))
+
+    plan = schedule_cases(cases, args.centralizer, args.pair_dir)
+    print_plan_summary(plan)
+
+    if args.plan is not None:
+        write_plan(args.plan, plan)
+        print(f"Wrote the plan to {args.plan}.")
+    if args.ordered_case_file is not None:
+        with open(args.ordered_case_file, 'w') as write_file:
+            for (start_tuple, end_tuple), _ in plan:
+                write_file.write(tuple_to_case(start_tuple, end_tuple) + "\n")
+        print(f"Wrote the ordered cases to {args.ordered_case_file}.")
@@ -9,6 +9,8 @@ from tkinter import ttk
 
 class SSHGui:
     hostname = "jigwe.kzoo.edu"
+    # disk budget of the downloaded results in MB, 0 for no limit
+    cache_size_mb = ssh_getter.DEFAULT_CACHE_SIZE_MB
 
     def __init__(self):
         self.root = tk.Tk()
@@ -153,7 +155,10 @@ class SSHGui:
 
         # try to get the results from remote
         try:
-            self.remote_results = ssh_getter.get_transitions_from_remote(starting_pt_array, ending_pt_array, self.centralizer_string.get(), hostname=self.hostname)
+            # results are read one at a time as the index changes, so large cases open right away
+            self.close_remote_results()
+            num_cache_hits = self.get_remote_sync().num_cache_hits
+            self.remote_results = ssh_getter.get_transitions_from_remote(starting_pt_array, ending_pt_array, self.centralizer_string.get(), hostname=self.hostname, lazy=True)
             old_results = isinstance(self.remote_results, tuple)
 
             if old_results:
@@ -181,11 +186,23 @@ class SSHGui:
             self.update_transition_display()
 
             self.display_label.configure(foreground='green')
-            self.display_text.set("Successfully retrieved from Jigwe!\nResults from folder: /scratch/xavier/virus_research/python/two_base_b0_b1_pickles/")
+            if self.get_remote_sync().num_cache_hits > num_cache_hits:
+                self.display_text.set(f"Opened the up to date copy in {ssh_getter.DOWNLOAD_DIR}, nothing was downloaded.")
+            else:
+                self.display_text.set(f"Successfully retrieved from Jigwe!\nResults from folder: {ssh_getter.REMOTE_PICKLE_DIR}")
         except FileNotFoundError:
             self.display_label.configure(foreground='red')
             self.display_text.set(f"Transition file for {starting_pt_array} --> {ending_pt_array} under {self.centralizer_string.get()} symmetry does not exist on {self.hostname}.")
 
+    def get_remote_sync(self):
+        # made with the GUI's cache budget the first time, get_transitions_from_remote then reuses it
+        return ssh_getter.get_remote_sync(self.hostname, ssh_getter.get_max_cache_bytes(self.cache_size_mb))
+
+    def close_remote_results(self):
+        if hasattr(self.remote_results, 'close'):
+            self.remote_results.close()
+        self.remote_results = []
+
     def update_ssh_info_display(self):
         try:
             self.ssh_config_is_setup = ssh_getter.verify_ssh_config_is_setup(self.hostname)
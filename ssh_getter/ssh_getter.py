@@ -1,12 +1,26 @@
+import argparse
+import contextlib
 import fabric
-import patchwork.files
+import fnmatch
+import json
+import posixpath
+import queue
 import re
+import shutil
 import sys
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from utils import generatinglist_utils, input_checker
 from pickle_manager.pickle_manager import TransitionPickleManager
+from pickle_manager.work_queue import write_json_atomically
+from pt_arr_cases.permutetestcases import create_tuple
 DOWNLOAD_DIR = "downloads/"
+REMOTE_PICKLE_DIR = "/scratch/xavier/virus_research/python/two_base_b0_b1_pickles/"
+CACHE_INDEX_FILENAME = "cache_index.json"
+# disk budget of the download directory used by the CLI and the GUI unless another one is given, 0 for no limit
+DEFAULT_CACHE_SIZE_MB = 1024
 
 
 # NOTE: requires ~/.ssh/config to be set up...
@@ -31,22 +45,6 @@ def verify_ssh_config_is_setup(hostname, ssh_dir="~/.ssh/", ssh_config_filename=
         return re.search(hostname_regex, ssh_config_contents) is not None
 
 
-def download_from_remote(connection: fabric.Connection, filepath: str):
-    """
-    Downloads a file from remote.
-    Raises a FileNotFoundError if the file doesn't exist on remote.
-    :param connection: Fabric connection object.
-    :param filepath: Path of file to download from remote.
-    :return: True if file successfully downloads.
-    """
-    if not patchwork.files.exists(connection, filepath):
-        raise FileNotFoundError(f"File '{filepath}' doesn't exist on remote '{connection.host}'.")
-
-    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
-    connection.get(filepath, local=DOWNLOAD_DIR)
-    return True
-
-
 def run_ssh_config_verification(hostname, ssh_dir="~/.ssh/", ssh_config_filename="config"):
     try:
         ssh_config_setup = verify_ssh_config_is_setup(hostname, ssh_dir=ssh_dir, ssh_config_filename=ssh_config_filename)
@@ -55,25 +53,352 @@ def run_ssh_config_verification(hostname, ssh_dir="~/.ssh/", ssh_config_filename
         print(e)
 
     if not ssh_config_setup:
-        print(f"Host '{jigwe_hostname}' is not set up within the SSH configuration file.\n"
+        print(f"Host '{hostname}' is not set up within the SSH configuration file.\n"
               f"See README for details on how to set it up.")
         sys.exit(0)
 
 
-def get_transitions_from_remote(start_gen_list, end_gen_list, centralizer_str, hostname):
-    run_ssh_config_verification(hostname)
+class LocalTransport:
+    """
+    Transport that reads the "remote" files from the local filesystem,
+    e.g. from a mounted copy of the remote results or from a test directory.
+    """
+    host = "localhost"
 
-    transition_pickle_manager = TransitionPickleManager(pickle_directory=DOWNLOAD_DIR)
+    def stat_dir(self, remote_dir):
+        """
+        :return: Dict from the name of each file in remote_dir to its (size, modification time).
+        """
+        file_stats = {}
+        for entry in os.scandir(remote_dir):
+            if entry.is_file():
+                stat = entry.stat()
+                file_stats[entry.name] = (stat.st_size, stat.st_mtime)
+        return file_stats
 
-    remote_file = transition_pickle_manager.get_transition_pickle_filename(start_gen_list, end_gen_list, centralizer_str, exclude_dir=True)
-    remote_path = os.path.join("/scratch/xavier/virus_research/python/two_base_b0_b1_pickles/", remote_file)
+    def stat(self, remote_path):
+        """
+        :return: (size, modification time) of a file, raising a FileNotFoundError if it does not exist.
+        """
+        stat = os.stat(remote_path)
+        return stat.st_size, stat.st_mtime
+
+    def get(self, remote_path, local_path):
+        shutil.copyfile(remote_path, local_path)
+
+    def close(self):
+        pass
+
+
+class SSHTransport:
+    """
+    Transport over one fabric connection to hostname, opened on first use and kept open until close.
+    Every download thread takes an SFTP session from a pool, and all sessions share that connection,
+    so the SSH handshake happens once however many files are downloaded.
+    """
+    def __init__(self, hostname):
+        self.host = hostname
+        self.connection = None
+        self.connection_lock = threading.Lock()
+        self.idle_sftp_sessions = queue.SimpleQueue()
+
+    def get_connection(self):
+        with self.connection_lock:
+            if self.connection is None:
+                self.connection = fabric.Connection(host=self.host)
+                self.connection.open()
+            return self.connection
+
+    @contextlib.contextmanager
+    def sftp_session(self):
+        try:
+            sftp = self.idle_sftp_sessions.get_nowait()
+        except queue.Empty:
+            sftp = self.get_connection().client.open_sftp()
+
+        try:
+            yield sftp
+        except FileNotFoundError:
+            self.idle_sftp_sessions.put(sftp)
+            raise
+        except BaseException:
+            # the session may be broken, so it is not reused
+            sftp.close()
+            raise
+        self.idle_sftp_sessions.put(sftp)
+
+    def stat_dir(self, remote_dir):
+        with self.sftp_session() as sftp:
+            return {attributes.filename: (attributes.st_size, attributes.st_mtime)
+                    for attributes in sftp.listdir_attr(remote_dir)}
+
+    def stat(self, remote_path):
+        with self.sftp_session() as sftp:
+            attributes = sftp.stat(remote_path)
+            return attributes.st_size, attributes.st_mtime
+
+    def get(self, remote_path, local_path):
+        with self.sftp_session() as sftp:
+            sftp.get(remote_path, local_path)
+
+    def close(self):
+        while not self.idle_sftp_sessions.empty():
+            self.idle_sftp_sessions.get_nowait().close()
+        with self.connection_lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+class DownloadCache:
+    """
+    Index of the files downloaded into a directory, keyed by their remote path.
+    A downloaded file is reused for as long as its size and modification time match those of the remote file,
+    and when the files take up more than max_bytes the least recently used ones are removed.
+    The index is saved in the directory, so the cache lasts between runs.
+    """
+    def __init__(self, cache_dir=DOWNLOAD_DIR, max_bytes=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_filename = os.path.join(cache_dir, CACHE_INDEX_FILENAME)
+
+        self.entries = {}
+        if os.path.exists(self.index_filename):
+            try:
+                with open(self.index_filename, 'r') as read_file:
+                    self.entries = json.load(read_file)
+            except (OSError, ValueError):
+                # a damaged index only costs downloading the files again
+                self.entries = {}
+        # uses are numbered rather than timed, so the order is exact
+        self.clock = max((entry["last_used"] for entry in self.entries.values()), default=0)
+
+    def get_local_path(self, remote_path):
+        return os.path.join(self.cache_dir, posixpath.basename(remote_path))
+
+    def get_size(self):
+        return sum(entry["size"] for entry in self.entries.values())
+
+    def use(self, remote_path):
+        self.clock += 1
+        self.entries[remote_path]["last_used"] = self.clock
+
+    def lookup(self, remote_path, remote_stat):
+        """
+        :param remote_stat: (size, modification time) of the remote file.
+        :return: Local path of the cached copy of the file, or None if there is no up to date copy.
+        """
+        entry = self.entries.get(remote_path)
+        if entry is None or (entry["size"], entry["mtime"]) != tuple(remote_stat):
+            return None
+
+        local_path = self.get_local_path(remote_path)
+        try:
+            if os.path.getsize(local_path) != entry["size"]:
+                return None
+        except OSError:
+            return None
+
+        self.use(remote_path)
+        return local_path
+
+    def add(self, remote_path, remote_stat):
+        """
+        Records a file just downloaded to get_local_path(remote_path).
+        """
+        # the file replaced any other remote file of the same name
+        local_path = self.get_local_path(remote_path)
+        for other_remote_path in [other for other in self.entries if self.get_local_path(other) == local_path]:
+            del self.entries[other_remote_path]
+
+        size, mtime = remote_stat
+        self.entries[remote_path] = {"size": size, "mtime": mtime, "last_used": 0}
+        self.use(remote_path)
+
+    def evict(self, keep=()):
+        """
+        Removes the least recently used files until the cache fits in max_bytes.
+        :param keep: Remote paths whose files are not removed, e.g. the ones about to be opened.
+        :return: List of the remote paths of the removed files.
+        """
+        if self.max_bytes is None:
+            return []
+
+        evicted = []
+        size = self.get_size()
+        for remote_path in sorted(self.entries, key=lambda path: self.entries[path]["last_used"]):
+            if size <= self.max_bytes:
+                break
+            if remote_path in keep:
+                continue
+
+            size -= self.entries.pop(remote_path)["size"]
+            try:
+                os.remove(self.get_local_path(remote_path))
+            except FileNotFoundError:
+                pass
+            evicted.append(remote_path)
+        return evicted
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        write_json_atomically(self.index_filename, self.entries)
+
+
+class RemoteSync:
+    """
+    Downloads result files from one directory of a transport (SSHTransport or LocalTransport).
+    Every download checks the current size and modification time of its files on remote, with a single stat
+    for one file or a single listing of the directory for several, instead of checking every file on remote.
+    Files whose DownloadCache copy is still up to date are not downloaded again, and the rest are downloaded concurrently.
+    """
+    def __init__(self, transport, remote_dir=REMOTE_PICKLE_DIR, download_dir=DOWNLOAD_DIR, max_workers=8,
+                 max_cache_bytes=None):
+        """
+        :param max_cache_bytes: Disk budget of the download directory, None for no limit.
+        """
+        self.transport = transport
+        self.remote_dir = remote_dir
+        self.download_dir = download_dir
+        self.max_workers = max_workers
+        self.cache = DownloadCache(download_dir, max_cache_bytes)
+        self.remote_file_stats = None
+        self.num_downloaded = 0
+        self.num_cache_hits = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
-    with fabric.Connection(host=hostname) as remote:
-        download_from_remote(remote, remote_path)
+    def list_remote(self, refresh=False):
+        """
+        :param refresh: List the remote directory again, to see files added or changed since it was last listed.
+                        Downloads always do, so the listing kept is only ever used for looking around.
+        :return: Dict from the name of each file in the remote directory to its (size, modification time).
+        """
+        if self.remote_file_stats is None or refresh:
+            self.remote_file_stats = self.transport.stat_dir(self.remote_dir)
+        return self.remote_file_stats
 
+    def get_remote_path(self, filename):
+        return posixpath.join(self.remote_dir, filename)
+
+    def download_file(self, filename):
+        local_path = os.path.join(self.download_dir, filename)
+        # downloaded next to its destination and moved into place, so an interrupted download never looks complete
+        temp_path = f"{local_path}.{os.getpid()}.part"
+        self.transport.get(self.get_remote_path(filename), temp_path)
+        os.replace(temp_path, local_path)
+        return local_path
+
+    def get_remote_file_stats(self, filenames):
+        """
+        The current (size, modification time) of files on remote, leaving out the files that don't exist.
+        """
+        if len(filenames) != 1:
+            return self.list_remote(refresh=True)
+
+        try:
+            return {filenames[0]: self.transport.stat(self.get_remote_path(filenames[0]))}
+        except FileNotFoundError:
+            return {}
+
+    def download(self, filenames, remote_file_stats=None):
+        """
+        Downloads files of the remote directory into the download directory, unless an up to date copy is already there.
+        Raises a FileNotFoundError listing the files that don't exist on remote, before downloading anything.
+        :param filenames: Names of the files within the remote directory.
+        :param remote_file_stats: Current (size, modification time) of the files by name, looked up on remote if not given.
+        :return: List of the local paths of the files, in the same order.
+        """
+        filenames = list(filenames)
+        if remote_file_stats is None:
+            remote_file_stats = self.get_remote_file_stats(filenames)
+        missing = [filename for filename in filenames if filename not in remote_file_stats]
+        if len(missing) != 0:
+            raise FileNotFoundError(f"{len(missing)} file(s) don't exist in '{self.remote_dir}' on remote "
+                                    f"'{self.transport.host}': {', '.join(missing)}")
+
+        to_download = [filename for filename in dict.fromkeys(filenames)
+                       if self.cache.lookup(self.get_remote_path(filename), remote_file_stats[filename]) is None]
+        self.num_cache_hits += len(set(filenames)) - len(to_download)
+
+        os.makedirs(self.download_dir, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for filename, _ in zip(to_download, executor.map(self.download_file, to_download)):
+                self.cache.add(self.get_remote_path(filename), remote_file_stats[filename])
+                self.num_downloaded += 1
+
+        self.cache.evict(keep={self.get_remote_path(filename) for filename in filenames})
+        self.cache.save()
+        return [os.path.join(self.download_dir, filename) for filename in filenames]
+
+    def download_matching(self, pattern):
+        """
+        Downloads every file of the remote directory whose name matches a glob pattern, e.g. "*_A4.pickle".
+        :return: List of the local paths of the files, sorted by name.
+        """
+        remote_file_stats = self.list_remote(refresh=True)
+        return self.download(sorted(fnmatch.filter(remote_file_stats, pattern)), remote_file_stats)
+
+    def close(self):
+        self.transport.close()
+
+
+# remote syncs of the current process by hostname, so repeated requests reuse one connection
+remote_syncs = {}
+
+
+def get_max_cache_bytes(cache_size_mb):
+    """
+    :return: Disk budget in bytes for a cache size in MB, or None for no limit if cache_size_mb is 0.
+    """
+    return int(cache_size_mb * 1024 * 1024) if cache_size_mb > 0 else None
+
+
+def get_remote_sync(hostname, max_cache_bytes=get_max_cache_bytes(DEFAULT_CACHE_SIZE_MB)):
+    """
+    :param max_cache_bytes: Disk budget of the download directory, only used when the remote sync is first made.
+    """
+    if hostname not in remote_syncs:
+        remote_syncs[hostname] = RemoteSync(SSHTransport(hostname), max_cache_bytes=max_cache_bytes)
+    return remote_syncs[hostname]
+
+
+def get_transitions_from_remote(start_gen_list, end_gen_list, centralizer_str, hostname, lazy=False, remote_sync=None):
+    """
+    Downloads the transitions of a case from remote.
+    :param lazy: Open indexed result files without loading them (see TransitionPickleManager.open_transitions).
+    :param remote_sync: RemoteSync to download with, by default the pooled SSH one of hostname.
+    :return: The transitions, as a list or as an IndexedPickleReader if lazy.
+    """
+    if remote_sync is None:
+        run_ssh_config_verification(hostname)
+        remote_sync = get_remote_sync(hostname)
+
+    transition_pickle_manager = TransitionPickleManager(pickle_directory=remote_sync.download_dir)
+
+    remote_file = transition_pickle_manager.get_transition_pickle_filename(start_gen_list, end_gen_list, centralizer_str, exclude_dir=True)
+    remote_sync.download([remote_file])
+
+    if lazy:
+        return transition_pickle_manager.open_transitions(start_gen_list, end_gen_list, centralizer_str)
     return transition_pickle_manager.load_transitions(start_gen_list, end_gen_list, centralizer_str)
 
 
+def download_cases_from_remote(cases, centralizer_str, remote_sync):
+    """
+    Downloads the result files of many cases at once.
+    :param cases: List of (start_tuple, end_tuple).
+    :return: List of the local paths of the result files.
+    """
+    transition_pickle_manager = TransitionPickleManager(pickle_directory=remote_sync.download_dir)
+    return remote_sync.download([transition_pickle_manager.get_transition_pickle_filename(start_tuple, end_tuple, centralizer_str, exclude_dir=True)
+                                 for start_tuple, end_tuple in cases])
+
+
 def get_centralizer_string_input(input_msg):
     while True:
         user_input = input(input_msg).upper()
@@ -99,13 +424,58 @@ def get_generating_list_input(input_msg):
             print("Invalid input. Please try again.")
 
 
-if __name__ == "__main__":
-    jigwe_hostname = "jigwe.kzoo.edu"
-    run_ssh_config_verification(jigwe_hostname)
+def run_interactive(hostname):
+    run_ssh_config_verification(hostname)
 
     start_gen_list = get_generating_list_input("Enter starting generating list as 'x,y,z,...'\n")
     end_gen_list = get_generating_list_input("Enter ending generating list as 'x,y,z,...'\n")
     centralizer_str = get_centralizer_string_input("Enter centralizer string (A4, D10, D6)\n")
 
-    print(f"Getting transitions from {jigwe_hostname} for desired inputs...")
-    print(get_transitions_from_remote(start_gen_list, end_gen_list, centralizer_str, jigwe_hostname))
+    print(f"Getting transitions from {hostname} for desired inputs...")
+    print(get_transitions_from_remote(start_gen_list, end_gen_list, centralizer_str, hostname))
+
+
+if __name__ == "__main__":
+    jigwe_hostname = "jigwe.kzoo.edu"
+
+    parser = argparse.ArgumentParser(description="Gets transition results from remote. Without --case-file or --glob, "
+                                                 "asks for a single case to get.",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--case-file", help="Download the results of every case in this case file.")
+    parser.add_argument("-c", "--centralizer", type=str.upper, choices=["A4", "D10", "D6"], help="Centralizer of the cases in --case-file.")
+    parser.add_argument("--glob", help="Download every result file on remote whose name matches this pattern, e.g. '*_A4.pickle'.")
+    parser.add_argument("--remote-dir", default=REMOTE_PICKLE_DIR, help="Directory of the results on remote.")
+    parser.add_argument("--local-dir", help="Read the results from this local directory instead of over SSH.")
+    parser.add_argument("-o", "--download-dir", default=DOWNLOAD_DIR, help="Directory to download the results to.")
+    parser.add_argument("-j", "--workers", type=int, default=8, help="Number of concurrent downloads.")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_CACHE_SIZE_MB,
+                        help="Disk budget of the download directory in MB, past which the least recently used results "
+                             "are removed. 0 for no limit.")
+    args = parser.parse_args()
+
+    if args.case_file is None and args.glob is None:
+        run_interactive(jigwe_hostname)
+        sys.exit(0)
+    if args.case_file is not None and args.centralizer is None:
+        parser.error("--case-file requires --centralizer")
+
+    if args.local_dir is not None:
+        transport = LocalTransport()
+        remote_dir = args.local_dir
+    else:
+        run_ssh_config_verification(jigwe_hostname)
+        transport = SSHTransport(jigwe_hostname)
+        remote_dir = args.remote_dir
+
+    max_cache_bytes = get_max_cache_bytes(args.cache_size)
+    with RemoteSync(transport, remote_dir, args.download_dir, args.workers, max_cache_bytes) as remote_sync:
+        local_paths = []
+        if args.case_file is not None:
+            with open(args.case_file, 'r') as read_file:
+                cases = [tuple(map(create_tuple, line.strip().split(' > '))) for line in read_file if line.strip()]
+            local_paths += download_cases_from_remote(cases, args.centralizer, remote_sync)
+        if args.glob is not None:
+            local_paths += remote_sync.download_matching(args.glob)
+
+    print(f"Got {len(local_paths)} result files in {args.download_dir}: {remote_sync.num_downloaded} downloaded, "
+          f"{remote_sync.num_cache_hits} already up to date.")
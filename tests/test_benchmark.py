@@ -0,0 +1,34 @@
+import unittest
+
+from benchmark import compare_results, get_checksum, run_benchmarks
+
+
+class BenchmarkTests(unittest.TestCase):
+    """Test cases for benchmark.py."""
+    def test_checksum_ignores_order(self):
+        self.assertEqual(get_checksum([1, 2, 3]), get_checksum([3, 1, 2]))
+        self.assertNotEqual(get_checksum([1, 2, 3]), get_checksum([1, 2, 4]))
+
+    def test_run_benchmarks(self):
+        results = run_benchmarks("find_transition/D10/12_to_12", repeat=2, processes=2)
+        self.assertEqual(list(results["benchmarks"]), ["find_transition/D10/12_to_12"])
+        self.assertEqual(len(results["benchmarks"]["find_transition/D10/12_to_12"]["times"]), 2)
+        self.assertIn("cpu_count", results["machine"])
+
+        # a run compared with itself has nothing to flag
+        comparison = compare_results(results, results)
+        self.assertEqual([status for _, _, _, status in comparison], ["ok"])
+
+    def test_compare_results(self):
+        baseline = {"benchmarks": {"a": {"median": 1.0, "checksum": "x"}, "b": {"median": 1.0, "checksum": "x"},
+                                   "c": {"median": 1.0, "checksum": "x"}, "d": {"median": 1.0, "checksum": "x"}}}
+        results = {"benchmarks": {"a": {"median": 1.05, "checksum": "x"}, "b": {"median": 1.5, "checksum": "x"},
+                                  "c": {"median": 0.5, "checksum": "x"}, "d": {"median": 1.0, "checksum": "y"},
+                                  "e": {"median": 1.0, "checksum": "x"}}}
+        statuses = {name: status for name, _, _, status in compare_results(baseline, results, threshold=0.1)}
+        self.assertEqual(statuses, {"a": "ok", "b": "regression", "c": "improvement", "d": "checksum mismatch",
+                                    "e": "new"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import shutil
+import tempfile
+import unittest
+
+import sympy as sp
+
+from combineorderedtuples import SearchStats, TransitionSearchPool, find_transition, find_transition_helper
+from matrixgroups import centralizers
+from pickle_manager.pickle_manager import TransitionPickleManager, VectorPairPickleManager
+
+
+class TransitionSearchTests(unittest.TestCase):
+    """Test cases for the transition search in combineorderedtuples.py."""
+    @classmethod
+    def setUpClass(cls):
+        cls.centralizer_str = "D10"
+        cls.centralizer = centralizers.get_centralizer_from_str(cls.centralizer_str)
+        cls.pair_dir = tempfile.mkdtemp()
+
+        # only use a few translation pairs to keep the test fast
+        vector_pair_pickle_manager = VectorPairPickleManager(cls.pair_dir, cls.centralizer_str, verbose=False)
+        translation_pairs = vector_pair_pickle_manager.generate_vector_pairs("s", "s")
+        vector_pair_pickle_manager.save_vector_pairs("s", "s", translation_pairs[:6])
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.pair_dir)
+
+    def serial_transitions(self, start_tuple, end_tuple):
+        vector_pair_pickle_manager = VectorPairPickleManager(self.pair_dir, self.centralizer_str, verbose=False)
+        orbits_pairs = vector_pair_pickle_manager.get_multiple_vector_pairs(start_tuple, end_tuple, add_in_translation=True)
+
+        transitions = []
+        for t0, t1 in orbits_pairs[0]:
+            result = find_transition_helper(self.centralizer, t0, t1, orbits_pairs)
+            if result[0] is not None:
+                transitions.append((start_tuple, end_tuple) + result)
+        return transitions
+
+    def test_split_search_matches_serial_search(self):
+        cases = [([12, 13], [12, 13]), ([12], [13])]
+        with TransitionSearchPool(self.centralizer_str, self.pair_dir, processes=2) as search_pool:
+            for start_tuple, end_tuple in cases:
+                serial_transitions = self.serial_transitions(start_tuple, end_tuple)
+                self.assertNotEqual(len(serial_transitions), 0)
+
+                for split_depth, modular_prefilter in [(1, False), (2, False), (1, True)]:
+                    transitions = find_transition(start_tuple, end_tuple, self.centralizer, self.centralizer_str,
+                                                  split_depth=split_depth, search_pool=search_pool,
+                                                  pair_dir=self.pair_dir, modular_prefilter=modular_prefilter)
+                    self.assertEqual(transitions, serial_transitions)
+
+    def test_exists_only_search(self):
+        start_tuple, end_tuple = [12, 13], [12, 13]
+        serial_transitions = self.serial_transitions(start_tuple, end_tuple)
+
+        with TransitionSearchPool(self.centralizer_str, self.pair_dir, processes=2) as search_pool:
+            transitions = find_transition(start_tuple, end_tuple, self.centralizer, self.centralizer_str,
+                                          search_pool=search_pool, pair_dir=self.pair_dir, exists_only=True)
+            self.assertEqual(len(transitions), 1)
+            self.assertIn(transitions[0], serial_transitions)
+
+            # the pool is still usable for a full search afterwards
+            transitions = find_transition(start_tuple, end_tuple, self.centralizer, self.centralizer_str,
+                                          search_pool=search_pool, pair_dir=self.pair_dir)
+            self.assertEqual(transitions, serial_transitions)
+
+    def test_symmetry_breaking_keeps_translation_pairs_with_transitions(self):
+        start_tuple, end_tuple = [12, 13], [12, 13]
+        serial_transitions = self.serial_transitions(start_tuple, end_tuple)
+
+        with TransitionSearchPool(self.centralizer_str, self.pair_dir, processes=2) as search_pool:
+            representatives = find_transition(start_tuple, end_tuple, self.centralizer, self.centralizer_str,
+                                              search_pool=search_pool, pair_dir=self.pair_dir, symmetry_breaking=True)
+            transitions = find_transition(start_tuple, end_tuple, self.centralizer, self.centralizer_str,
+                                          search_pool=search_pool, pair_dir=self.pair_dir, symmetry_breaking=True,
+                                          expand_symmetric=True)
+
+        self.assertLessEqual(len(representatives), len(transitions))
+        # the expanded transitions cover the same translation pairs, but may be different transitions
+        self.assertEqual([(B0.col(0), B1.col(0)) for _, _, _, B0, B1 in transitions],
+                         [(B0.col(0), B1.col(0)) for _, _, _, B0, B1 in serial_transitions])
+        for _, _, T, B0, B1 in transitions:
+            self.assertEqual(sp.simplify(T * B0 - B1), sp.zeros(*B0.shape))
+            self.assertNotEqual(T.det(), 0)
+
+    def test_search_stats(self):
+        start_tuple, end_tuple = [12, 13], [12, 13]
+        with TransitionSearchPool(self.centralizer_str, self.pair_dir, processes=2) as search_pool:
+            for split_depth, modular_prefilter in [(1, False), (2, False), (1, True)]:
+                search_stats = SearchStats()
+                transitions = find_transition(start_tuple, end_tuple, self.centralizer, self.centralizer_str,
+                                              split_depth=split_depth, search_pool=search_pool, pair_dir=self.pair_dir,
+                                              search_stats=search_stats, modular_prefilter=modular_prefilter)
+                if not modular_prefilter:
+                    self.assertEqual(search_stats.get_totals()["modular"], 0)
+
+                # every pair not rejected at a depth becomes a node of the next depth, or a leaf at the last one
+                depths = search_stats.depths
+                self.assertEqual(len(depths), 3)
+                for depth, counters in enumerate(depths):
+                    rejected = sum(counters[key] for key in ["symmetry", "b0_rank", "b1_rank", "modular", "unsolvable",
+                                                             "singular"])
+                    if depth + 1 < len(depths):
+                        taken = depths[depth + 1]["nodes"] + depths[depth + 1]["cancelled"]
+                    else:
+                        taken = counters["leaves"]
+                    self.assertEqual(counters["pairs"] - rejected, taken)
+                # with more than one task per translation pair, several tasks of a pair can find a transition
+                if split_depth == 1:
+                    self.assertEqual(search_stats.get_totals()["leaves"], len(transitions))
+                else:
+                    self.assertGreaterEqual(search_stats.get_totals()["leaves"], len(transitions))
+                self.assertEqual(search_stats.to_dict()["totals"], search_stats.get_totals())
+
+    def test_split_search_cancels_later_tasks(self):
+        start_tuple, end_tuple = [12, 13], [12, 13]
+        serial_transitions = self.serial_transitions(start_tuple, end_tuple)
+
+        # with one process the tasks run in order, so every task after the first hit of a translation pair is cancelled
+        with TransitionSearchPool(self.centralizer_str, self.pair_dir, processes=1) as search_pool:
+            search_stats = SearchStats()
+            transitions = find_transition(start_tuple, end_tuple, self.centralizer, self.centralizer_str, split_depth=2,
+                                          search_pool=search_pool, pair_dir=self.pair_dir, search_stats=search_stats)
+        self.assertEqual(transitions, serial_transitions)
+        self.assertEqual(search_stats.get_totals()["leaves"], len(transitions))
+        self.assertGreater(search_stats.get_totals()["cancelled"], 0)
+
+    def test_search_resumes_from_journal(self):
+        start_tuple, end_tuple = [12, 13], [12, 13]
+        serial_transitions = self.serial_transitions(start_tuple, end_tuple)
+        transition_pickle_manager = TransitionPickleManager(self.pair_dir)
+        settings = {"split_depth": 2, "symmetry_breaking": False}
+
+        with TransitionSearchPool(self.centralizer_str, self.pair_dir, processes=2) as search_pool:
+            with transition_pickle_manager.open_journal(start_tuple, end_tuple, "D10", settings) as journal:
+                find_transition(start_tuple, end_tuple, self.centralizer, self.centralizer_str, split_depth=2,
+                                search_pool=search_pool, pair_dir=self.pair_dir, journal=journal)
+            finished = journal.finished
+            self.assertNotEqual(len(finished), 0)
+
+            # pretend the run was killed after half of the tasks finished
+            journal.remove()
+            with transition_pickle_manager.open_journal(start_tuple, end_tuple, "D10", settings) as journal:
+                for prefix in sorted(finished)[::2]:
+                    journal.record(prefix, finished[prefix])
+
+            with transition_pickle_manager.open_journal(start_tuple, end_tuple, "D10", settings) as journal:
+                transitions = find_transition(start_tuple, end_tuple, self.centralizer, self.centralizer_str,
+                                              split_depth=2, search_pool=search_pool, pair_dir=self.pair_dir,
+                                              journal=journal)
+            self.assertEqual(transitions, serial_transitions)
+            # which later tasks of a translation pair get cancelled depends on timing, but no task's result changes
+            for prefix, result in journal.finished.items():
+                if prefix in finished:
+                    self.assertEqual(result, finished[prefix])
+            journal.remove()
+
+
+if __name__ == '__main__':
+    unittest.main()
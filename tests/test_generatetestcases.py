@@ -0,0 +1,71 @@
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+
+from pt_arr_cases.generatetestcases import generate_cases, generate_point_arrays, get_translation_classes, \
+    is_valid_point_array, write_cases
+from pt_arr_cases.permutetestcases import create_tuple
+
+
+class GenerateTestCasesTests(unittest.TestCase):
+    """Test cases for generatetestcases.py."""
+    def setUp(self):
+        self.case_dir = tempfile.mkdtemp()
+        self.translation_classes = get_translation_classes()
+
+    def tearDown(self):
+        shutil.rmtree(self.case_dir)
+
+    def test_translation_classes(self):
+        self.assertEqual(sorted(self.translation_classes), ["b", "f", "s"])
+        self.assertEqual(sorted(itertools.chain(*self.translation_classes.values())), list(range(1, 56)))
+
+        valid_point_arrays = [point_array for point_array in itertools.product(range(1, 56), repeat=2)
+                              if is_valid_point_array(point_array)]
+        self.assertEqual(list(generate_point_arrays(2, self.translation_classes)), valid_point_arrays)
+
+    def test_two_base_cases(self):
+        # the rules of the original two base script, applied to every pair of valid point arrays
+        point_arrays = list(generate_point_arrays(2, self.translation_classes))
+        expected_cases = [((a, b), (c, d)) for (a, b), (c, d) in itertools.product(point_arrays, point_arrays)
+                          if a < b and (a, b) != (c, d)]
+        self.assertEqual(list(generate_cases(2, self.translation_classes)), expected_cases)
+        self.assertEqual(len(list(generate_cases(1, self.translation_classes))), 55 * 55)
+
+    def test_three_base_cases(self):
+        cases = itertools.islice(generate_cases(3, self.translation_classes), 20000)
+        seen_cases = set()
+        for start_tuple, end_tuple in cases:
+            self.assertTrue(is_valid_point_array(start_tuple) and is_valid_point_array(end_tuple))
+            self.assertTrue(start_tuple[0] < start_tuple[1] < start_tuple[2])
+            self.assertNotEqual(start_tuple, end_tuple)
+
+            # no two cases differ by reordering their columns
+            column_pairs = tuple(sorted(zip(start_tuple, end_tuple)))
+            self.assertNotIn(column_pairs, seen_cases)
+            seen_cases.add(column_pairs)
+
+    def test_write_cases_shards(self):
+        cases = list(itertools.islice(generate_cases(2, self.translation_classes), 10))
+        filename = os.path.join(self.case_dir, "two_base_cases.txt")
+        self.assertEqual(write_cases(filename, iter(cases), num_shards=3), 10)
+        self.assertFalse(os.path.exists(filename))
+
+        shard_cases = []
+        for shard in range(3):
+            with open(os.path.join(self.case_dir, f"two_base_cases_{shard}.txt"), 'r') as read_file:
+                shard_cases.append([tuple(tuple(create_tuple(arg_str)) for arg_str in line.strip().split(' > '))
+                                    for line in read_file.readlines()])
+        self.assertEqual([len(lines) for lines in shard_cases], [4, 3, 3])
+        self.assertEqual(shard_cases[0], cases[0::3])
+        self.assertEqual(shard_cases[2], cases[2::3])
+
+        self.assertEqual(write_cases(filename, iter(cases[:1])), 1)
+        with open(filename, 'r') as read_file:
+            self.assertEqual(read_file.read(), "{}, {} > {}, {}\n".format(*cases[0][0], *cases[0][1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
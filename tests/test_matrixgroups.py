@@ -0,0 +1,170 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import sympy as sp
+
+from matrixgroups import centralizers, icosahedralgroup, matrixfunctions, orbitcatalog
+from matrixgroups.solutionspace import (CentralizerSolutionSpace, get_linear_structure, get_linear_system,
+                                        get_solvable_pairs)
+from matrixgroups.symmetry import get_normalizer
+from utils.linalg_utils import get_modular_systems
+from utils.sympy_utils import equation_is_true_or_solvable
+from virusdata import virusdata
+
+
+class SolutionSpaceTests(unittest.TestCase):
+    """Test cases for solutionspace.py."""
+    def test_matches_sympy_solve(self):
+        start = sp.Matrix.hstack(virusdata.f, virusdata.configs[1][virusdata.BASE_STR])
+        end = sp.Matrix.hstack(virusdata.f, virusdata.configs[2][virusdata.BASE_STR])
+
+        for centralizer_str in ["A4", "D10", "D6"]:
+            centralizer = centralizers.get_centralizer_from_str(centralizer_str)
+            for num_cols in [1, 2]:
+                B0, B1 = start[:, :num_cols], end[:, :num_cols]
+                solution = sp.solve(sp.Eq(centralizer * B0, B1))
+                solution_space = CentralizerSolutionSpace(centralizer).intersect_columns(B0, B1)
+
+                if len(solution) == 0:
+                    self.assertIsNone(solution_space)
+                else:
+                    self.assertEqual(solution_space.get_centralizer(), centralizer.subs(solution))
+
+    def test_inconsistent_columns(self):
+        centralizer = centralizers.get_centralizer_from_str("A4")
+        solution_space = CentralizerSolutionSpace(centralizer).intersect(virusdata.f, virusdata.f)
+        self.assertIsNotNone(solution_space)
+        self.assertIsNone(solution_space.intersect(virusdata.f, 2 * virusdata.f))
+
+    def test_rules_out_agrees_with_intersect(self):
+        start_orbit = icosahedralgroup.orbitOfVector(virusdata.configs[1][virusdata.BASE_STR])
+        end_orbit = icosahedralgroup.orbitOfVector(virusdata.configs[2][virusdata.BASE_STR])
+
+        for centralizer_str in ["A4", "D10"]:
+            centralizer = centralizers.get_centralizer_from_str(centralizer_str)
+            solution_space = CentralizerSolutionSpace(centralizer).intersect(virusdata.f, virusdata.f)
+            for v0 in start_orbit[:6]:
+                for v1 in end_orbit:
+                    system = get_linear_system(solution_space.linear_structure, v0, v1)
+                    if solution_space.rules_out(get_modular_systems(system)):
+                        self.assertIsNone(solution_space.intersect_system(*system))
+
+    def test_is_nonsingular(self):
+        start = sp.Matrix.hstack(virusdata.f, virusdata.configs[1][virusdata.BASE_STR], virusdata.s)
+        ends = [sp.Matrix.hstack(virusdata.f, virusdata.configs[2][virusdata.BASE_STR], virusdata.s),
+                sp.Matrix.hstack(virusdata.f, virusdata.configs[2][virusdata.BASE_STR], sp.zeros(6, 1))]
+
+        for centralizer_str in ["A4", "D10"]:
+            centralizer = centralizers.get_centralizer_from_str(centralizer_str)
+            self.assertTrue(CentralizerSolutionSpace(centralizer).is_nonsingular())
+            for end in ends:
+                for num_cols in [1, 2, 3]:
+                    solution_space = CentralizerSolutionSpace(centralizer).intersect_columns(start[:, :num_cols],
+                                                                                            end[:, :num_cols])
+                    if solution_space is not None:
+                        self.assertEqual(solution_space.is_nonsingular(),
+                                         solution_space.get_centralizer().det(method='berkowitz') != 0)
+
+        # T * s = 0 forces T to be singular, which only the exact fallback can show
+        solution_space = CentralizerSolutionSpace(centralizers.get_centralizer_from_str("A4")).intersect(virusdata.s,
+                                                                                                         sp.zeros(6, 1))
+        self.assertFalse(solution_space.is_nonsingular())
+
+    def test_solvable_pairs_match_sympy(self):
+        start_orbit = icosahedralgroup.orbitOfVector(virusdata.s)
+        end_orbit = icosahedralgroup.orbitOfVector(virusdata.configs[13][virusdata.BASE_STR])
+
+        for centralizer_str in ["A4", "D10"]:
+            centralizer = centralizers.get_centralizer_from_str(centralizer_str)
+            expected = [(i, j) for i, v0 in enumerate(start_orbit) for j, v1 in enumerate(end_orbit)
+                        if equation_is_true_or_solvable(sp.Eq(centralizer * v0, v1))]
+            self.assertEqual(get_solvable_pairs(get_linear_structure(centralizer), start_orbit, end_orbit), expected)
+
+
+class CentralizerTests(unittest.TestCase):
+    """Test cases for the centralizer registry in centralizers.py."""
+    def test_registry(self):
+        centralizer = centralizers.get_centralizer("d10")
+        self.assertIs(centralizer, centralizers.get_centralizer("D10"))
+        self.assertEqual(centralizers.get_centralizer_from_str("D10"), centralizer.matrix)
+        self.assertEqual(centralizers.get_centralizer_str_from_matrix(centralizers.get_centralizer_from_str("D10")), "D10")
+        self.assertFalse(centralizers.is_centralizer(sp.eye(6)))
+        with self.assertRaises(ValueError):
+            centralizers.get_centralizer("D5")
+
+
+class SignedPermutationGroupTests(unittest.TestCase):
+    """Test cases for signedpermutationgroup.py."""
+    def test_multiplication_table(self):
+        group = icosahedralgroup.ICO_GROUP
+        for g, h in [(1, 2), (5, 17), (59, 33)]:
+            product = icosahedralgroup.ICO[g] * icosahedralgroup.ICO[h]
+            self.assertEqual(icosahedralgroup.ICO[group.multiplication_table[g][h]], product)
+        for g in range(len(group)):
+            self.assertEqual(group.multiplication_table[g][group.inverses[g]], group.identity)
+
+    def test_orbit_matches_matrix_orbit(self):
+        vectors = [virusdata.configs[i][virusdata.BASE_STR] for i in range(1, 56)] + [virusdata.f, virusdata.b, virusdata.s]
+        for vector in vectors:
+            self.assertEqual(icosahedralgroup.orbitOfVector(vector),
+                             matrixfunctions.orbitOfVector(icosahedralgroup.ICO, vector))
+
+    def test_normalizer_of_centralizers(self):
+        expected_orders = {"A4": 12, "D10": 10, "D6": 6}
+        for centralizer_str, order in expected_orders.items():
+            centralizer = centralizers.get_centralizer_from_str(centralizer_str)
+            normalizer = get_normalizer(get_linear_structure(centralizer))
+            self.assertEqual(len(normalizer), order)
+            self.assertEqual(normalizer[0], icosahedralgroup.ICO_GROUP.identity)
+
+
+
+class OrbitCatalogTests(unittest.TestCase):
+    """Test cases for orbitcatalog.py."""
+    def setUp(self):
+        self.catalog_dir = tempfile.mkdtemp()
+        orbitcatalog.orbit_catalog.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.catalog_dir)
+        orbitcatalog.orbit_catalog.clear()
+
+    def test_orbits_match_icosahedral_group(self):
+        catalog = orbitcatalog.OrbitCatalog.build()
+        self.assertEqual(len(catalog.names()), 58)
+        for name in ["f", "b", "s", 1, 13, 55]:
+            orbit = icosahedralgroup.orbitOfVector(virusdata.get_single_generator_from_str(name))
+            self.assertEqual(catalog.get_orbit(name), orbit)
+            self.assertEqual(catalog.orbit_size(name) * catalog.stabilizer_size(name), 60)
+
+        with self.assertRaises(ValueError):
+            catalog.get_orbit(56)
+
+    def test_reverse_index(self):
+        catalog = orbitcatalog.OrbitCatalog.build()
+        orbit = catalog.get_orbit(13)
+        self.assertIn(("13", 4), catalog.find(orbit[4]))
+        # configs 3, 8 and 12 share the base vector s
+        self.assertEqual({name for name, _ in catalog.find(virusdata.s)}, {"s", "3", "8", "12"})
+        self.assertEqual(catalog.find(sp.Matrix([1, 2, 3, 4, 5, 6])), [])
+
+    def test_save_and_load(self):
+        filename = os.path.join(self.catalog_dir, orbitcatalog.ORBIT_CATALOG_FILENAME)
+        catalog = orbitcatalog.get_orbit_catalog(filename)
+        self.assertTrue(os.path.exists(filename))
+
+        loaded_catalog = orbitcatalog.OrbitCatalog.load(filename)
+        self.assertEqual(loaded_catalog.orbits, catalog.orbits)
+        self.assertEqual(loaded_catalog.fingerprint, catalog.fingerprint)
+
+        # a stale file is replaced
+        orbitcatalog.OrbitCatalog({"s": ([(1, 0, 0, 0, 0, 0)], 1)}, b"\x00" * 32).save(filename)
+        orbitcatalog.orbit_catalog.clear()
+        self.assertEqual(orbitcatalog.get_orbit_catalog(filename).orbits, catalog.orbits)
+        self.assertEqual(orbitcatalog.OrbitCatalog.load(filename).orbits, catalog.orbits)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,346 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from pickle_manager import manifest
+from pickle_manager.feasibility import FeasibilityIndex
+from pickle_manager.indexed_pickle import IndexedPickleReader, count_indexed_pickle, write_indexed_pickle
+from pickle_manager.pickle_manager import TransitionPickleManager, VectorPairPickleManager
+from pickle_manager.sqlite_manager import SQLiteTransitionManager
+from pickle_manager.work_queue import LeaseLost, WorkQueue
+
+
+class TransitionPickleManagerTests(unittest.TestCase):
+    """Test cases for TransitionPickleManager in pickle_manager.py."""
+    def setUp(self):
+        self.pickle_dir = tempfile.mkdtemp()
+        self.transition_pickle_manager = TransitionPickleManager(self.pickle_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.pickle_dir)
+
+    def test_save_and_load_metadata(self):
+        manager = self.transition_pickle_manager
+        manager.save_transitions([1], [2], "A4", ["witness"], metadata={"exists_only": True})
+        self.assertEqual(manager.load_transitions([1], [2], "A4"), ["witness"])
+        self.assertEqual(manager.load_metadata([1], [2], "A4"), {"exists_only": True})
+
+        # saving again without metadata removes the old sidecar
+        manager.save_transitions([1], [2], "A4", [])
+        self.assertEqual(manager.load_metadata([1], [2], "A4"), {})
+
+    def test_save_and_load_search_stats(self):
+        for manager in [self.transition_pickle_manager, SQLiteTransitionManager(self.pickle_dir)]:
+            self.assertIsNone(manager.load_search_stats([1], [2], "A4"))
+            manager.save_search_stats([1], [2], "A4", {"totals": {"nodes": 3}})
+            self.assertEqual(manager.load_search_stats([1], [2], "A4"), {"totals": {"nodes": 3}})
+
+    def test_journal_resume(self):
+        manager = self.transition_pickle_manager
+        settings = {"split_depth": 1, "symmetry_breaking": False}
+        with manager.open_journal([1], [2], "A4", settings) as journal:
+            journal.record((0,), (None, None, None))
+            journal.record((1,), ("T", "B0", "B1"))
+
+        # a record cut off by a killed run is dropped
+        filename = manager.get_journal_filename([1], [2], "A4")
+        with open(filename, 'ab') as write_file:
+            write_file.write(b"\x80\x05\x95")
+
+        with manager.open_journal([1], [2], "A4", settings) as journal:
+            self.assertEqual(journal.finished, {(0,): (None, None, None), (1,): ("T", "B0", "B1")})
+            journal.record((2,), (None, None, None))
+        self.assertEqual(len(manager.open_journal([1], [2], "A4", settings).finished), 3)
+
+        # other settings split the search differently, so the journal is not used
+        self.assertEqual(manager.open_journal([1], [2], "A4", {"split_depth": 2}).finished, {})
+
+        journal.remove()
+        self.assertFalse(os.path.exists(filename))
+
+    def test_save_is_atomic(self):
+        for indexed in [False, True]:
+            manager = TransitionPickleManager(self.pickle_dir, indexed)
+            manager.save_transitions([1], [2], "A4", ["a", "b"], metadata={"exists_only": True})
+
+            # a save that fails part way through leaves the old result whole
+            with self.assertRaises(Exception):
+                manager.save_transitions([1], [2], "A4", ["c", lambda: None])
+            self.assertEqual(list(manager.load_transitions([1], [2], "A4")), ["a", "b"])
+            with self.assertRaises(Exception):
+                manager.save_transitions([1], [3], "A4", [lambda: None])
+            self.assertFalse(manager.transition_pickle_file_exists([1], [3], "A4"))
+
+        # the result of a case is only committed once its journal is removed
+        settings = {"split_depth": 1, "symmetry_breaking": False}
+        with manager.open_journal([1], [2], "A4", settings) as journal:
+            self.assertTrue(manager.journal_exists([1], [2], "A4"))
+        journal.remove()
+        self.assertFalse(manager.journal_exists([1], [2], "A4"))
+
+    def test_save_vector_pairs(self):
+        manager = VectorPairPickleManager(self.pickle_dir, "A4")
+        manager.save_vector_pairs(1, 2, [("v", "w")])
+        manager.save_vector_pairs(1, 2, [("v", "w"), ("x", "y")])
+        self.assertEqual(manager.get_pickle_data(1, 2, "A4"), [("v", "w"), ("x", "y")])
+        # the table is written next to its file and moved into place, so nothing else is left behind
+        self.assertEqual(os.listdir(self.pickle_dir), [os.path.basename(manager.get_transition_pickle_filename(1, 2, "A4"))])
+
+    def test_indexed_transitions(self):
+        manager = TransitionPickleManager(self.pickle_dir, indexed=True)
+        transitions = [([1], [2], f"T{i}", f"B0_{i}", f"B1_{i}") for i in range(5)]
+        manager.save_transitions([1], [2], "A4", transitions)
+        manager.save_transitions([3], [4], "A4", [])
+
+        self.assertEqual(manager.load_transitions([1], [2], "A4"), transitions)
+        self.assertEqual(manager.count_transitions([1], [2], "A4"), 5)
+        self.assertFalse(manager.check_case_is_possible([1, 3], [2, 4], "A4"))
+        with manager.open_transitions([1], [2], "A4") as reader:
+            self.assertEqual(len(reader), 5)
+            self.assertEqual(reader[3], transitions[3])
+
+        # plain pickle files can still be read by the same manager
+        TransitionPickleManager(self.pickle_dir).save_transitions([5], [6], "A4", transitions)
+        self.assertEqual(manager.open_transitions([5], [6], "A4"), transitions)
+        self.assertEqual(manager.count_transitions([5], [6], "A4"), 5)
+
+
+class IndexedPickleTests(unittest.TestCase):
+    """Test cases for indexed_pickle.py."""
+    def setUp(self):
+        self.pickle_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.pickle_dir, "items.pickle")
+
+    def tearDown(self):
+        shutil.rmtree(self.pickle_dir)
+
+    def test_random_access(self):
+        items = [{"index": i, "data": list(range(i))} for i in range(20)]
+        write_indexed_pickle(self.filename, items)
+        self.assertEqual(count_indexed_pickle(self.filename), 20)
+
+        with IndexedPickleReader(self.filename) as reader:
+            self.assertEqual(reader[7], items[7])
+            self.assertEqual(reader[-1], items[-1])
+            self.assertEqual(reader[2:10:3], items[2:10:3])
+            self.assertEqual(list(reader), items)
+            with self.assertRaises(IndexError):
+                reader[20]
+
+    def test_empty(self):
+        write_indexed_pickle(self.filename, [])
+        with IndexedPickleReader(self.filename) as reader:
+            self.assertEqual(list(reader), [])
+
+
+class SQLiteTransitionManagerTests(unittest.TestCase):
+    """Test cases for SQLiteTransitionManager in sqlite_manager.py."""
+    def setUp(self):
+        self.pickle_dir = tempfile.mkdtemp()
+        self.transition_manager = SQLiteTransitionManager(self.pickle_dir, batch_size=2)
+
+    def tearDown(self):
+        self.transition_manager.close()
+        shutil.rmtree(self.pickle_dir)
+
+    def test_save_and_load(self):
+        manager = self.transition_manager
+        self.assertFalse(manager.transition_pickle_file_exists([1], [2], "A4"))
+        self.assertIsNone(manager.count_transitions([1], [2], "A4"))
+        with self.assertRaises(FileNotFoundError):
+            manager.load_transitions([1], [2], "A4")
+
+        manager.save_transitions([1], [2], "a4", ["first", "second"], metadata={"exists_only": True})
+        self.assertTrue(manager.transition_pickle_file_exists(1, 2, "A4"))
+        self.assertEqual(manager.count_transitions([1], [2], "A4"), 2)
+        self.assertEqual(manager.load_transitions([1], [2], "A4"), ["first", "second"])
+        self.assertEqual(manager.load_metadata([1], [2], "A4"), {"exists_only": True})
+
+        # saving a case again replaces it
+        manager.save_transitions([1], [2], "A4", [])
+        self.assertEqual(manager.load_transitions([1], [2], "A4"), [])
+        self.assertEqual(manager.load_metadata([1], [2], "A4"), {})
+        self.assertEqual(manager.get_saved_cases(), [("1", "2", "A4")])
+
+    def test_batched_writes(self):
+        manager = self.transition_manager
+        manager.save_transitions([1], [2], "A4", [])
+        other_manager = SQLiteTransitionManager(self.pickle_dir)
+        self.assertFalse(other_manager.transition_pickle_file_exists([1], [2], "A4"))
+
+        # the second save fills the batch and commits both
+        manager.save_transitions([1, 3], [2, 4], "A4", ["transition"])
+        self.assertEqual(other_manager.count_transitions([1, 3], [2, 4], "A4"), 1)
+        self.assertEqual(other_manager.count_transitions([1], [2], "A4"), 0)
+        other_manager.close()
+
+    def test_check_case_is_possible(self):
+        manager = self.transition_manager
+        manager.save_transitions([1], [2], "A4", ["transition"])
+        manager.save_transitions([3], [4], "A4", [])
+        self.assertTrue(manager.check_case_is_possible([1, 5], [2, 6], "A4"))
+        self.assertFalse(manager.check_case_is_possible([1, 3], [2, 4], "A4"))
+
+        # a three base case is ruled out by an impossible two base sub-case, in any column order
+        manager.save_transitions([5, 6], [6, 5], "A4", [])
+        self.assertTrue(manager.check_case_is_possible([1, 5, 7], [2, 6, 7], "A4"))
+        self.assertFalse(manager.check_case_is_possible([6, 1, 5], [5, 2, 6], "A4"))
+
+
+class FeasibilityIndexTests(unittest.TestCase):
+    """Test cases for feasibility.py."""
+    def test_one_base_bitset(self):
+        feasibility_index = FeasibilityIndex()
+        self.assertIsNone(feasibility_index.lookup(1, 55))
+        feasibility_index.record([1], [55], 0)
+        feasibility_index.record([55], [1], 3)
+        self.assertIs(feasibility_index.lookup(1, 55), False)
+        self.assertIs(feasibility_index.lookup(55, 1), True)
+        self.assertIsNone(feasibility_index.lookup(55, 55))
+
+        # a redone case replaces the old result
+        feasibility_index.record([1], [55], 2)
+        self.assertIs(feasibility_index.lookup(1, 55), True)
+
+    def test_sub_cases(self):
+        feasibility_index = FeasibilityIndex()
+        feasibility_index.record([12], [13], 0)
+        feasibility_index.record([11, 12], [12, 11], 0)
+        self.assertEqual(feasibility_index.find_infeasible_sub_case([11, 12], [11, 13]), ([12], [13]))
+        self.assertEqual(feasibility_index.find_infeasible_sub_case([13, 12, 11], [13, 11, 12]), ([12, 11], [11, 12]))
+        self.assertIsNone(feasibility_index.find_infeasible_sub_case([11, 12, 13], [11, 12, 13]))
+        self.assertIsNone(feasibility_index.find_infeasible_sub_case([11, 12], [11, 12]))
+
+    def test_built_from_saved_results(self):
+        pickle_dir = tempfile.mkdtemp()
+        try:
+            manager = TransitionPickleManager(pickle_dir, indexed=True)
+            manager.save_transitions([1], [2], "A4", [])
+            manager.save_transitions([1], [2], "D10", ["transition"])
+            manager.save_transitions([3, 4], [4, 3], "A4", [])
+
+            # only the manifest is read to build an index, one-base cases are looked up when checked
+            manager = TransitionPickleManager(pickle_dir)
+            feasibility_index = manager.get_feasibility_index("a4")
+            self.assertIsNone(feasibility_index.lookup(1, 2))
+            self.assertEqual(feasibility_index.infeasible_keys, {((3, 4), (4, 3))})
+            self.assertFalse(manager.check_case_is_possible([4, 3, 5], [3, 4, 5], "A4"))
+            self.assertFalse(manager.check_case_is_possible([1, 5], [2, 6], "A4"))
+            self.assertIs(feasibility_index.lookup(1, 2), False)
+
+            # results without a manifest entry are not opened for the index
+            os.remove(os.path.join(pickle_dir, "manifest.jsonl"))
+            manager = TransitionPickleManager(pickle_dir)
+            self.assertEqual(manager.get_feasibility_index("A4").infeasible_keys, set())
+            # a one-base file is counted once, and its count is added to the manifest
+            self.assertTrue(manager.check_case_is_possible([1, 5], [2, 6], "D10"))
+            self.assertEqual(list(manifest.read_manifest(pickle_dir)), ["1_to_2_D10.pickle"])
+            self.assertEqual(TransitionPickleManager(pickle_dir).get_case_count([1], [2], "D10"), 1)
+        finally:
+            shutil.rmtree(pickle_dir)
+
+
+def run_queue_worker(queue_dir, log_filename):
+    # takes cases until the queue is done, logging each case it did
+    work_queue = WorkQueue(queue_dir, lease_seconds=5)
+    for claim in work_queue.claims(poll_seconds=0.05):
+        with claim:
+            start_tuple, end_tuple = claim.get_case()
+            time.sleep(0.01)
+            with open(log_filename, 'a') as write_file:
+                write_file.write(f"{start_tuple} {end_tuple}\n")
+            claim.complete()
+
+
+class WorkQueueTests(unittest.TestCase):
+    """Test cases for work_queue.py."""
+    def setUp(self):
+        self.queue_dir = tempfile.mkdtemp()
+        self.cases = [([i], [j]) for i in range(1, 6) for j in range(1, 5)]
+
+    def tearDown(self):
+        shutil.rmtree(self.queue_dir)
+
+    def test_every_case_done_once_by_several_processes(self):
+        work_queue = WorkQueue(self.queue_dir)
+        self.assertEqual(work_queue.add_cases(self.cases), len(self.cases))
+        self.assertEqual(work_queue.add_cases(self.cases), 0)
+        # the same cases in another order are not added again
+        self.assertEqual(work_queue.add_cases(self.cases[::-1]), 0)
+
+        log_filename = os.path.join(self.queue_dir, "log.txt")
+        workers = [multiprocessing.Process(target=run_queue_worker, args=(self.queue_dir, log_filename))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        with open(log_filename, 'r') as read_file:
+            done = sorted(read_file.read().splitlines())
+        self.assertEqual(done, sorted(f"{start} {end}" for start, end in self.cases))
+        self.assertTrue(work_queue.all_done())
+        self.assertEqual(os.listdir(os.path.join(self.queue_dir, "claims")), [])
+
+    def test_expired_lease_is_taken_over(self):
+        work_queue = WorkQueue(self.queue_dir, lease_seconds=0.2)
+        work_queue.add_cases(self.cases[:1])
+
+        dead_claim = work_queue.claim_next("dead")
+        self.assertIsNotNone(dead_claim)
+        self.assertIsNone(work_queue.claim_next("live"))
+
+        # the first worker stops renewing its lease
+        time.sleep(0.3)
+        claim = work_queue.claim_next("live")
+        self.assertEqual(claim.generation, 1)
+        self.assertFalse(dead_claim.heartbeat())
+        self.assertTrue(claim.heartbeat())
+
+        claim.complete()
+        self.assertTrue(work_queue.all_done())
+        self.assertIsNone(work_queue.claim_next("live"))
+
+    def test_journal_stops_after_takeover(self):
+        work_queue = WorkQueue(self.queue_dir, lease_seconds=0.2)
+        work_queue.add_cases(self.cases[:1])
+        manager = TransitionPickleManager(self.queue_dir)
+        settings = {"split_depth": 1, "symmetry_breaking": False}
+
+        dead_claim = work_queue.claim_next("dead")
+        dead_journal = manager.open_journal([1], [1], "A4", settings, dead_claim)
+        dead_journal.open()
+        dead_journal.record((0,), (None, None, None))
+
+        time.sleep(0.3)
+        claim = work_queue.claim_next("live")
+        with manager.open_journal([1], [1], "A4", settings, claim) as journal:
+            self.assertEqual(journal.finished, {(0,): (None, None, None)})
+            journal.record((1,), ("T", "B0", "B1"))
+            # the worker that lost the case does not write over the records of the new holder
+            with self.assertRaises(LeaseLost):
+                dead_journal.record((1,), (None, None, None))
+            dead_journal.close()
+        self.assertEqual(manager.open_journal([1], [1], "A4", settings).finished,
+                         {(0,): (None, None, None), (1,): ("T", "B0", "B1")})
+
+        claim.complete()
+        self.assertRaises(LeaseLost, dead_claim.check_held)
+
+    def test_released_claim_is_handed_out_again(self):
+        work_queue = WorkQueue(self.queue_dir)
+        work_queue.add_cases(self.cases[:1])
+
+        with work_queue.claim_next("first") as claim:
+            self.assertEqual(claim.get_case(), ([1], [1]))
+            self.assertIsNone(work_queue.claim_next("second"))
+        claim = work_queue.claim_next("second")
+        self.assertEqual(claim.generation, 1)
+        self.assertFalse(work_queue.all_done())
+
+
+if __name__ == '__main__':
+    unittest.main()
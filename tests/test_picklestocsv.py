@@ -0,0 +1,52 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from pickle_manager import manifest
+from pickle_manager.pickle_manager import TransitionPickleManager
+from picklestocsv import get_result_kinds, get_transition_counts
+
+
+class TransitionCountTests(unittest.TestCase):
+    """Test cases for the manifest driven counts in picklestocsv.py."""
+    def setUp(self):
+        self.pickle_dir = tempfile.mkdtemp()
+        self.transition_pickle_manager = TransitionPickleManager(self.pickle_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.pickle_dir)
+
+    def test_counts_from_manifest(self):
+        self.transition_pickle_manager.save_transitions([1], [2], "A4", ["a", "b"])
+        self.transition_pickle_manager.save_transitions([1], [3], "A4", [])
+        pickles = ["1_to_2_A4.pickle", "1_to_3_A4.pickle"]
+        self.assertEqual(set(manifest.read_manifest(self.pickle_dir)), set(pickles))
+        self.assertEqual(get_transition_counts(self.pickle_dir, pickles, processes=1), [2, 0])
+
+        # a file written without going through the manager is counted and added to the manifest
+        with open(os.path.join(self.pickle_dir, "2_to_2_A4.pickle"), 'wb') as write_file:
+            pickle.dump(["c"], write_file)
+        pickles.append("2_to_2_A4.pickle")
+        self.assertEqual(get_transition_counts(self.pickle_dir, pickles, processes=1), [2, 0, 1])
+        self.assertEqual(manifest.read_manifest(self.pickle_dir)["2_to_2_A4.pickle"]["count"], 1)
+
+        # so is a file that changed since its entry was written
+        with open(os.path.join(self.pickle_dir, "1_to_3_A4.pickle"), 'wb') as write_file:
+            pickle.dump(["d", "e", "f"], write_file)
+        self.assertEqual(get_transition_counts(self.pickle_dir, pickles, processes=1), [2, 3, 1])
+
+    def test_result_kinds(self):
+        self.transition_pickle_manager.save_transitions([1], [2], "A4", ["a", "b"])
+        self.transition_pickle_manager.save_transitions([1], [3], "A4", ["a"], metadata={"exists_only": True})
+        self.transition_pickle_manager.save_transitions([1], [4], "A4", ["a"], metadata={"symmetry_breaking": True,
+                                                                                         "expanded": False})
+        self.transition_pickle_manager.save_transitions([1], [5], "A4", ["a"], metadata={"symmetry_breaking": True,
+                                                                                         "expanded": True})
+        pickles = [f"1_to_{end}_A4.pickle" for end in range(2, 6)]
+        self.assertEqual(get_result_kinds(self.pickle_dir, pickles), ["all", "exists_only", "representatives", "all"])
+
+
+if __name__ == '__main__':
+    unittest.main()
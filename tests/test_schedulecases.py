@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pickle_manager.pickle_manager import VectorPairPickleManager
+from pt_arr_cases.schedulecases import estimate_case_cost, predict_makespan, schedule_cases, write_plan
+
+
+class ScheduleCasesTests(unittest.TestCase):
+    """Test cases for schedulecases.py."""
+    def setUp(self):
+        self.pair_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.pair_dir)
+
+    def test_longest_first(self):
+        cases = [([12], [12]), ([1], [1]), ([11, 12], [12, 11]), ([13], [13])]
+        plan = schedule_cases(cases, "A4", self.pair_dir)
+
+        vector_pair_pickle_manager = VectorPairPickleManager(self.pair_dir, "A4", verbose=False)
+        costs = {str(case): estimate_case_cost(vector_pair_pickle_manager, *case) for case in cases}
+        self.assertEqual(costs[str(([12], [12]))], 48 * 48)
+
+        self.assertEqual(sorted(map(str, cases)), sorted(str(case) for case, _ in plan))
+        self.assertEqual([cost for _, cost in plan], sorted(costs.values(), reverse=True))
+        self.assertEqual([case for case, _ in plan][-2:], [([12], [12]), ([13], [13])])
+
+        # without reordering the costs are still given
+        self.assertEqual([case for case, _ in schedule_cases(cases, "A4", self.pair_dir, longest_first=False)], cases)
+
+        plan_filename = os.path.join(self.pair_dir, "plan.csv")
+        write_plan(plan_filename, plan)
+        with open(plan_filename, 'r') as read_file:
+            lines = read_file.read().splitlines()
+        self.assertEqual(len(lines), len(cases) + 1)
+        self.assertTrue(lines[-1].endswith(",1.000000"))
+
+    def test_predict_makespan(self):
+        self.assertEqual(predict_makespan([5, 4, 3, 3], 2), 8)
+        self.assertEqual(predict_makespan([5, 4, 3, 3], 1), 15)
+        self.assertEqual(predict_makespan([1], 4), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
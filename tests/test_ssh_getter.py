@@ -0,0 +1,136 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+import sympy as sp
+
+from pickle_manager.pickle_manager import TransitionPickleManager
+from ssh_getter.ssh_getter import CACHE_INDEX_FILENAME, LocalTransport, RemoteSync, download_cases_from_remote, \
+    get_max_cache_bytes, get_transitions_from_remote
+
+
+class CountingTransport(LocalTransport):
+    def __init__(self):
+        self.num_listings = 0
+        self.num_stats = 0
+        self.num_gets = 0
+
+    def stat_dir(self, remote_dir):
+        self.num_listings += 1
+        return super().stat_dir(remote_dir)
+
+    def stat(self, remote_path):
+        self.num_stats += 1
+        return super().stat(remote_path)
+
+    def get(self, remote_path, local_path):
+        self.num_gets += 1
+        super().get(remote_path, local_path)
+
+
+class SSHGetterTests(unittest.TestCase):
+    """Test cases for ssh_getter.py, with a local directory standing in for the remote."""
+    def setUp(self):
+        self.remote_dir = tempfile.mkdtemp()
+        self.download_dir = tempfile.mkdtemp()
+        self.remote_pickle_manager = TransitionPickleManager(self.remote_dir)
+        self.transition = ((1,), (1,), sp.eye(6), sp.eye(6), sp.eye(6))
+        self.cases = [([1], [2]), ([12, 13], [13, 12]), ([3], [3])]
+        for start_tuple, end_tuple in self.cases:
+            self.remote_pickle_manager.save_transitions(start_tuple, end_tuple, "A4", [self.transition])
+
+    def tearDown(self):
+        shutil.rmtree(self.remote_dir)
+        shutil.rmtree(self.download_dir)
+
+    def test_download_batch(self):
+        transport = CountingTransport()
+        with RemoteSync(transport, self.remote_dir, self.download_dir, max_workers=4) as remote_sync:
+            local_paths = download_cases_from_remote(self.cases, "A4", remote_sync)
+            self.assertEqual(transport.num_listings, 1)
+            self.assertEqual(transport.num_gets, 3)
+
+            self.assertEqual([os.path.basename(local_path) for local_path in local_paths],
+                             [self.remote_pickle_manager.get_transition_pickle_filename(start_tuple, end_tuple, "A4", exclude_dir=True)
+                              for start_tuple, end_tuple in self.cases])
+            self.assertEqual(sorted(os.listdir(self.download_dir)), sorted(list(map(os.path.basename, local_paths)) + [CACHE_INDEX_FILENAME]))
+
+            # a single file is checked with a stat instead of a listing
+            transitions = get_transitions_from_remote([1], [2], "A4", "localhost", remote_sync=remote_sync)
+            self.assertEqual(transitions, [self.transition])
+            self.assertEqual((transport.num_listings, transport.num_stats), (1, 1))
+
+    def test_download_missing(self):
+        transport = CountingTransport()
+        remote_sync = RemoteSync(transport, self.remote_dir, self.download_dir)
+        with self.assertRaises(FileNotFoundError):
+            download_cases_from_remote([([1], [2]), ([4], [5])], "A4", remote_sync)
+        # nothing is downloaded when any file is missing
+        self.assertEqual(transport.num_gets, 0)
+        self.assertEqual(os.listdir(self.download_dir), [])
+
+        # files added on remote after the listing are found
+        self.remote_pickle_manager.save_transitions([4], [5], "A4", [])
+        self.assertEqual(get_transitions_from_remote([4], [5], "A4", "localhost", remote_sync=remote_sync), [])
+        self.assertEqual((transport.num_listings, transport.num_stats), (1, 1))
+
+    def test_download_matching(self):
+        self.remote_pickle_manager.save_transitions([1], [2], "D6", [self.transition])
+        remote_sync = RemoteSync(LocalTransport(), self.remote_dir, self.download_dir)
+        local_paths = remote_sync.download_matching("*_A4.pickle")
+        self.assertEqual(len(local_paths), 3)
+        self.assertTrue(all(local_path.endswith("_A4.pickle") for local_path in local_paths))
+        self.assertEqual(remote_sync.download_matching("*_D10.pickle"), [])
+
+    def test_cache(self):
+        transport = CountingTransport()
+        with RemoteSync(transport, self.remote_dir, self.download_dir) as remote_sync:
+            download_cases_from_remote(self.cases, "A4", remote_sync)
+            self.assertEqual(get_transitions_from_remote([1], [2], "A4", "localhost", remote_sync=remote_sync), [self.transition])
+            self.assertEqual((transport.num_gets, remote_sync.num_cache_hits), (3, 1))
+
+        # the cache lasts between runs, and only the listing is needed to validate it
+        transport = CountingTransport()
+        remote_sync = RemoteSync(transport, self.remote_dir, self.download_dir)
+        download_cases_from_remote(self.cases, "A4", remote_sync)
+        self.assertEqual((transport.num_listings, transport.num_gets, remote_sync.num_cache_hits), (1, 0, 3))
+
+        # a result rewritten on remote is downloaded again by the same RemoteSync on the next request
+        self.assertEqual(get_transitions_from_remote([1], [2], "A4", "localhost", remote_sync=remote_sync), [self.transition])
+        self.remote_pickle_manager.save_transitions([1], [2], "A4", [self.transition] * 2)
+        remote_file = os.path.join(self.remote_dir, "1_to_2_A4.pickle")
+        os.utime(remote_file, (time.time() + 10, time.time() + 10))
+        self.assertEqual(get_transitions_from_remote([1], [2], "A4", "localhost", remote_sync=remote_sync), [self.transition] * 2)
+        self.assertEqual(transport.num_gets, 1)
+
+        # a damaged local copy is not used
+        with open(os.path.join(self.download_dir, "3_to_3_A4.pickle"), 'ab') as write_file:
+            write_file.write(b"0")
+        self.assertEqual(get_transitions_from_remote([3], [3], "A4", "localhost", remote_sync=remote_sync), [self.transition])
+        self.assertEqual(transport.num_gets, 2)
+
+    def test_cache_eviction(self):
+        filenames = sorted(filename for filename in os.listdir(self.remote_dir) if filename.endswith(".pickle"))
+        sizes = {filename: os.path.getsize(os.path.join(self.remote_dir, filename)) for filename in filenames}
+        max_cache_bytes = sizes[filenames[0]] + sizes[filenames[1]]
+        remote_sync = RemoteSync(CountingTransport(), self.remote_dir, self.download_dir, max_cache_bytes=max_cache_bytes)
+
+        remote_sync.download(filenames[:2])
+        remote_sync.download(filenames[:1])
+        # the least recently used file makes room for the new one
+        remote_sync.download(filenames[2:])
+        self.assertEqual(sorted(os.listdir(self.download_dir)), sorted([filenames[0], filenames[2], CACHE_INDEX_FILENAME]))
+        self.assertTrue(remote_sync.cache.get_size() <= max_cache_bytes)
+
+        # files being downloaded are kept even when they do not all fit
+        remote_sync.download(filenames)
+        self.assertEqual(sorted(os.listdir(self.download_dir)), sorted(filenames + [CACHE_INDEX_FILENAME]))
+
+        self.assertEqual(get_max_cache_bytes(1.5), 1572864)
+        self.assertIsNone(get_max_cache_bytes(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
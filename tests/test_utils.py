@@ -1,9 +1,12 @@
 import unittest
+from fractions import Fraction
 
 import sympy as sp
 
 from utils.generatinglist_utils import has_same_number_elements, is_valid_generating_list
 from utils.input_checker import can_be_int_tuple, convert_to_generating_list
+from utils.linalg_utils import (AffineSubspace, IntegerEchelonBasis, determinant_mod, fraction_mod,
+                                is_inconsistent_mod, row_reduce, to_integer_vector)
 from utils.sympy_utils import equation_is_true_or_solvable
 
 
@@ -55,5 +58,66 @@ class SympyUtilTests(unittest.TestCase):
         self.assertTrue(equation_is_true_or_solvable(ex_eq_with_var))
 
 
+class LinalgUtilTests(unittest.TestCase):
+    """Test cases for linalg_utils.py."""
+    def test_row_reduce(self):
+        rows = [[Fraction(1), Fraction(2)], [Fraction(2), Fraction(4)]]
+        self.assertIsNone(row_reduce(rows, [Fraction(1), Fraction(3)]))
+
+        reduced_rows, reduced_rhs, pivots = row_reduce(rows, [Fraction(1), Fraction(2)])
+        self.assertEqual(reduced_rows, [[1, 2]])
+        self.assertEqual(reduced_rhs, [1])
+        self.assertEqual(pivots, [0])
+
+    def test_affine_subspace_intersect(self):
+        # x + y + z = 1, then y - z = 2
+        subspace = AffineSubspace.whole_space(3).intersect([[Fraction(1)] * 3], [Fraction(1)])
+        self.assertEqual(subspace.free_coordinates, [1, 2])
+        subspace = subspace.intersect([[Fraction(0), Fraction(1), Fraction(-1)]], [Fraction(2)])
+        self.assertEqual(subspace.free_coordinates, [2])
+        self.assertEqual(subspace.particular, [-1, 2, 0])
+        self.assertEqual(subspace.directions, [[-2, 1, 1]])
+
+        self.assertIsNone(subspace.intersect([[Fraction(0), Fraction(1), Fraction(-1)]], [Fraction(3)]))
+
+    def test_integer_echelon_basis(self):
+        basis = IntegerEchelonBasis([(2, 4, 0), (1, 2, 0)])
+        self.assertEqual(basis.rank(), 1)
+        self.assertTrue(basis.add((0, 3, 3)))
+        self.assertTrue(basis.contains((2, 7, 3)))
+        self.assertFalse(basis.contains((0, 0, 1)))
+
+        basis.pop()
+        self.assertEqual(basis.rank(), 1)
+        self.assertFalse(basis.contains((0, 3, 3)))
+
+    def test_to_integer_vector(self):
+        self.assertEqual(to_integer_vector([sp.Rational(1, 2), 0, sp.Rational(-3, 4)]), ((2, 0, -3), 4))
+        self.assertEqual(to_integer_vector([1, 2]), ((1, 2), 1))
+
+
+    def test_determinant_mod(self):
+        prime = 101
+        matrix = sp.Matrix([[2, 3, 1], [4, -1, 5], [0, 7, 6]])
+        rows = [[int(entry) for entry in matrix.row(r)] for r in range(matrix.rows)]
+        self.assertEqual(determinant_mod(rows, prime), matrix.det() % prime)
+        self.assertEqual(determinant_mod([[1, 2], [2, 4]], prime), 0)
+        self.assertEqual(determinant_mod([[0, 1], [1, 0]], prime), prime - 1)
+
+    def test_fraction_mod(self):
+        self.assertEqual(fraction_mod(Fraction(1, 2), 7) * 2 % 7, 1)
+        self.assertEqual(fraction_mod(-3, 7), 4)
+        self.assertIsNone(fraction_mod(Fraction(1, 7), 7))
+
+    def test_is_inconsistent_mod(self):
+        prime = 7
+        self.assertTrue(is_inconsistent_mod([[1, 0], [0, 1], [1, 1]], [1, 2, 4], prime))
+        self.assertFalse(is_inconsistent_mod([[1, 0], [0, 1], [1, 1]], [1, 2, 3], prime))
+        # 7x = 1 has a rational solution even though it has none mod 7, so it must not be ruled out
+        self.assertFalse(is_inconsistent_mod([[0]], [1], prime))
+        # without full column rank nothing is decided
+        self.assertFalse(is_inconsistent_mod([[1, 2], [2, 4]], [1, 3], prime))
+
+
 if __name__ == '__main__':
     unittest.main()
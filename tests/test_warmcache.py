@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from matrixgroups.orbitcatalog import ORBIT_CATALOG_FILENAME
+from pickle_manager.pickle_manager import VECTOR_PAIR_BUNDLE_FILENAME, VectorPairPickleManager
+from warmcache import get_all_pair_table_cases, warm_cache
+
+
+class WarmCacheTests(unittest.TestCase):
+    """Test cases for warmcache.py."""
+    def setUp(self):
+        self.pair_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.pair_dir)
+
+    def test_all_cases(self):
+        cases = get_all_pair_table_cases()
+        self.assertEqual(len(cases), 9 + 55 * 55)
+        self.assertIn(("s", "f"), cases)
+        self.assertIn((55, 1), cases)
+
+    def test_bundle_is_used_by_vector_pair_manager(self):
+        cases = [("s", "s"), (12, 13)]
+        self.assertEqual(warm_cache(self.pair_dir, ["D10"], cases, processes=2), 2)
+        # tables already in the bundle are not computed again
+        self.assertEqual(warm_cache(self.pair_dir, ["D10"], cases + [(13, 12)], processes=2), 1)
+
+        vector_pair_pickle_manager = VectorPairPickleManager(self.pair_dir, "D10", verbose=False)
+        self.assertIsNotNone(vector_pair_pickle_manager.bundle)
+        orbits_pairs = vector_pair_pickle_manager.get_multiple_vector_pairs([12], [13], add_in_translation=True)
+        self.assertEqual(orbits_pairs, [vector_pair_pickle_manager.generate_vector_pairs("s", "s"),
+                                        vector_pair_pickle_manager.generate_vector_pairs(12, 13)])
+
+        # nothing is written besides the bundle and the orbit catalog
+        self.assertEqual(sorted(os.listdir(self.pair_dir)), sorted([VECTOR_PAIR_BUNDLE_FILENAME, ORBIT_CATALOG_FILENAME]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,268 @@
+import math
+from fractions import Fraction
+
+
+def to_fraction_vector(vector):
+    """
+    Converts a sympy vector (or any iterable of rationals) into a list of Fractions.
+    :param vector: Iterable of sympy Rationals/Integers or Python ints.
+    :return: List of Fractions.
+    """
+    return [Fraction(int(entry.p), int(entry.q)) if hasattr(entry, 'q') else Fraction(entry) for entry in vector]
+
+
+def mat_vec(matrix, vector):
+    return [sum(entry * v for entry, v in zip(row, vector)) for row in matrix]
+
+
+def row_reduce(rows, rhs):
+    """
+    Computes the reduced row echelon form of the augmented system [rows | rhs] over the rationals.
+    :param rows: List of rows (lists of Fractions), all of the same length.
+    :param rhs: List of Fractions, one per row.
+    :return: (reduced_rows, reduced_rhs, pivot_columns) or None if the system is inconsistent.
+    """
+    rows = [list(row) for row in rows]
+    rhs = list(rhs)
+    num_cols = len(rows[0]) if rows else 0
+
+    pivot_columns = []
+    pivot_row = 0
+    for col in range(num_cols):
+        found = next((r for r in range(pivot_row, len(rows)) if rows[r][col] != 0), None)
+        if found is None:
+            continue
+
+        rows[pivot_row], rows[found] = rows[found], rows[pivot_row]
+        rhs[pivot_row], rhs[found] = rhs[found], rhs[pivot_row]
+
+        pivot = rows[pivot_row][col]
+        if pivot != 1:
+            rows[pivot_row] = [entry / pivot for entry in rows[pivot_row]]
+            rhs[pivot_row] = rhs[pivot_row] / pivot
+
+        for r in range(len(rows)):
+            factor = rows[r][col]
+            if r != pivot_row and factor != 0:
+                rows[r] = [a - factor * b for a, b in zip(rows[r], rows[pivot_row])]
+                rhs[r] = rhs[r] - factor * rhs[pivot_row]
+
+        pivot_columns.append(col)
+        pivot_row += 1
+        if pivot_row == len(rows):
+            break
+
+    # any remaining row is all zeros, so a nonzero right hand side means 0 = c
+    if any(value != 0 for value in rhs[pivot_row:]):
+        return None
+
+    return rows[:pivot_row], rhs[:pivot_row], pivot_columns
+
+
+class AffineSubspace:
+    """
+    An affine subspace {particular + sum_j q_j * directions[j]} of rational vectors.
+
+    The subspace is always kept in the form given by the reduced row echelon form of its defining
+    equations: the parameters q_j are the coordinates at free_coordinates[j], so directions[j] is 1 at
+    free_coordinates[j] and 0 at every other free coordinate, and particular is 0 at every free coordinate.
+    This is the same parametrization sympy's solve produces when solving for the symbols in order.
+    """
+    def __init__(self, particular, directions, free_coordinates):
+        self.particular = particular
+        self.directions = directions
+        self.free_coordinates = free_coordinates
+
+    @classmethod
+    def whole_space(cls, dimension):
+        identity = [[Fraction(int(i == j)) for j in range(dimension)] for i in range(dimension)]
+        return cls([Fraction(0)] * dimension, identity, list(range(dimension)))
+
+    def dimension(self):
+        return len(self.directions)
+
+    def intersect(self, rows, rhs):
+        """
+        Intersects the subspace with the solutions of rows * p = rhs.
+        :param rows: List of linear functionals on the ambient space (lists of Fractions).
+        :param rhs: List of Fractions, one per row.
+        :return: The intersection as a new AffineSubspace, or None if it is empty.
+        """
+        # substituting p = particular + directions^T q gives a (usually much smaller) system in q
+        reduced_rows = [[sum(a * d for a, d in zip(row, direction)) for direction in self.directions] for row in rows]
+        reduced_rhs = [value - sum(a * p for a, p in zip(row, self.particular)) for row, value in zip(rows, rhs)]
+
+        if not self.directions:
+            if any(value != 0 for value in reduced_rhs):
+                return None
+            return self
+
+        reduced = row_reduce(reduced_rows, reduced_rhs)
+        if reduced is None:
+            return None
+
+        echelon_rows, echelon_rhs, pivots = reduced
+        if not pivots:
+            return self
+
+        # each pivot parameter q_k becomes echelon_rhs - sum over the free parameters
+        free = [j for j in range(len(self.directions)) if j not in pivots]
+        particular = list(self.particular)
+        for row, value, k in zip(echelon_rows, echelon_rhs, pivots):
+            if value != 0:
+                particular = [p + value * d for p, d in zip(particular, self.directions[k])]
+
+        directions = []
+        for j in free:
+            direction = list(self.directions[j])
+            for row, k in zip(echelon_rows, pivots):
+                factor = row[j]
+                if factor != 0:
+                    direction = [d - factor * e for d, e in zip(direction, self.directions[k])]
+            directions.append(direction)
+
+        return AffineSubspace(particular, directions, [self.free_coordinates[j] for j in free])
+
+
+def to_integer_vector(vector):
+    """
+    Scales a rational vector to integers by the least common multiple of its denominators.
+    :param vector: Iterable of sympy Rationals, Fractions or ints.
+    :return: (tuple of ints, scale) such that vector = ints / scale.
+    """
+    fractions = to_fraction_vector(vector)
+    scale = math.lcm(*(entry.denominator for entry in fractions)) if fractions else 1
+    return tuple(int(entry * scale) for entry in fractions), scale
+
+
+class IntegerEchelonBasis:
+    """
+    Row echelon basis of the span of some integer vectors, built fraction-free.
+    Every stored row is zero at the pivots of the rows stored before it, so a vector is reduced by one pass over the rows.
+    """
+    def __init__(self, vectors=()):
+        self.rows = []
+        self.pivots = []
+        for vector in vectors:
+            self.add(vector)
+
+    def rank(self):
+        return len(self.rows)
+
+    def reduce(self, vector):
+        vector = list(vector)
+        for pivot, row in zip(self.pivots, self.rows):
+            factor = vector[pivot]
+            if factor != 0:
+                vector = [row[pivot] * v - factor * r for v, r in zip(vector, row)]
+        return vector
+
+    def contains(self, vector):
+        return not any(self.reduce(vector))
+
+    def add(self, vector):
+        """
+        Adds a vector to the basis if it is not already in the span.
+        :return: True if the rank went up.
+        """
+        reduced = self.reduce(vector)
+        pivot = next((i for i, entry in enumerate(reduced) if entry != 0), None)
+        if pivot is None:
+            return False
+
+        divisor = math.gcd(*reduced)
+        self.rows.append([entry // divisor for entry in reduced])
+        self.pivots.append(pivot)
+        return True
+
+    def pop(self):
+        """
+        Removes the most recently added vector, so the basis can be used as a stack in a depth first search.
+        """
+        self.rows.pop()
+        self.pivots.pop()
+
+
+def fraction_mod(value, prime):
+    """
+    Reduces a rational number modulo a prime.
+    :return: An int in [0, prime), or None if the denominator is divisible by the prime.
+    """
+    value = Fraction(value)
+    if value.denominator % prime == 0:
+        return None
+    return value.numerator * pow(value.denominator, -1, prime) % prime
+
+
+def determinant_mod(rows, prime):
+    """
+    Determinant of a square matrix of ints modulo a prime, by Gaussian elimination over the integers mod prime.
+    """
+    rows = [[entry % prime for entry in row] for row in rows]
+    determinant = 1
+    for col in range(len(rows)):
+        pivot_row = next((r for r in range(col, len(rows)) if rows[r][col] != 0), None)
+        if pivot_row is None:
+            return 0
+        if pivot_row != col:
+            rows[col], rows[pivot_row] = rows[pivot_row], rows[col]
+            determinant = -determinant
+
+        pivot = rows[col][col]
+        determinant = determinant * pivot % prime
+        pivot_inverse = pow(pivot, -1, prime)
+        for r in range(col + 1, len(rows)):
+            factor = rows[r][col] * pivot_inverse % prime
+            if factor != 0:
+                rows[r] = [(a - factor * b) % prime for a, b in zip(rows[r], rows[col])]
+
+    return determinant % prime
+
+
+# word sized primes for modular pre-filters, the three largest primes below 2^31
+MODULAR_PRIMES = (2147483647, 2147483629, 2147483587)
+
+
+def is_inconsistent_mod(rows, rhs, prime):
+    """
+    Tests whether rows * x = rhs has no rational solution, using only arithmetic modulo a prime.
+    Reducing mod p can only lower ranks, so the system is inconsistent over the rationals for certain when
+    rows has full column rank mod p (and so over the rationals) while [rows | rhs] has a higher rank mod p.
+    :param rows: List of rows of ints already reduced mod prime.
+    :param rhs: List of ints already reduced mod prime, one per row.
+    :return: True if the system is certainly inconsistent, False if this could not be decided mod p.
+    """
+    num_cols = len(rows[0]) if rows else 0
+    augmented = [list(row) + [value] for row, value in zip(rows, rhs)]
+
+    rank = 0
+    for col in range(num_cols):
+        pivot_row = next((r for r in range(rank, len(augmented)) if augmented[r][col] != 0), None)
+        if pivot_row is None:
+            # a column without a pivot means rows does not have full column rank mod p
+            return False
+        augmented[rank], augmented[pivot_row] = augmented[pivot_row], augmented[rank]
+
+        pivot_inverse = pow(augmented[rank][col], -1, prime)
+        for r in range(rank + 1, len(augmented)):
+            factor = augmented[r][col] * pivot_inverse % prime
+            if factor != 0:
+                augmented[r] = [(a - factor * b) % prime for a, b in zip(augmented[r], augmented[rank])]
+        rank += 1
+
+    return any(row[num_cols] != 0 for row in augmented[rank:])
+
+
+def get_modular_systems(system):
+    """
+    Reduces a linear system modulo each of the MODULAR_PRIMES.
+    :return: List of (prime, rows, rhs), leaving out the primes dividing a denominator.
+    """
+    rows, rhs = system
+    modular_systems = []
+    for prime in MODULAR_PRIMES:
+        modular_rows = [[fraction_mod(value, prime) for value in row] for row in rows]
+        modular_rhs = [fraction_mod(value, prime) for value in rhs]
+        if all(value is not None for row in modular_rows for value in row) and None not in modular_rhs:
+            modular_systems.append((prime, modular_rows, modular_rhs))
+    return modular_systems
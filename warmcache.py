@@ -0,0 +1,91 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+from tqdm.auto import tqdm
+from matrixgroups.orbitcatalog import ORBIT_CATALOG_FILENAME, get_orbit_catalog
+from pickle_manager.indexed_pickle import IndexedBundleReader, write_indexed_bundle
+from pickle_manager.pickle_manager import (VECTOR_PAIR_BUNDLE_FILENAME, VectorPairPickleManager,
+                                           get_vector_pair_bundle_key)
+from virusdata import virusdata
+
+CENTRALIZER_STRINGS = ["A4", "D10", "D6"]
+
+
+def get_all_pair_table_cases():
+    """
+    Every (start, end) whose pair table a search can ask for: the translation vectors with each other
+    and the bases of the configs with each other.
+    """
+    translations = ["f", "b", "s"]
+    return list(itertools.product(translations, repeat=2)) + list(itertools.product(sorted(virusdata.configs), repeat=2))
+
+
+# vector pair managers of a warm up worker process, one per centralizer
+warm_up_worker = {}
+
+
+def compute_vector_pairs(pair_dir, centralizer_str, start, end):
+    if centralizer_str not in warm_up_worker:
+        warm_up_worker[centralizer_str] = VectorPairPickleManager(pair_dir, centralizer_str, verbose=False)
+    vector_pair_pickle_manager = warm_up_worker[centralizer_str]
+
+    # tables that were already saved on their own are reused
+    if vector_pair_pickle_manager.transition_pickle_file_exists(start, end, centralizer_str):
+        vector_pairs = vector_pair_pickle_manager.get_pickle_data(start, end, centralizer_str)
+    else:
+        vector_pairs = vector_pair_pickle_manager.generate_vector_pairs(start, end)
+
+    return get_vector_pair_bundle_key(start, end, centralizer_str), vector_pairs
+
+
+def compute_vector_pairs_star(args):
+    return compute_vector_pairs(*args)
+
+
+def warm_cache(pair_dir, centralizer_strs=CENTRALIZER_STRINGS, cases=None, processes=None):
+    """
+    Computes the vector pair tables of every case for every centralizer and writes them into one bundle
+    in pair_dir, which VectorPairPickleManager then reads from. Tables already in the bundle are kept.
+    The orbit catalog is saved in pair_dir as well.
+    :param cases: List of (start, end), defaults to get_all_pair_table_cases().
+    :return: Number of tables that had to be computed.
+    """
+    os.makedirs(pair_dir, exist_ok=True)
+    bundle_filename = os.path.join(pair_dir, VECTOR_PAIR_BUNDLE_FILENAME)
+    cases = get_all_pair_table_cases() if cases is None else cases
+
+    tables = {}
+    if os.path.exists(bundle_filename):
+        with IndexedBundleReader(bundle_filename) as bundle:
+            tables = {key: bundle[key] for key in bundle.keys()}
+
+    # the orbit catalog is saved first so the workers load it instead of each building it
+    get_orbit_catalog(os.path.join(pair_dir, ORBIT_CATALOG_FILENAME))
+
+    tasks = [(pair_dir, centralizer_str, start, end) for centralizer_str in centralizer_strs for start, end in cases
+             if get_vector_pair_bundle_key(start, end, centralizer_str) not in tables]
+    if len(tasks) != 0:
+        with multiprocessing.Pool(processes) as pool:
+            for key, vector_pairs in tqdm(pool.imap_unordered(compute_vector_pairs_star, tasks, chunksize=8),
+                                          total=len(tasks), desc="Computing vector pair tables"):
+                tables[key] = vector_pairs
+
+    write_indexed_bundle(bundle_filename, {key: tables[key] for key in sorted(tables)})
+    return len(tasks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precomputes the vector pair tables of every case into one bundle, so searches start with a complete cache.",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-d", "--pair-dir", default="vector_pairs", help="Directory of the vector pair tables.")
+    parser.add_argument("-c", "--centralizer", type=str.upper, choices=CENTRALIZER_STRINGS, nargs="+",
+                        default=CENTRALIZER_STRINGS, help="Centralizers to compute tables for.")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="Number of worker processes. Defaults to the number of CPUs.")
+    args = parser.parse_args()
+
+    stime = time.time()
+    num_computed = warm_cache(args.pair_dir, args.centralizer, processes=args.processes)
+    print(f"Computed {num_computed} tables into {os.path.join(args.pair_dir, VECTOR_PAIR_BUNDLE_FILENAME)} "
+          f"in{time.time() - stime : .3f} seconds.")